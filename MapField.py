@@ -1,12 +1,36 @@
 import pygame
-import random
 import os
 
+from assets import assets
+from atlas import Animation, AnimationPlayer, AtlasBuilder, scroll_frames, walk_frames
+from gameloop import TIMER_EPSILON
+from mapfile import MappedTileMap
+from profiler import profiler
+from maplayer import StaticMapLayer
+from pathfinding import DistanceField
+from scrollbuffer import ScrollBuffer
+from tilemap import TileMap
+
 # --- 画面設定 ---
 SCREEN_WIDTH = 800 # 画面縦
 SCREEN_HEIGHT = 600 # 画面横
 TILE_SIZE = 64 # タイルサイズ
 
+RENDER_TILES = "tiles" # 毎フレーム全タイルを描画
+RENDER_BAKED = "baked" # 事前描画した地形レイヤーを貼る
+RENDER_SCROLL = "scroll" # 裏画面をずらして端だけ描き足す(カメラが1pxずつ滑らかに動く)
+
+BAKE_ALL_LIMIT = 64 * 64 # これ以下のマス数なら読み込み時に全体を焼き込む
+LAYER_MAX_CHUNKS = 12 # 大きなマップで保持する焼き込み済みチャンク数
+
+MOVE_COOL_TIME = 8 / 60 # 1マス移動後のクールタイム(秒)
+AUTO_WALK_KEY = pygame.K_e # 出口(ワープ地点)まで自動で歩くキー
+WALK_LIMIT = 256 # クリックしたマスへの自動移動で探す最大歩数
+WALK_FRAME_TIME = 0.15 # 歩行アニメーションの1コマの時間(秒)
+TILE_FRAME_TIME = 0.25 # 動く地形の1コマの時間(秒)
+ANIMATED_TILES = {4: 4} # 動く地形: タイルID -> コマ数(川は流れて見せる)
+FACINGS = {(-1, 0): "left", (1, 0): "right", (0, -1): "back", (0, 1): "front"} # 移動方向 -> 向き
+
 COLORS = {
     0: (50, 180, 50), # 草
     1: (160, 130, 80), # 土
@@ -39,6 +63,17 @@ MAP_FIELD = [
 ]
 
 
+TILE_IMAGES = { # タイルIDごとの画像
+    0: "fig/grass.png", # 草タイル
+    1: "fig/load_1.png", # 土タイル
+    2: "fig/stone.png", # 岩タイル
+    3: "fig/flower.png", # 花タイル
+    4: "fig/river_1.png", # 水タイル
+    5: "fig/tree.png", # 木タイル
+}
+
+WARP_POINTS = [(24, 9)] # 次のワールドへのワープ地点
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__)) # 現在のディレクトリ
 
 def check_move(mapfield):
@@ -49,10 +84,21 @@ def check_move(mapfield):
     戻り値:
         True または None
     """
-    if mapfield.player_x == 24 and mapfield.player_y == 9:
+    if mapfield.map_data.is_warp(mapfield.player_x, mapfield.player_y):
         return True
     return None
 
+def load_field_map(): # フィールドのタイルマップ作成
+    """
+    MAP_FIELD からタイルマップを作り、ワープ地点を登録する
+    戻り値:
+        TileMapオブジェクト
+    """
+    tilemap = TileMap.from_rows(MAP_FIELD)
+    for x, y in WARP_POINTS:
+        tilemap.add_warp(x, y)
+    return tilemap
+
 def load_image(path): # 画像読み込み
     """
     指定されたパスから画像を読み込む関数
@@ -61,56 +107,268 @@ def load_image(path): # 画像読み込み
     戻り値:
         読み込んだ画像オブジェクト または None
     """
-    full = os.path.join(BASE_DIR, path) # フルパス取得
-    if os.path.exists(full): # ファイル存在確認
-        return pygame.image.load(full).convert_alpha() # 画像読み込み
-    return None # 画像なし
+    return assets.image(path) # 共有の画像管理から取得(初回のみ読み込み)
 
 class MapField: # フィールド画面クラス
-    def __init__(self, screen): # 初期化
+    def __init__(self, screen, map_path=None): # 初期化
         """
         __init__ の Docstring
         :param self: 説明
         :param screen: 説明
+        :param map_path: バイナリ形式のマップファイル(省略時は MAP_FIELD)
         """
         self.screen = screen # 画面情報
-        self.map_data = MAP_FIELD # マップデータ
+        if map_path: # ファイルから必要なチャンクだけ読み込む
+            self.map_data = MappedTileMap(os.path.join(BASE_DIR, map_path))
+        else:
+            self.map_data = load_field_map() # マップデータ
 
         self.player_x = 0 # プレイヤー座標
         self.player_y = 6 # プレイヤー座標
 
         self.move_cool = 0 # 移動クールタイム
+        self.slide_x = 0.0 # 表示位置の遅れ(マス)。RENDER_SCROLL では1マスを滑らかに歩く
+        self.slide_y = 0.0
+        self.exit_field = DistanceField(self.map_data) # ワープ地点までの距離場
+        self.auto_walk = None # 自動移動で従っている距離場(None なら手動)
+
+        self.zoom = 1.0 # 表示倍率
+        self.use_tile_cache = True # 拡大縮小済み画像キャッシュを使うか
+        self.render_mode = RENDER_BAKED # 描画方式
+        self.static_layer = None # 事前描画した地形レイヤー
+        self.layer_version = None # 地形レイヤーに焼き込んだ地形の版
+        self.scroll_buffer = None # RENDER_SCROLL 用の裏画面
+        self.scroll_version = None # 裏画面に描いた地形の版
 
         # プレイヤー画像読み込み
         self.tile_images = self.load_tiles() # タイル画像読み込み
-        self.player_img_left = load_image("fig/map_mahou_l_1.png")
-        self.player_img_right = load_image("fig/map_mahou_r_1.png")
-        self.player_img_back = load_image("fig/map_mahou_b_1.png")
-        self.player_img_flont = load_image("fig/map_mahou_1.png")
-        self.player_img = self.player_img_flont # 初期画像
+        self.player_imgs = { # 向きごとのプレイヤー画像
+            "left": load_image("fig/map_mahou_l_1.png"),
+            "right": load_image("fig/map_mahou_r_1.png"),
+            "back": load_image("fig/map_mahou_b_1.png"),
+            "front": load_image("fig/map_mahou_1.png"),
+        }
+        self.facing = "front" # 初期の向き
+
+        self.scaled_cache = {} # (種別, ID/向き, サイズ) -> 拡大縮小済み画像(アトラスの一部)
+        self.cache_size = None # キャッシュ作成時のタイルサイズ
+        self.atlas = None # タイル・プレイヤーのコマを詰め込んだアトラス
+        self.tile_anims = {} # 動く地形のタイルID -> Animation
+        self.walk_anims = {} # 向き -> 歩行の Animation
+        self.walk = AnimationPlayer() # 歩行アニメーションの再生位置
+        self.anim_time = 0.0 # 地形アニメーションの経過時間(秒)
+        self.build_scaled_cache() # キャッシュ作成
+
+    @property
+    def tile_size(self): # 表示上のタイルサイズ
+        """
+        TILE_SIZE に表示倍率をかけた実際の描画サイズを返す
+        戻り値:
+            タイルサイズ(px)
+        """
+        return max(1, int(TILE_SIZE * self.zoom))
+
+    @property
+    def player_img(self): # 現在の向きのプレイヤー画像
+        return self.player_imgs.get(self.facing)
+
+    def set_zoom(self, zoom): # 表示倍率変更
+        """
+        表示倍率を変更し、拡大縮小済みキャッシュを作り直す
+        引数:
+            zoom: 表示倍率(1.0で等倍)
+        """
+        self.zoom = zoom
+        self.build_scaled_cache()
+
+    def build_scaled_cache(self): # 拡大縮小済み画像キャッシュ作成
+        """
+        タイル画像(動く地形は全コマ)と向きごとの歩行コマを現在のタイルサイズに拡大縮小し、
+        1つのアトラスに詰め込んで保持する
+        TILE_SIZE か表示倍率が変わったときだけ呼ばれる
+        """
+        size = self.tile_size
+        builder = AtlasBuilder()
+        tile_frames = {} # タイルID -> コマ数
+        for tile_id, img in self.tile_images.items(): # タイル画像
+            if img:
+                scaled = pygame.transform.scale(img, (size, size))
+                frames = scroll_frames(scaled, ANIMATED_TILES[tile_id]) if tile_id in ANIMATED_TILES else [scaled]
+                for i, frame in enumerate(frames):
+                    builder.add(("tile", tile_id, i), frame, opaque=True) # 地形タイルは透過なし
+                tile_frames[tile_id] = len(frames)
+        walk_counts = {} # 向き -> コマ数
+        for facing, img in self.player_imgs.items(): # プレイヤー画像
+            if img:
+                frames = walk_frames(pygame.transform.scale(img, (size, size)), facing)
+                for i, frame in enumerate(frames):
+                    builder.add(("player", facing, i), frame)
+                walk_counts[facing] = len(frames)
+        atlas = self.atlas = builder.build()
+
+        cache = {}
+        for tile_id, count in tile_frames.items():
+            cache[("tile", tile_id, size)] = atlas.get(("tile", tile_id, 0)) # 焼き込みには1コマ目を使う
+        for facing in walk_counts:
+            cache[("player", facing, size)] = atlas.get(("player", facing, 0))
+        self.tile_anims = {tile_id: Animation([atlas.get(("tile", tile_id, i)) for i in range(count)], TILE_FRAME_TIME)
+                           for tile_id, count in tile_frames.items() if count > 1}
+        self.walk_anims = {facing: Animation([atlas.get(("player", facing, i)) for i in range(count)], WALK_FRAME_TIME)
+                           for facing, count in walk_counts.items()}
+        self.scaled_cache = cache
+        self.cache_size = size
+        self.static_layer = None # サイズが変わったので焼き直す
+        if self.scroll_buffer:
+            self.scroll_buffer.invalidate()
+
+    def set_map(self, map_data): # マップ切り替え
+        """
+        マップデータを差し替え、地形レイヤーを焼き直す
+        引数:
+            map_data: マップデータ
+        """
+        self.map_data = map_data
+        self.static_layer = None
+        if self.scroll_buffer:
+            self.scroll_buffer.invalidate()
+        self.slide_x = self.slide_y = 0.0
+        self.exit_field = DistanceField(map_data)
+        self.auto_walk = None
+        if self.render_mode == RENDER_BAKED:
+            self.get_static_layer()
+
+    def get_static_layer(self): # 地形レイヤー取得
+        """
+        事前描画した地形レイヤーを返す。無ければ作って全チャンクを焼き込む
+        地形が変わっていたら(TileMap.version)焼き込み済みチャンクを捨てて焼き直す
+        戻り値:
+            StaticMapLayerオブジェクト
+        """
+        if self.cache_size != self.tile_size:
+            self.build_scaled_cache()
+        if self.static_layer is None:
+            if self.map_data.width * self.map_data.height <= BAKE_ALL_LIMIT: # 小さなマップは全体を焼き込む
+                self.static_layer = StaticMapLayer(self.map_data, self.tile_size, self.get_tile_image, COLORS)
+                self.static_layer.bake_all()
+            else: # 大きなマップは見えたチャンクだけ焼き込み、古いものは捨てる
+                self.static_layer = StaticMapLayer(self.map_data, self.tile_size, self.get_tile_image, COLORS,
+                                                   max_chunks=LAYER_MAX_CHUNKS)
+            self.layer_version = self.map_data.version
+        elif self.layer_version != self.map_data.version:
+            self.static_layer.invalidate() # 見えているチャンクから描くときに焼き直す
+            self.layer_version = self.map_data.version
+        return self.static_layer
+
+    def get_scroll_buffer(self): # RENDER_SCROLL 用の裏画面取得
+        """
+        地形が変わっていたら(TileMap.version)次の描画で全体を描き直す
+        戻り値:
+            ScrollBufferオブジェクト
+        """
+        if self.cache_size != self.tile_size:
+            self.build_scaled_cache()
+        if self.scroll_buffer is None:
+            self.scroll_buffer = ScrollBuffer((SCREEN_WIDTH, SCREEN_HEIGHT), self.draw_tile_area)
+        if self.scroll_version != self.map_data.version:
+            self.scroll_buffer.invalidate()
+            self.scroll_version = self.map_data.version
+        return self.scroll_buffer
+
+    def get_tile_image(self, tile_id): # 描画用タイル画像取得
+        """
+        描画サイズに合わせたタイル画像を返す
+        引数:
+            tile_id: タイルID
+        戻り値:
+            画像オブジェクト または None
+        """
+        size = self.tile_size
+        if not self.use_tile_cache: # キャッシュ無効時は毎回拡大縮小する
+            img = self.tile_images.get(tile_id)
+            return pygame.transform.scale(img, (size, size)) if img else None
+        if self.cache_size != size: # サイズ変更を検出したら作り直す
+            self.build_scaled_cache()
+        return self.scaled_cache.get(("tile", tile_id, size))
+
+    def get_player_image(self): # 描画用プレイヤー画像取得
+        """
+        描画サイズに合わせた現在の向きのプレイヤー画像を返す
+        戻り値:
+            画像オブジェクト または None
+        """
+        size = self.tile_size
+        if not self.use_tile_cache:
+            img = self.player_img
+            return pygame.transform.scale(img, (size, size)) if img else None
+        if self.cache_size != size:
+            self.build_scaled_cache()
+        self.walk.play(self.walk_anims.get(self.facing)) # 向きを変えても歩行のコマは引き継ぐ
+        return self.walk.frame
 
     def load_tiles(self): # タイル画像読み込み
         """
         load_tiles の Docstring
         :param self: 説明
         """
-        tiles = {} # タイル画像辞書
-        tiles[0] = load_image("fig/grass.png") # 草タイル
-        tiles[1] = load_image("fig/load_1.png") # 土タイル
-        tiles[2] = load_image("fig/stone.png") # 岩タイル
-        tiles[3] = load_image("fig/flower.png") # 花タイル
-        tiles[4] = load_image("fig/river_1.png") # 水タイル
-        tiles[5] = load_image("fig/tree.png") # 木タイル
-        return tiles # タイル画像辞書返却
+        return {tile_id: load_image(path) for tile_id, path in TILE_IMAGES.items()} # タイル画像辞書返却
+
+    def walk_to(self, x, y): # クリックしたマスへの自動移動
+        """
+        引数:
+            x, y: 目的地のマス
+        戻り値:
+            歩いて行ければ True
+        """
+        field = DistanceField(self.map_data, goals=[(x, y)], limit=WALK_LIMIT) # プレイヤーのマスに届いたら探索を止める
+        if field.step(self.player_x, self.player_y) is None: # 行けない(または既にいる)
+            return False
+        self.auto_walk = field
+        return True
+
+    def walk_to_exit(self): # 出口への自動移動
+        """
+        戻り値:
+            歩いて行ければ True
+        """
+        if self.exit_field.step(self.player_x, self.player_y) is None:
+            return False
+        self.auto_walk = self.exit_field
+        return True
 
-    def update(self): # 更新処理
+    def screen_to_tile(self, pos): # 画面座標 -> マス
+        camera_x, camera_y = self.get_camera()
+        tile_size = self.tile_size
+        return (pos[0] + camera_x) // tile_size, (pos[1] + camera_y) // tile_size
+
+    def handle_event(self, event): # クリックと自動移動キーの処理
+        """
+        左クリックでそのマスへ、AUTO_WALK_KEY で出口へ自動で歩く
+        戻り値:
+            自動移動を始めたら True
+        """
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            return self.walk_to(*self.screen_to_tile(event.pos))
+        if event.type == pygame.KEYDOWN and event.key == AUTO_WALK_KEY:
+            return self.walk_to_exit()
+        return False
+
+    def update(self, dt=1 / 60): # 更新処理
         """
         update の Docstring
         
         :param self: 説明
+        :param dt: 前回の更新からの経過時間(秒)
         """
+        self.anim_time += dt # 地形アニメーション
+        if self.slide_x or self.slide_y: # 表示位置を実際のマスに近づける(クールタイムの間に1マス分)
+            step = dt / MOVE_COOL_TIME
+            self.slide_x = max(0.0, self.slide_x - step) if self.slide_x > 0 else min(0.0, self.slide_x + step)
+            self.slide_y = max(0.0, self.slide_y - step) if self.slide_y > 0 else min(0.0, self.slide_y + step)
         if self.move_cool > 0: # 移動クールタイム中
-            self.move_cool -= 1 # クールタイム減少
+            self.move_cool -= dt # クールタイム減少
+            if self.move_cool <= TIMER_EPSILON: # 丸め誤差が残っても次の更新で動けるようにする
+                self.move_cool = 0
+            self.walk.update(dt) # 1マス歩く間は歩行アニメーションを進める
             return
 
         keys = pygame.key.get_pressed() # キー取得
@@ -120,66 +378,202 @@ class MapField: # フィールド画面クラス
 
         if keys[pygame.K_LEFT]: 
             dx = -1 # 左移動
-            self.player_img = self.player_img_left
         elif keys[pygame.K_RIGHT]: 
             dx = 1 # 右移動
-            self.player_img = self.player_img_right
         elif keys[pygame.K_UP]: 
             dy = -1 # 上移動
-            self.player_img = self.player_img_back
         elif keys[pygame.K_DOWN]: 
             dy = 1 # 下移動
-            self.player_img = self.player_img_flont
+
+        if dx or dy: # 矢印キーを押したら自動移動をやめる
+            self.auto_walk = None
+        elif self.auto_walk: # 自動移動中は距離場を引くだけで次の向きが決まる
+            step = self.auto_walk.step(self.player_x, self.player_y)
+            if step is None: # 目的地に着いた
+                self.auto_walk = None
+            else:
+                dx, dy = step
 
         if dx or dy: # 移動がある場合
+            self.facing = FACINGS[(dx, dy)]
             nx = self.player_x + dx # 新しいX座標
             ny = self.player_y + dy # 新しいY座標
-            #self.map_data : マップデータ参照(MAP_FIELD)
-            if 0 <= ny < len(self.map_data) and 0 <= nx < len(self.map_data[0]): # 範囲内確認
-                if self.map_data[ny][nx] in [0, 1]: # 移動可能タイル確認
-                    self.player_x = nx # プレイヤーX座標更新
-                    self.player_y = ny # プレイヤーY座標更新
-                    self.move_cool = 8 # 移動クールタイム設定
+            #self.map_data : マップデータ参照(MAP_FIELD のタイルマップ)
+            if self.map_data.is_passable(nx, ny): # 移動可能タイル確認(範囲外は通行不可)
+                self.player_x = nx # プレイヤーX座標更新
+                self.player_y = ny # プレイヤーY座標更新
+                self.move_cool = MOVE_COOL_TIME # 移動クールタイム設定
+                if self.render_mode == RENDER_SCROLL: # 表示は1つ前のマスから滑らせる
+                    self.slide_x, self.slide_y = -dx, -dy
+                self.map_data.update_camera(nx, ny) # 周辺チャンクの読み込みと遠いチャンクの破棄
+                return
+        self.walk.stop() # 止まったら立ちポーズに戻す
 
         # print(self.player_x, self.player_y) # デバッグ用座標表示
 
-    def draw(self): # 描画処理
+    def next_wake(self): # 次に画面が変わるまでの時間
         """
-        draw の Docstring
-        
-        :param self: 説明
+        移動・自動移動・歩きの途中なら 0。立ち止まっているときは、画面に動く地形があれば
+        次のコマまでの時間、無ければ None(入力があるまで何も変わらない)
+        戻り値:
+            秒数 または None
+        """
+        if self.move_cool > 0 or self.auto_walk or self.slide_x or self.slide_y:
+            return 0
+        keys = pygame.key.get_pressed()
+        if keys[pygame.K_LEFT] or keys[pygame.K_RIGHT] or keys[pygame.K_UP] or keys[pygame.K_DOWN]:
+            return 0
+        if self.animated_tiles(*self.get_camera()):
+            return TILE_FRAME_TIME - self.anim_time % TILE_FRAME_TIME
+        return None
+
+    def get_camera(self): # カメラ位置計算
         """
-        # カメラ位置計算
-        map_width = len(self.map_data[0]) * TILE_SIZE # マップ幅
-        map_height = len(self.map_data) * TILE_SIZE # マップ高さ
+        プレイヤーを中心に、マップ外が映らないよう調整したカメラ位置を返す
+        戻り値:
+            (camera_x, camera_y) カメラ左上のワールド座標(px)
+        """
+        tile_size = self.tile_size
+        map_width = self.map_data.width * tile_size # マップ幅
+        map_height = self.map_data.height * tile_size # マップ高さ
 
-        camera_x = self.player_x * TILE_SIZE - SCREEN_WIDTH // 2 # カメラX座標
-        camera_y = self.player_y * TILE_SIZE - SCREEN_HEIGHT // 2 # カメラY座標
+        player_px, player_py = self.player_pixel_pos()
+        camera_x = player_px - SCREEN_WIDTH // 2 # カメラX座標
+        camera_y = player_py - SCREEN_HEIGHT // 2 # カメラY座標
 
         camera_x = max(0, min(camera_x, map_width - SCREEN_WIDTH)) # カメラX座標調整
         camera_y = max(0, min(camera_y, map_height - SCREEN_HEIGHT)) # カメラY座標調整
+        return camera_x, camera_y
+
+    def player_pixel_pos(self): # プレイヤーを描くワールド座標
+        """
+        歩いている途中は1つ前のマスとの間の位置になる(RENDER_SCROLL のときだけ)
+        戻り値:
+            (x, y) プレイヤー左上のワールド座標(px)
+        """
+        tile_size = self.tile_size
+        return (round((self.player_x + self.slide_x) * tile_size),
+                round((self.player_y + self.slide_y) * tile_size))
+
+    def player_screen_rect(self): # プレイヤーの画面上の矩形
+        """
+        戻り値:
+            (x, y, w, h) プレイヤーを描画する画面上の矩形
+        """
+        camera_x, camera_y = self.get_camera()
+        player_px, player_py = self.player_pixel_pos()
+        tile_size = self.tile_size
+        return (player_px - camera_x, player_py - camera_y, tile_size, tile_size)
+
+    def draw(self): # 描画処理
+        """
+        draw の Docstring
+        
+        :param self: 説明
+        """
+        tile_size = self.tile_size # 描画タイルサイズ
+        camera_x, camera_y = self.get_camera() # カメラ位置計算
 
         # マップ描画
-        for y, row in enumerate(self.map_data): # マップデータ走査
-            for x, tile in enumerate(row): # 各タイル走査
-                px = x * TILE_SIZE - camera_x # 画面X座標
-                py = y * TILE_SIZE - camera_y # 画面Y座標
-                if -TILE_SIZE < px < SCREEN_WIDTH and -TILE_SIZE < py < SCREEN_HEIGHT: # 画面内確認
-                    img = self.tile_images.get(tile) # タイル画像取得
-                    if img: # 画像がある場合
-                        img = pygame.transform.scale(img, (TILE_SIZE, TILE_SIZE)) # 画像サイズ変更
-                        self.screen.blit(img, (px, py)) # 画像描画
-                    else: # 画像がない場合
-                        pygame.draw.rect( # 四角形描画
-                            self.screen, # 画面
-                            COLORS[tile],  # 色
-                            (px, py, TILE_SIZE, TILE_SIZE) # 位置とサイズ
-                        )
-
-        px = self.player_x * TILE_SIZE - camera_x # プレイヤー画面X座標
-        py = self.player_y * TILE_SIZE - camera_y # プレイヤー画面Y座標
-        if self.player_img: # プレイヤー画像がある場合
-            img = pygame.transform.scale(self.player_img, (TILE_SIZE, TILE_SIZE)) # 画像サイズ変更
+        with profiler.section("draw.tiles"): # タイル描画時間の計測
+            if self.render_mode == RENDER_BAKED: # 焼き込み済みレイヤーを貼るだけ
+                self.get_static_layer().draw(self.screen, camera_x, camera_y)
+            elif self.render_mode == RENDER_SCROLL: # ずらして端だけ描き足した裏画面を貼る
+                buffer = self.get_scroll_buffer()
+                buffer.scroll_to(camera_x, camera_y)
+                buffer.draw(self.screen)
+            else:
+                self.draw_tiles(camera_x, camera_y)
+            self.draw_animated_tiles(camera_x, camera_y) # 動く地形だけ今のコマを上から描く
+
+        px, py = self.player_pixel_pos()
+        px -= camera_x # プレイヤー画面X座標
+        py -= camera_y # プレイヤー画面Y座標
+        img = self.get_player_image() # プレイヤー画像取得
+        if img: # プレイヤー画像がある場合
             self.screen.blit(img, (px, py)) # プレイヤー描画
         else: # プレイヤー画像がない場合
-            pygame.draw.rect(self.screen, (255, 0, 0), (px, py, TILE_SIZE, TILE_SIZE)) # 赤四角描画
+            pygame.draw.rect(self.screen, (255, 0, 0), (px, py, tile_size, tile_size)) # 赤四角描画
+
+    def draw_tiles(self, camera_x, camera_y): # タイルを1枚ずつ描画
+        """
+        画面に映るマスのタイルだけを1枚ずつ描画する(RENDER_TILES用)
+        描画の手間はマップの大きさではなく画面の大きさで決まる
+        引数:
+            camera_x, camera_y: カメラ左上のワールド座標(px)
+        """
+        self.draw_tile_area(self.screen, self.screen.get_rect(), camera_x, camera_y)
+
+    def draw_tile_area(self, surface, area, camera_x, camera_y): # 矩形の範囲のタイルを描画
+        """
+        描画先の矩形 area に映るマスだけを描く(RENDER_SCROLL の帯の描き足しにも使う)
+        引数:
+            surface: 描画先
+            area: 描画先の矩形(この外には描かない)
+            camera_x, camera_y: 描画先左上のワールド座標(px)
+        """
+        tile_size = self.tile_size
+        area = pygame.Rect(area)
+        x0 = max(0, (camera_x + area.left) // tile_size) # 範囲に映るマス
+        y0 = max(0, (camera_y + area.top) // tile_size)
+        x1 = min(self.map_data.width, (camera_x + area.right - 1) // tile_size + 1)
+        y1 = min(self.map_data.height, (camera_y + area.bottom - 1) // tile_size + 1)
+        clip = surface.get_clip()
+        surface.set_clip(area) # はみ出したタイルは範囲の外に描かない
+        for y in range(y0, y1): # 行走査
+            py = y * tile_size - camera_y # 画面Y座標
+            for i, tile in enumerate(self.map_data.row(y, x0, x1)): # 列走査
+                px = (x0 + i) * tile_size - camera_x # 画面X座標
+                img = self.get_tile_image(tile) # タイル画像取得
+                if img: # 画像がある場合
+                    surface.blit(img, (px, py)) # 画像描画
+                else: # 画像がない場合
+                    pygame.draw.rect( # 四角形描画
+                        surface, # 画面
+                        COLORS[tile],  # 色
+                        (px, py, tile_size, tile_size) # 位置とサイズ
+                    )
+        surface.set_clip(clip)
+
+    def visible_tiles(self, camera_x, camera_y): # 画面に映るマスの範囲
+        """
+        戻り値:
+            (x0, y0, x1, y1) x0 <= x < x1, y0 <= y < y1 のマスが映る
+        """
+        ts = self.tile_size
+        x0, y0 = max(0, camera_x // ts), max(0, camera_y // ts)
+        x1 = min(self.map_data.width, (camera_x + SCREEN_WIDTH - 1) // ts + 1)
+        y1 = min(self.map_data.height, (camera_y + SCREEN_HEIGHT - 1) // ts + 1)
+        return x0, y0, x1, y1
+
+    def tile_frame_key(self): # 動く地形の今のコマ番号(変わったら描き直す)
+        return tuple(anim.index_at(self.anim_time) for anim in self.tile_anims.values())
+
+    def animated_tiles(self, camera_x, camera_y): # 画面に映る動く地形
+        """
+        戻り値:
+            (タイルID, 画面X, 画面Y) のリスト
+        """
+        if not self.tile_anims or not self.use_tile_cache:
+            return []
+        ts = self.tile_size
+        x0, y0, x1, y1 = self.visible_tiles(camera_x, camera_y)
+        found = []
+        for y in range(y0, y1):
+            row = self.map_data.row(y, x0, x1)
+            for tile_id in self.tile_anims:
+                i = row.find(tile_id)
+                while i >= 0:
+                    found.append((tile_id, (x0 + i) * ts - camera_x, y * ts - camera_y))
+                    i = row.find(tile_id, i + 1)
+        return found
+
+    def animated_tile_rects(self): # 動く地形の画面上の矩形(差分更新用)
+        camera_x, camera_y = self.get_camera()
+        ts = self.tile_size
+        return [(px, py, ts, ts) for _, px, py in self.animated_tiles(camera_x, camera_y)]
+
+    def draw_animated_tiles(self, camera_x, camera_y): # 動く地形の描画
+        frames = {tile_id: anim.frame_at(self.anim_time) for tile_id, anim in self.tile_anims.items()}
+        for tile_id, px, py in self.animated_tiles(camera_x, camera_y):
+            self.screen.blit(frames[tile_id], (px, py))
@@ -0,0 +1,157 @@
+import os
+import time
+
+import pygame
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__)) # 現在のディレクトリ
+
+
+class AssetInfo: # 読み込み記録
+    __slots__ = ("path", "load_ms", "bytes")
+
+    def __init__(self, path, load_ms, nbytes):
+        self.path = path # 画像パス(キャッシュキーの表示用)
+        self.load_ms = load_ms # 読み込み・変換にかかった時間(ms)
+        self.bytes = nbytes # 画素データの大きさ(byte)
+
+
+class AssetManager: # 画像の共有管理
+    """
+    画像ファイルを1回だけ読み込んで共有する
+    読み込みは最初に要求されたときに行い(遅延読み込み)、
+    透過ありは convert_alpha、透過なしは convert で画面形式に揃える
+    """
+    def __init__(self, base_dir=BASE_DIR):
+        """
+        引数:
+            base_dir: 相対パスの基準ディレクトリ
+        """
+        self.base_dir = base_dir
+        self.surfaces = {} # (パス, 透過, サイズ) -> 画像 または None
+        self.info = {} # (パス, 透過, サイズ) -> AssetInfo
+
+    def full_path(self, path): # フルパス取得
+        return os.path.join(self.base_dir, path)
+
+    def exists(self, path): # ファイル存在確認
+        return os.path.exists(self.full_path(path))
+
+    def image(self, path, alpha=True): # 画像取得
+        """
+        画像を返す。初回だけファイルから読み込む
+        引数:
+            path: 画像ファイルの相対パス
+            alpha: 透過を使うか(背景など透過不要なら False)
+        戻り値:
+            画像オブジェクト または None(ファイルが無い場合)
+        """
+        key = (path, alpha, None)
+        if key in self.surfaces:
+            return self.surfaces[key]
+        start = time.perf_counter()
+        surf = None
+        full = self.full_path(path)
+        if os.path.exists(full): # ファイル存在確認
+            surf = self.prepare(pygame.image.load(full), alpha)
+        self.store(key, surf, start)
+        return surf
+
+    def scaled(self, path, size, alpha=True, keep_source=True): # 拡大縮小済み画像取得
+        """
+        指定サイズに拡大縮小した画像を返す。サイズごとに1回だけ作る
+        引数:
+            path: 画像ファイルの相対パス
+            size: (幅, 高さ)
+            alpha: 透過を使うか
+            keep_source: False なら元サイズの画像を保持しない(大きな背景向け)
+        戻り値:
+            画像オブジェクト または None
+        """
+        key = (path, alpha, tuple(size))
+        if key in self.surfaces:
+            return self.surfaces[key]
+        start = time.perf_counter()
+        src = self.image(path, alpha)
+        surf = pygame.transform.scale(src, size) if src else None
+        self.store(key, surf, start)
+        if not keep_source and src is not None:
+            source_key = (path, alpha, None)
+            self.surfaces.pop(source_key, None)
+            self.info.pop(source_key, None)
+        return surf
+
+    def load_raw(self, path, size=None): # 別スレッド用の読み込み
+        """
+        ファイルを読み込み、必要なら拡大縮小して返す。画面形式への変換とキャッシュへの
+        登録はしないので、別スレッドから呼べる(結果は adopt でメインスレッドから登録する)
+        引数:
+            path: 画像ファイルの相対パス
+            size: (幅, 高さ)。None なら元のサイズ
+        戻り値:
+            画像オブジェクト または None
+        """
+        full = self.full_path(path)
+        if not os.path.exists(full):
+            return None
+        surf = pygame.image.load(full)
+        return pygame.transform.scale(surf, size) if size else surf
+
+    def adopt(self, path, surf, alpha=True, size=None): # 別スレッドで読み込んだ画像の登録
+        """
+        load_raw の結果を画面形式に変換してキャッシュに入れる(メインスレッドで呼ぶ)
+        記録する時間はメインスレッドでかかった変換の時間だけ
+        戻り値:
+            登録した画像 または None
+        """
+        key = (path, alpha, tuple(size) if size else None)
+        if key in self.surfaces:
+            return self.surfaces[key]
+        start = time.perf_counter()
+        if surf is not None:
+            surf = self.prepare(surf, alpha)
+        self.store(key, surf, start)
+        return surf
+
+    def cached(self, path, alpha=True, size=None): # キャッシュ済みか
+        return (path, alpha, tuple(size) if size else None) in self.surfaces
+
+    def prepare(self, surf, alpha): # 画面形式への変換
+        """
+        画面が作られていれば画面形式に変換する(画面なしの計測時はそのまま)
+        """
+        if pygame.display.get_surface() is None:
+            return surf
+        return surf.convert_alpha() if alpha else surf.convert()
+
+    def store(self, key, surf, start): # 読み込み結果の記録
+        self.surfaces[key] = surf
+        if surf is not None:
+            nbytes = surf.get_width() * surf.get_height() * surf.get_bytesize()
+            self.info[key] = AssetInfo(key[0], (time.perf_counter() - start) * 1000, nbytes)
+
+    def release(self, path): # 画像の解放
+        """
+        指定パスの画像(拡大縮小済みを含む)をキャッシュから外す
+        """
+        for key in [k for k in self.surfaces if k[0] == path]:
+            del self.surfaces[key]
+            self.info.pop(key, None)
+
+    def total_bytes(self): # 使用メモリ合計
+        return sum(info.bytes for info in self.info.values())
+
+    def report(self): # 読み込み時間とメモリの一覧
+        """
+        戻り値:
+            1画像1行の文字列リスト(最後に合計)
+        """
+        lines = []
+        for (path, alpha, size), info in sorted(self.info.items(), key=lambda kv: -kv[1].bytes):
+            label = path if size is None else f"{path} @{size[0]}x{size[1]}"
+            lines.append(f"{label:<40} {info.load_ms:8.2f} ms {info.bytes / 1024:10.1f} KiB")
+        total_ms = sum(info.load_ms for info in self.info.values())
+        lines.append(f"{'total':<40} {total_ms:8.2f} ms {self.total_bytes() / 1024:10.1f} KiB")
+        return lines
+
+
+assets = AssetManager() # ゲーム全体で共有する画像管理
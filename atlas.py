@@ -0,0 +1,219 @@
+"""
+テクスチャアトラスとアニメーション
+
+小さな画像(タイル・キャラクターのコマ・敵)を数枚の大きなページ画像に詰め込み、
+名前 -> (ページ, 矩形) の索引で引けるようにする。変換はページごとに1回で済み、
+描画は同じページからの部分 blit になる。
+Animation はコマの並びと1コマの時間、AnimationPlayer は再生位置を持つ。
+"""
+import pygame
+
+PAGE_SIZE = (1024, 1024) # ページの最大サイズ(px)
+PADDING = 1 # 画像同士の間隔(拡大時のにじみ防止)
+
+
+class Atlas: # 詰め込み済みのページと索引
+    def __init__(self, pages, regions):
+        """
+        引数:
+            pages: ページ画像のリスト
+            regions: 名前 -> (ページ番号, pygame.Rect)
+        """
+        self.pages = pages
+        self.regions = regions
+        self.views = {} # 名前 -> ページの部分画像(subsurface、画素はページと共有)
+
+    def __contains__(self, name):
+        return name in self.regions
+
+    def __len__(self):
+        return len(self.regions)
+
+    def get(self, name): # 部分画像取得
+        """
+        戻り値:
+            ページの一部を指す画像(見つからなければ None)
+        """
+        view = self.views.get(name)
+        if view is None:
+            region = self.regions.get(name)
+            if region is None:
+                return None
+            page, rect = region
+            view = self.views[name] = self.pages[page].subsurface(rect)
+        return view
+
+    def blit(self, target, name, pos): # ページから直接描画
+        page, rect = self.regions[name]
+        return target.blit(self.pages[page], pos, rect)
+
+
+class AtlasBuilder: # アトラスの作成
+    """
+    棚詰め(shelf packing): 高さの大きい順に並べ、横一列(棚)に詰めていき、
+    入らなければ下に新しい棚、ページに入らなければ新しいページを作る
+    不透明な画像(地形タイルなど)は透過ありとは別のページに詰め、convert で変換する
+    (透過なしの blit の方が速い)
+    """
+    def __init__(self, page_size=PAGE_SIZE, padding=PADDING):
+        self.page_size = page_size
+        self.padding = padding
+        self.images = [] # (名前, 画像, 不透明か)
+
+    def add(self, name, surface, opaque=False): # 画像の追加
+        """
+        引数:
+            name: 索引の名前(タプルなども可)
+            surface: 画像
+            opaque: 透過の無い画像なら True
+        """
+        w, h = surface.get_size()
+        if w + self.padding > self.page_size[0] or h + self.padding > self.page_size[1]:
+            raise ValueError(f"image {name!r} is larger than an atlas page")
+        self.images.append((name, surface, opaque))
+
+    def pack(self, images): # 配置だけを決める
+        """
+        引数:
+            images: (名前, 画像, 不透明か) のリスト
+        戻り値:
+            (名前 -> (ページ番号, Rect), ページごとの使用高さリスト)
+        """
+        page_w, page_h = self.page_size
+        pad = self.padding
+        regions = {}
+        pages = [] # ページごとの棚リスト [棚の上端, 棚の高さ, 使用幅]
+        heights = [] # ページごとの使用高さ
+        order = sorted(images, key=lambda item: -item[1].get_height())
+        for name, surface, _ in order:
+            w, h = surface.get_size()
+            placed = None
+            for p, shelves in enumerate(pages):
+                for shelf in shelves: # 既存の棚の右側
+                    if h <= shelf[1] and shelf[2] + w + pad <= page_w:
+                        placed = (p, shelf[2], shelf[0])
+                        shelf[2] += w + pad
+                        break
+                if placed is None and heights[p] + h + pad <= page_h: # 新しい棚
+                    shelves.append([heights[p], h + pad, w + pad])
+                    placed = (p, 0, heights[p])
+                    heights[p] += h + pad
+                if placed:
+                    break
+            if placed is None: # 新しいページ
+                pages.append([[0, h + pad, w + pad]])
+                heights.append(h + pad)
+                placed = (len(pages) - 1, 0, 0)
+            p, x, y = placed
+            regions[name] = (p, pygame.Rect(x, y, w, h))
+        return regions, heights
+
+    def build(self): # ページ画像の作成
+        """
+        戻り値:
+            Atlasオブジェクト
+        """
+        pages = []
+        regions = {}
+        has_display = pygame.display.get_surface() is not None
+        for opaque in (True, False):
+            group = [item for item in self.images if item[2] == opaque]
+            if not group:
+                continue
+            group_regions, heights = self.pack(group)
+            first = len(pages)
+            group_pages = [pygame.Surface((self.page_size[0], height), pygame.SRCALPHA) for height in heights]
+            for name, surface, _ in group:
+                page, rect = group_regions[name]
+                group_pages[page].blit(surface, rect)
+                regions[name] = (first + page, rect)
+            if has_display: # 画面があればページごとに1回だけ変換
+                group_pages = [page.convert() if opaque else page.convert_alpha() for page in group_pages]
+            pages.extend(group_pages)
+        return Atlas(pages, regions)
+
+
+class Animation: # コマの並び
+    def __init__(self, frames, frame_time, loop=True):
+        """
+        引数:
+            frames: コマ(画像やアトラスの名前)のリスト
+            frame_time: 1コマの表示時間(秒)
+            loop: 最後まで行ったら最初に戻るか(False なら最後のコマで止まる)
+        """
+        self.frames = list(frames)
+        self.frame_time = frame_time
+        self.loop = loop
+
+    @property
+    def duration(self): # 1周の時間(秒)
+        return len(self.frames) * self.frame_time
+
+    def index_at(self, t): # 経過時間 t 秒でのコマ番号
+        i = int(t / self.frame_time)
+        return i % len(self.frames) if self.loop else min(i, len(self.frames) - 1)
+
+    def frame_at(self, t): # 経過時間 t 秒でのコマ
+        return self.frames[self.index_at(t)]
+
+
+class AnimationPlayer: # アニメーションの再生位置
+    def __init__(self, animation=None):
+        self.animation = animation
+        self.time = 0.0 # 再生開始からの時間(秒)
+
+    def play(self, animation, restart=False): # 再生するアニメーションの切り替え
+        """
+        引数:
+            restart: True なら最初のコマから(False なら再生位置を引き継ぐ。向きを変えたときなど)
+        """
+        self.animation = animation
+        if restart:
+            self.time = 0.0
+
+    def update(self, dt): # 再生位置を進める
+        self.time += dt
+
+    def stop(self): # 最初のコマに戻す
+        self.time = 0.0
+
+    @property
+    def index(self): # 現在のコマ番号
+        return self.animation.index_at(self.time) if self.animation else 0
+
+    @property
+    def frame(self): # 現在のコマ
+        return self.animation.frame_at(self.time) if self.animation else None
+
+
+def scroll_frames(surface, count, vertical=True): # 流れる地形のコマ作成
+    """
+    画像を少しずつずらして(はみ出た分は反対側に回して)count コマ作る
+    川のように1枚しか絵が無いタイルを流れて見せる
+    """
+    w, h = surface.get_size()
+    frames = []
+    for i in range(count):
+        frame = pygame.Surface((w, h), pygame.SRCALPHA)
+        if vertical:
+            offset = h * i // count
+            frame.blit(surface, (0, offset))
+            frame.blit(surface, (0, offset - h))
+        else:
+            offset = w * i // count
+            frame.blit(surface, (offset, 0))
+            frame.blit(surface, (offset - w, 0))
+        frames.append(frame)
+    return frames
+
+
+def walk_frames(surface, facing): # 歩行のコマ作成
+    """
+    正面・背面は左右反転、横向きは少し上下させたコマと交互にする
+    (1方向1枚の絵しか無いので2コマの歩行にする)
+    """
+    if facing in ("front", "back"):
+        return [surface, pygame.transform.flip(surface, True, False)]
+    bob = pygame.Surface(surface.get_size(), pygame.SRCALPHA)
+    bob.blit(surface, (0, max(1, surface.get_height() // 32)))
+    return [surface, bob]
@@ -0,0 +1,230 @@
+"""
+戦闘バランスの一括シミュレーション（pygame 非依存）
+
+BattleParams の値の組み合わせ（グリッド）ごとに、新しいプレイヤーで雑魚戦を続けて
+最後にボスと戦う「1周」を何千回も画面なしで回し、勝率・決着までのターン数・
+レベルアップまでのターン数を分布（平均と10/50/90パーセンタイル）で出す。
+1周ずつの仕事をプロセスプールに配るので、コア数に比例して速くなる。
+
+実行例:
+    python balance_sweep.py --grid enemy_hp=40,50,60 --grid exp_growth=1.3,1.5 --runs 2000
+    python balance_sweep.py --grid boss_hp=800,1000 --json sweep.json
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import sys
+import time
+from collections import Counter
+
+from battle_engine import RESULT_WIN, BattleEngine, BattleParams, simulate_battle
+from rng import RngStreams, derive_seed
+
+RUNS = 1000  # グリッド1点あたりの周回数
+BATTLES_PER_RUN = 20  # 1周の雑魚戦の数
+RUNS_PER_TASK = 50  # プロセスに1回で渡す周回数
+REPORT_LEVELS = (2, 3, 5)  # 表に出すレベル
+SWEEP_TYPES = (bool, int, float)  # グリッドで振れる値の型
+BOOL_VALUES = {"true": True, "yes": True, "on": True, "1": True,
+               "false": False, "no": False, "off": False, "0": False}  # bool("False") は True なので文字で判定する
+
+
+def parse_value(name, kind, text):
+    """コマンドラインの文字を kind（SWEEP_TYPES のどれか）に変換する。変換できなければ ValueError"""
+    if kind is bool:
+        value = BOOL_VALUES.get(text.strip().lower())
+        if value is None:
+            raise ValueError(f"{name}: not a boolean: {text!r}")
+        return value
+    try:
+        return kind(text)
+    except ValueError:
+        raise ValueError(f"{name}: not {kind.__name__}: {text!r}") from None
+
+
+def parse_grid(specs):
+    """
+    "name=v1,v2" のリストを (名前, 値リスト) のリストにする
+    名前は BattleParams.as_dict() にある数値・真偽値の項目だけで、
+    値は既定値と同じ型に変換する（それ以外は ValueError）
+    """
+    params = BattleParams().as_dict()
+    grid = []
+    for spec in specs:
+        name, sep, values = spec.partition("=")
+        kind = type(params.get(name))
+        if not sep or kind not in SWEEP_TYPES:
+            raise ValueError(f"cannot sweep {spec!r}")
+        grid.append((name, [parse_value(name, kind, v) for v in values.split(",")]))
+    return grid
+
+
+def grid_points(grid):
+    """グリッドの全ての組み合わせ（上書きする値の辞書のリスト）"""
+    names = [name for name, _ in grid]
+    return [dict(zip(names, values)) for values in itertools.product(*(v for _, v in grid))]
+
+
+def new_stats():
+    return {
+        "runs": 0,
+        "battles": 0,
+        "wins": 0,
+        "turns": Counter(),  # 雑魚戦1回のターン数
+        "boss_battles": 0,
+        "boss_wins": 0,
+        "boss_turns": Counter(),  # ボス戦のターン数
+        "boss_level": Counter(),  # ボスに挑んだときのレベル
+        "level_turns": {},  # レベル -> そのレベルになるまでの合計ターン数
+    }
+
+
+def merge_stats(total, part):
+    for key in ("runs", "battles", "wins", "boss_battles", "boss_wins"):
+        total[key] += part[key]
+    for key in ("turns", "boss_turns", "boss_level"):
+        total[key].update(part[key])
+    for level, counter in part["level_turns"].items():
+        total["level_turns"].setdefault(level, Counter()).update(counter)
+    return total
+
+
+def run_campaign(params, seed, battles, stats):
+    """
+    新しいプレイヤーで雑魚戦を battles 回続け、全回復してボスと戦う
+    負けたら全回復して続ける（ゲームのリトライと同じ）
+    """
+    rngs = RngStreams(seed)
+    engine = BattleEngine(params, rng=rngs.damage, spawn_rng=rngs.spawn)
+    pl = engine.player
+    level = pl.level
+    total_turns = 0
+    for _ in range(battles):
+        result, turns = simulate_battle(engine, is_boss=False)
+        total_turns += turns
+        stats["battles"] += 1
+        stats["wins"] += result == RESULT_WIN
+        stats["turns"][turns] += 1
+        while level < pl.level:  # レベルアップまでの合計ターン数
+            level += 1
+            stats["level_turns"].setdefault(level, Counter())[total_turns] += 1
+        if result != RESULT_WIN:
+            engine.restore()
+
+    engine.restore()
+    stats["boss_level"][pl.level] += 1
+    result, turns = simulate_battle(engine, is_boss=True)
+    stats["boss_battles"] += 1
+    stats["boss_wins"] += result == RESULT_WIN
+    stats["boss_turns"][turns] += 1
+    stats["runs"] += 1
+
+
+def run_task(task):
+    """プロセスプールで実行する仕事（グリッド1点の何周か）"""
+    index, overrides, seed, runs, battles = task
+    params = BattleParams(**overrides)
+    stats = new_stats()
+    for i in range(runs):
+        run_campaign(params, derive_seed(seed, i), battles, stats)
+    return index, stats
+
+
+def distribution(counter):
+    """
+    値 -> 回数 の Counter から平均と10/50/90パーセンタイルを出す
+    戻り値: {"n", "mean", "p10", "p50", "p90"}（空なら n=0 のみ）
+    """
+    n = sum(counter.values())
+    if n == 0:
+        return {"n": 0}
+    result = {"n": n, "mean": sum(v * c for v, c in counter.items()) / n}
+    targets = [("p10", 0.1), ("p50", 0.5), ("p90", 0.9)]
+    seen = 0
+    for value in sorted(counter):
+        seen += counter[value]
+        while targets and seen >= targets[0][1] * n:
+            result[targets.pop(0)[0]] = value
+    return result
+
+
+def summarize(overrides, stats):
+    return {
+        "params": overrides,
+        "runs": stats["runs"],
+        "win_rate": stats["wins"] / stats["battles"] if stats["battles"] else 0.0,
+        "turns": distribution(stats["turns"]),
+        "boss_win_rate": stats["boss_wins"] / stats["boss_battles"] if stats["boss_battles"] else 0.0,
+        "boss_turns": distribution(stats["boss_turns"]),
+        "boss_level": distribution(stats["boss_level"]),
+        "turns_to_level": {level: distribution(c) for level, c in sorted(stats["level_turns"].items())},
+    }
+
+
+def format_dist(d):
+    if not d.get("n"):
+        return "-"
+    return f"{d['p50']}({d['p10']}-{d['p90']})"
+
+
+def print_table(summaries):
+    header = ["params", "win%", "turns", "boss%", "boss turns", "boss Lv"]
+    header += [f"to Lv{level}" for level in REPORT_LEVELS]
+    rows = []
+    for s in summaries:
+        row = [" ".join(f"{k}={v}" for k, v in s["params"].items()) or "(default)",
+               f"{s['win_rate'] * 100:.1f}", format_dist(s["turns"]),
+               f"{s['boss_win_rate'] * 100:.1f}", format_dist(s["boss_turns"]), format_dist(s["boss_level"])]
+        for level in REPORT_LEVELS:
+            d = s["turns_to_level"].get(level, {"n": 0})
+            reached = d["n"] / s["runs"] if s["runs"] else 0
+            row.append(f"{format_dist(d)} {reached * 100:.0f}%" if d["n"] else "-")
+        rows.append(row)
+    widths = [max(len(str(r[i])) for r in rows + [header]) for i in range(len(header))]
+    for r in [header] + rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(r, widths)))
+    print("turns: p50(p10-p90)。to LvN: そのレベルになるまでの合計ターン数と到達した周の割合")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="戦闘バランスの一括シミュレーション")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=V1,V2",
+                        help="変える BattleParams の値（複数指定で全組み合わせ）")
+    parser.add_argument("--runs", type=int, default=RUNS, help="グリッド1点あたりの周回数")
+    parser.add_argument("--battles", type=int, default=BATTLES_PER_RUN, help="1周の雑魚戦の数")
+    parser.add_argument("--workers", type=int, default=None, help="プロセス数（省略時はCPU数）")
+    parser.add_argument("--seed", type=int, default=0, help="乱数のシード")
+    parser.add_argument("--json", metavar="PATH", help="結果をJSONで書き出す")
+    args = parser.parse_args()
+
+    try:
+        points = grid_points(parse_grid(args.grid))
+    except ValueError as e:
+        parser.error(str(e))
+
+    tasks = []
+    for index, overrides in enumerate(points):
+        for start in range(0, args.runs, RUNS_PER_TASK):
+            runs = min(RUNS_PER_TASK, args.runs - start)
+            tasks.append((index, overrides, derive_seed(args.seed, f"{index}:{start}"), runs, args.battles))
+
+    totals = [new_stats() for _ in points]
+    start_time = time.perf_counter()
+    with multiprocessing.Pool(args.workers) as pool:
+        for done, (index, stats) in enumerate(pool.imap_unordered(run_task, tasks), 1):
+            merge_stats(totals[index], stats)
+            print(f"\r{done}/{len(tasks)}", end="", file=sys.stderr)
+    elapsed = time.perf_counter() - start_time
+    battles = sum(t["battles"] + t["boss_battles"] for t in totals)
+    print(f"\r{battles} 戦闘 / {elapsed:.1f} 秒 ({battles / elapsed:.0f} 戦闘/秒)", file=sys.stderr)
+
+    summaries = [summarize(overrides, stats) for overrides, stats in zip(points, totals)]
+    print_table(summaries)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+"""
+戦闘エンジン（pygame 非依存）
+
+kouka.Game の戦闘ロジックを画面・フォント・画像から切り離したもの。
+状態は BattleEngine.player / BattleEngine.state に明示的に持ち、
+行動は act() で受け付ける。テストやバランス調整から画面なしで大量に回せる。
+"""
+import random
+
+from enemy_store import EnemyStore
+from messagelog import MSG_CRITICAL, MSG_DEFEAT, MSG_LEVELUP, MSG_NORMAL, MessageLog
+
+# 行動
+ACTION_ATTACK = "ATTACK"  # たたかう
+ACTION_MAGIC = "MAGIC"  # まほう(MP30)
+ACTION_HOIMI = "HOIMI"  # ホイミ(MP10)
+ACTION_STRIKE = "STRIKE"  # SPACE攻撃（攻撃バフが乗る）
+ACTION_HEAL = "HEAL"  # 回復（戦闘ごとの回数制限あり）
+ACTION_POTION = "POTION"  # 回復薬
+ACTION_ATK_UP = "ATK_UP"  # 攻撃力アップ
+ACTION_DEF_UP = "DEF_UP"  # 防御力アップ
+
+# 戦闘結果
+RESULT_WIN = "WIN"
+RESULT_LOSE = "LOSE"
+
+# 演出用の出来事（BattleEngine.events）
+EVENT_HIT = "hit"  # 敵にダメージ
+EVENT_CRITICAL = "critical"  # 会心の一撃
+EVENT_LEVELUP = "levelup"  # レベルアップ
+
+ENEMY_MINION = "minion"  # 雑魚敵
+ENEMY_BOSS = "boss"  # ボス
+
+
+class BattleParams:
+    """バランス調整用の数値一式。キーワード引数で上書きできる"""
+    enemy_hp = 50
+    enemy_atk = 10
+    enemy_xp = 40  # 雑魚は40Exp
+    boss_hp = 1000
+    boss_atk = 30
+    boss_xp = 500
+    first_next_exp = 100  # Lv2までの必要経験値
+    exp_growth = 1.5  # 必要経験値の増加率
+    hp_per_level = 20
+    mp_per_level = 10
+    attack_crit_rate = 15  # たたかうの会心率(%)
+    magic_crit_rate = 10  # まほうの会心率(%)
+    enemy_miss_rate = 20  # 敵の攻撃ミス率(%)
+    heals_normal = 3  # 通常戦の回復回数
+    heals_boss = 5  # ボス戦の回復回数
+    items = {"potion": 3, "atk": 2, "def": 2}  # 初期アイテム数
+    flash_time = 10 / 60  # ダメージ演出の長さ（秒）
+    death_time = 1.0  # 撃破演出の長さ（秒）
+
+    def __init__(self, **overrides):
+        for name, value in overrides.items():
+            if not hasattr(BattleParams, name):
+                raise TypeError(f"unknown battle parameter: {name}")
+            setattr(self, name, value)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in dir(BattleParams)
+                if not name.startswith("_") and not callable(getattr(BattleParams, name))}
+
+
+class Player:
+    """プレイヤーのステータス"""
+    def __init__(self, params):
+        self.level = 1
+        self.exp = 0
+        self.next_exp = params.first_next_exp
+        self.max_hp = 100
+        self.hp = 100
+        self.max_mp = 100
+        self.mp = 100
+        self.items = dict(params.items)
+        self.atk_multiplier = 1.0
+        self.def_multiplier = 1.0
+        self.atk_buff_turns = 0
+        self.def_buff_turns = 0
+
+
+class BattleState:
+    """1回の戦闘の状態"""
+    def __init__(self, is_boss, heals_left):
+        self.is_boss = is_boss
+        self.heals_left = heals_left
+        self.enemies = EnemyStore()
+        self.turns = 0  # プレイヤーが行動したターン数
+        self.result = None  # RESULT_WIN / RESULT_LOSE / None(戦闘中)
+
+
+class BattleEngine:
+    def __init__(self, params=None, rng=None, spawn_rng=None):
+        """
+        rng: ダメージ・命中などに使う乱数列
+        spawn_rng: 敵の出現数に使う乱数列（省略時は rng と共用）
+        """
+        self.params = params or BattleParams()
+        self.rng = rng or random.Random()
+        self.spawn_rng = spawn_rng or self.rng
+        self.player = Player(self.params)
+        self.state = None  # 戦闘中でなければ None
+        self.logs = MessageLog()
+        self.events = []  # 画面の演出用の出来事 (種類, 敵の矩形 または None, 数値)
+
+    def take_events(self):  # たまった出来事を取り出して空にする
+        events, self.events = self.events, []
+        return events
+
+    def add_message(self, text, kind=MSG_NORMAL):
+        self.logs.add_message(text, kind)
+
+    # --- 戦闘の開始と終了 ---
+    def start_battle(self, is_boss, num_enemies=None):
+        """
+        num_enemies: 雑魚敵の数（省略時は1〜3体のランダム）
+        """
+        p = self.params
+        self.state = BattleState(is_boss, p.heals_boss if is_boss else p.heals_normal)
+        self.logs.clear()
+        self.events.clear()  # 画面なしで回すときも前の戦闘の分をためない
+        enemies = self.state.enemies
+        if is_boss:
+            self.add_message("ボスが現れた！")
+            enemies.add("BOSS", ENEMY_BOSS, p.boss_hp, p.boss_atk, p.boss_xp, (300, 50, 200, 200))
+        else:
+            if num_enemies is None:
+                num_enemies = self.spawn_rng.randint(1, 3)
+            for i in range(num_enemies):
+                x_pos = 150 + i % 4 * 180  # 4体ごとに次の列へ
+                y_pos = 100 + i // 4 * 110
+                enemies.add(f"課題{i+1}", ENEMY_MINION, p.enemy_hp, p.enemy_atk, p.enemy_xp, (x_pos, y_pos, 100, 100))
+        return self.state
+
+    def end_battle(self, win):
+        if self.state is not None and self.state.result is None:
+            self.state.result = RESULT_WIN if win else RESULT_LOSE
+
+    @property
+    def in_battle(self):
+        return self.state is not None and self.state.result is None
+
+    def restore(self):  # リトライ時の全回復
+        self.player.hp = self.player.max_hp
+        self.player.mp = self.player.max_mp
+        self.state = None
+
+    # --- 行動 ---
+    def act(self, action):
+        """
+        プレイヤーの行動を1つ実行する
+        戻り値: ターンを消費したら True（MP不足などで取り消した場合は False）
+        """
+        if not self.in_battle:
+            return False
+        if action in (ACTION_ATTACK, ACTION_MAGIC, ACTION_HOIMI):
+            return self.execute_turn(action)
+
+        pl = self.player
+        st = self.state
+        if action == ACTION_STRIKE:
+            target = self.first_target()
+            if target is None:
+                return False
+            self.logs.clear()
+            damage = int(self.rng.randint(30, 60) * pl.atk_multiplier)
+            self.hit(target, damage)
+            self.add_message(f"こうかとんの攻撃！ {damage} のダメージ！")
+        elif action == ACTION_HEAL:
+            if st.heals_left <= 0:
+                self.add_message("回復回数がありません！")
+                return False
+            self.logs.clear()
+            heal = self.rng.randint(200, 400)
+            old_hp = pl.hp
+            pl.hp = min(pl.max_hp, pl.hp + heal)
+            st.heals_left -= 1
+            self.add_message(f"回復した！ +{pl.hp - old_hp} HP")
+        elif action == ACTION_POTION:
+            if pl.items["potion"] <= 0:
+                return False
+            self.logs.clear()
+            pl.items["potion"] -= 1
+            pl.hp = min(pl.max_hp, pl.hp + 150)
+            self.add_message("回復薬を使用！")
+        elif action == ACTION_ATK_UP:
+            if pl.items["atk"] <= 0:
+                return False
+            self.logs.clear()
+            pl.items["atk"] -= 1
+            pl.atk_buff_turns = 3
+            pl.atk_multiplier = 1.5
+            self.add_message("攻撃力アップ！")
+        elif action == ACTION_DEF_UP:
+            if pl.items["def"] <= 0:
+                return False
+            self.logs.clear()
+            pl.items["def"] -= 1
+            pl.def_buff_turns = 3
+            pl.def_multiplier = 0.5
+            self.add_message("防御力アップ！")
+        else:
+            raise ValueError(f"unknown action: {action}")
+        self.finish_turn()
+        return True
+
+    def execute_turn(self, action_type):
+        """たたかう / まほう / ホイミ"""
+        pl = self.player
+        target = self.first_target()
+        if target is None:
+            return False
+
+        # レベルに応じた威力補正
+        level_bonus = (pl.level - 1) * 2
+
+        if action_type == ACTION_HOIMI:
+            if pl.mp < 10:
+                self.add_message("MPが足りない！")
+                return False
+            self.logs.clear()
+            pl.mp -= 10
+            heal_amount = self.rng.randint(30, 50) + level_bonus  # レベルで回復量も増える
+            old_hp = pl.hp
+            pl.hp = min(pl.max_hp, pl.hp + heal_amount)
+            self.add_message(f"ホイミ！ HPが{pl.hp - old_hp}回復！")
+
+        elif action_type == ACTION_MAGIC:
+            if pl.mp < 30:
+                self.add_message("MPが足りない！")
+                return False
+            self.logs.clear()
+            pl.mp -= 30
+            damage = self.rng.randint(50, 80) + level_bonus * 2  # 魔法はレベル恩恵大
+            critical = self.rng.randint(0, 100) < self.params.magic_crit_rate
+            if critical:
+                damage = int(damage * 1.5)
+                self.add_message("会心の一撃！！", MSG_CRITICAL)
+            self.hit(target, damage, critical)
+            self.add_message(f"魔法攻撃！{self.state.enemies.names[target]}に{damage}ダメ！")
+
+        elif action_type == ACTION_ATTACK:
+            self.logs.clear()
+            damage = int((self.rng.randint(20, 30) + level_bonus) * pl.atk_multiplier)
+            critical = self.rng.randint(0, 100) < self.params.attack_crit_rate
+            if critical:
+                damage = damage * 2
+                self.add_message("会心の一撃！！", MSG_CRITICAL)
+            self.hit(target, damage, critical)
+            self.add_message(f"攻撃！ {self.state.enemies.names[target]}に{damage}ダメ！")
+
+        else:
+            raise ValueError(f"unknown action: {action_type}")
+
+        self.finish_turn()
+        return True
+
+    def first_target(self):  # 先頭の生きている敵の番号（いなければ None）
+        i = self.state.enemies.first_alive()
+        return None if i < 0 else i
+
+    def hit(self, target, damage, critical=False):
+        enemies = self.state.enemies
+        enemies.hit(target, damage, self.params.flash_time)
+        self.events.append((EVENT_CRITICAL if critical else EVENT_HIT, enemies.rect(target), damage))
+
+    def finish_turn(self):  # 敵の反撃とバフの経過
+        self.state.turns += 1
+        self.enemy_counterattack()
+        pl = self.player
+        if pl.atk_buff_turns > 0:
+            pl.atk_buff_turns -= 1
+            if pl.atk_buff_turns == 0:
+                pl.atk_multiplier = 1.0
+        if pl.def_buff_turns > 0:
+            pl.def_buff_turns -= 1
+            if pl.def_buff_turns == 0:
+                pl.def_multiplier = 1.0
+
+    def enemy_counterattack(self):
+        pl = self.player
+        enemies = self.state.enemies
+        total_dmg, missed = enemies.counterattack(self.rng, self.params.enemy_miss_rate)
+        for i in missed:
+            self.add_message(f"{enemies.names[i]}の攻撃ミス！")
+
+        total_dmg = int(total_dmg * pl.def_multiplier)
+        if total_dmg > 0:
+            pl.hp -= total_dmg
+            self.add_message(f"敵の攻撃！ 計{total_dmg}のダメージ！")
+
+        if pl.hp <= 0:
+            pl.hp = 0
+            self.end_battle(win=False)
+
+    # --- 時間経過 ---
+    def update(self, dt):
+        """演出タイマーを dt 秒進め、撃破演出が終わった敵を消して経験値を得る"""
+        if not self.in_battle:
+            return
+        enemies = self.state.enemies
+        started, finished = enemies.tick(dt, self.params.death_time)
+        for i in started:
+            self.add_message(f"{enemies.names[i]}をやっつけた！", MSG_DEFEAT)
+        if finished:  # タイマー0で消滅（経験値獲得）
+            for i in finished:
+                self.gain_exp(enemies.xp[i])
+            enemies.remove(finished)
+        if len(enemies) == 0:
+            self.end_battle(win=True)
+
+    def gain_exp(self, amount):  # 経験値とレベルアップ処理
+        pl = self.player
+        pl.exp += amount
+        self.add_message(f"{amount} Expを獲得！")
+
+        while pl.exp >= pl.next_exp:  # レベルアップ判定
+            pl.level += 1
+            pl.exp -= pl.next_exp  # 現在のExpを消費して次のレベルへ
+            pl.next_exp = int(pl.next_exp * self.params.exp_growth)  # 必要経験値増加
+
+            # ステータス上昇
+            pl.max_hp += self.params.hp_per_level
+            pl.max_mp += self.params.mp_per_level
+
+            # 全回復（ボーナス）
+            pl.hp = pl.max_hp
+            pl.mp = pl.max_mp
+
+            self.add_message(f"レベルアップ！ Lv{pl.level} になった！", MSG_LEVELUP)
+            self.events.append((EVENT_LEVELUP, None, pl.level))
+            self.add_message("最大HPとMPが増え、全回復した！")
+
+
+def simple_policy(engine):
+    """画面なしシミュレーション用の既定の行動選択"""
+    pl = engine.player
+    if pl.hp < pl.max_hp * 0.3:
+        if engine.state.heals_left > 0:
+            return ACTION_HEAL
+        if pl.mp >= 10:
+            return ACTION_HOIMI
+    if pl.mp >= 30:
+        return ACTION_MAGIC
+    return ACTION_ATTACK
+
+
+def simulate_battle(engine, is_boss=False, policy=simple_policy, max_turns=1000):
+    """
+    1戦闘を最後まで画面なしで進める。演出タイマーは行動ごとに早送りする
+    戻り値: (結果, ターン数)
+    """
+    engine.start_battle(is_boss)
+    fast_forward = max(engine.params.flash_time, engine.params.death_time)
+    while engine.in_battle and engine.state.turns < max_turns:
+        if not engine.act(policy(engine)):
+            engine.act(ACTION_ATTACK)  # 取り消されたら通常攻撃
+        engine.update(fast_forward)
+    return engine.state.result, engine.state.turns
@@ -0,0 +1,69 @@
+"""
+MapField.draw のフレーム時間比較
+毎フレーム拡大縮小する従来の描画と、拡大縮小済みキャッシュを使う描画、
+焼き込み済み地形レイヤーを使う描画を比べる
+
+実行例:
+    SDL_VIDEODRIVER=dummy python benchmarks/bench_tile_cache.py --frames 600
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # 画面を開かずに計測する
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+
+import MapField
+
+
+def measure(field, frames): # 1フレームあたりの描画時間計測
+    """
+    指定フレーム数だけ draw を呼び、1フレームあたりの平均時間(ms)を返す
+    引数:
+        field: MapFieldオブジェクト
+        frames: 計測フレーム数
+    戻り値:
+        平均フレーム時間(ms)
+    """
+    field.draw() # ウォームアップ
+    start = time.perf_counter()
+    for _ in range(frames):
+        field.draw()
+    return (time.perf_counter() - start) * 1000 / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="タイルキャッシュの有無による MapField.draw の比較")
+    parser.add_argument("--frames", type=int, default=300, help="計測フレーム数")
+    parser.add_argument("--zoom", type=float, default=1.0, help="表示倍率")
+    args = parser.parse_args()
+
+    pygame.init()
+    screen = pygame.display.set_mode((MapField.SCREEN_WIDTH, MapField.SCREEN_HEIGHT))
+    field = MapField.MapField(screen)
+    field.set_zoom(args.zoom)
+
+    field.render_mode = MapField.RENDER_TILES # タイル単位の描画で比較
+    field.use_tile_cache = False # 従来の描画(毎フレーム拡大縮小)
+    legacy = measure(field, args.frames)
+    field.use_tile_cache = True # キャッシュ使用
+    cached = measure(field, args.frames)
+    field.render_mode = MapField.RENDER_BAKED # 焼き込み済みレイヤー
+    baked = measure(field, args.frames)
+
+    print(f"tile_size={field.tile_size}px frames={args.frames}")
+    print(f"毎フレーム拡大縮小: {legacy:.3f} ms/frame")
+    print(f"キャッシュ使用    : {cached:.3f} ms/frame")
+    print(f"地形レイヤー      : {baked:.3f} ms/frame")
+    if cached > 0:
+        print(f"速度比(キャッシュ): {legacy / cached:.2f}x")
+    if baked > 0:
+        print(f"速度比(レイヤー)  : {legacy / baked:.2f}x")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
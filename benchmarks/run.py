@@ -0,0 +1,248 @@
+"""
+マップ・戦闘・描画の処理時間ベンチマーク
+
+画面を開かずに(SDL_VIDEODRIVER=dummy)主要な処理を繰り返し計測し、
+結果を表示し、--output を付ければ JSON にも書き出す。
+以前の結果と比べて遅くなっていれば終了コード 1 を返す。
+
+実行例:
+    python benchmarks/run.py --output bench.json
+    python benchmarks/run.py --output new.json --compare bench.json --threshold 1.25
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # 画面を開かずに計測する
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+START_DIR = os.getcwd() # kouka の import で作業ディレクトリが変わるので、相対パスはここから解決する
+sys.path.insert(0, ROOT)
+
+import pygame
+
+import battle_engine
+import kouka
+import mainmap
+import MapField
+import particles
+from tilemap import TileMap
+
+MAP_SIZES = [(25, 19), (100, 100), (500, 500)] # MapField のマップサイズ(マス)
+PARTICLE_COUNTS = [256, 512, particles.MAX_PARTICLES] # 火花の数(最大は上限いっぱい)
+MAINMAP_SIZES = [(25, 19), (64, 64), (500, 500)] # mainmap のマップサイズ(マス)
+ENEMY_COUNTS = [1, 3, 30, 300] # 戦闘の敵の数
+
+
+class FakeKeys: # pygame.key.get_pressed の代わり(押しているキーを指定)
+    def __init__(self, *pressed):
+        self.pressed = set(pressed)
+
+    def __getitem__(self, key):
+        return key in self.pressed
+
+
+def random_map(width, height, seed=0): # 試験用のランダムマップ
+    rng = random.Random(seed)
+    tiles = bytes(rng.choice((0, 0, 0, 1, 2, 3, 4)) for _ in range(width * height))
+    return TileMap(width, height, tiles)
+
+
+def measure(fn, iterations, setup=None): # 1回ごとの時間を計測
+    """
+    引数:
+        fn: 計測する処理
+        iterations: 計測回数
+        setup: 毎回 fn の前に呼ぶ準備(時間に含めない)
+    戻り値:
+        mean / p50 / p90 / min (マイクロ秒) と回数の辞書
+    """
+    for _ in range(max(1, iterations // 10)): # ウォームアップ
+        if setup:
+            setup()
+        fn()
+    times = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    us = 1e6
+    return {
+        "iterations": iterations,
+        "mean_us": sum(times) / len(times) * us,
+        "p50_us": times[len(times) // 2] * us,
+        "p90_us": times[min(len(times) - 1, int(len(times) * 0.9))] * us,
+        "min_us": times[0] * us,
+    }
+
+
+def bench_mapfield(screen, iterations, results): # MapField.draw / update
+    for width, height in MAP_SIZES:
+        field = MapField.MapField(screen)
+        field.set_map(random_map(width, height))
+        field.player_x, field.player_y = width // 2, height // 2
+        for mode in (MapField.RENDER_TILES, MapField.RENDER_BAKED):
+            field.render_mode = mode
+            results[f"MapField.draw[{mode},{width}x{height}]"] = measure(field.draw, iterations)
+
+        # 1マスを8コマかけて歩く間の描画(カメラが毎フレーム数pxずつ動く)
+        slides = [-(8 - i) / 8 for i in range(8)]
+        for mode in (MapField.RENDER_TILES, MapField.RENDER_BAKED, MapField.RENDER_SCROLL):
+            field.render_mode = mode
+            frame = [0]
+            def setup():
+                field.slide_x = slides[frame[0] % len(slides)]
+                field.player_x = width // 2 + (frame[0] // len(slides)) % 4
+                frame[0] += 1
+            results[f"MapField.draw[{mode}-walk,{width}x{height}]"] = measure(field.draw, iterations, setup)
+        field.slide_x = 0.0
+        field.render_mode = MapField.RENDER_BAKED
+
+        # 右キーを押し続けた状態で update(移動判定とクールタイム)
+        original = pygame.key.get_pressed
+        pygame.key.get_pressed = lambda: FakeKeys(pygame.K_RIGHT)
+        try:
+            def setup():
+                field.move_cool = 0
+                field.player_x = width // 2
+            results[f"MapField.update[{width}x{height}]"] = measure(field.update, iterations * 10, setup)
+        finally:
+            pygame.key.get_pressed = original
+
+
+def bench_mainmap(iterations, results): # mainmap.Game.draw
+    game = mainmap.Game()
+    for width, height in MAINMAP_SIZES:
+        game.set_map(random_map(width, height))
+        game.player_x, game.player_y = width // 2, height // 2 # カメラがマップの中ほどに来るように
+        for mode in (mainmap.RENDER_TILES, mainmap.RENDER_BAKED):
+            game.render_mode = mode
+            results[f"mainmap.Game.draw[{mode},{width}x{height}]"] = measure(game.draw, iterations, game.renderer.invalidate)
+
+
+def bench_particles(screen, iterations, results): # 火花の更新と描画
+    pool = particles.ParticlePool(rng=random.Random(0))
+    for count in PARTICLE_COUNTS:
+        def setup():
+            pool.clear()
+            pool.emit(400, 300, count, (255, 160, 40), life=(10, 20)) # 計測中に消えない長さ
+        def step():
+            pool.update(1 / 60)
+            pool.draw(screen)
+        results[f"ParticlePool.update+draw[{count}]"] = measure(step, iterations, setup)
+
+
+def bench_kouka(iterations, results): # kouka.Game の戦闘と描画
+    game = kouka.Game(seed=0)
+
+    for count in ENEMY_COUNTS:
+        def setup():
+            if not game.engine.in_battle or len(game.enemies) < count:
+                game.start_battle(False, count)
+            game.player_hp = game.player_max_hp = 10 ** 9 # 負けないようにする
+            game.player_mp = game.player_max_mp = 10 ** 9
+            game.enemies.hp[game.engine.first_target() or 0] = 10 ** 6 # 倒しきらない
+        results[f"kouka.Game.execute_turn[enemies={count}]"] = measure(
+            lambda: game.execute_turn(battle_engine.ACTION_MAGIC), iterations * 10, setup)
+
+    game.engine.logs.listeners.clear() # ログ描画を含めない
+    results["kouka.Game.gain_exp"] = measure(lambda: game.gain_exp(40), iterations * 10)
+    game.engine.logs.listeners.append(game.render_log_line)
+
+    # 状態ごとの全画面描画(差分更新を無効にして毎回描き直す)
+    game.state = kouka.STATE_MAP
+    results["kouka.Game.draw[MAP]"] = measure(game.draw, iterations, game.renderer.invalidate)
+    game.start_transition_to_battle(is_boss=False)
+    game.transition_step = kouka.SCREEN_WIDTH // 2
+    results["kouka.Game.draw[TRANSITION]"] = measure(game.draw, iterations, game.renderer.invalidate)
+    for count in ENEMY_COUNTS:
+        game.start_battle(False, count)
+        game.execute_turn(battle_engine.ACTION_ATTACK)
+        results[f"kouka.Game.draw[BATTLE,enemies={count}]"] = measure(game.draw, iterations, game.renderer.invalidate)
+
+
+def git_commit(): # 計測したコミット
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold): # 以前の結果との比較
+    """
+    戻り値:
+        threshold 倍より遅くなった項目の (名前, 以前, 今回) リスト
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    slower = []
+    for name, result in sorted(results.items()):
+        old = baseline.get(name)
+        if old is None:
+            continue
+        ratio = result["p50_us"] / old["p50_us"] if old["p50_us"] else 1.0
+        mark = "  REGRESSION" if ratio > threshold else ""
+        print(f"{name:<48} {old['p50_us']:10.1f} -> {result['p50_us']:10.1f} us  x{ratio:.2f}{mark}")
+        if ratio > threshold:
+            slower.append((name, old["p50_us"], result["p50_us"]))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="マップ・戦闘・描画のベンチマーク")
+    parser.add_argument("--iterations", type=int, default=100, help="描画の計測回数(ロジックはその10倍)")
+    parser.add_argument("--output", help="結果の出力先(JSON)。省略時は表示だけ")
+    parser.add_argument("--compare", metavar="BASELINE", help="比較する以前の結果(JSON)")
+    parser.add_argument("--threshold", type=float, default=1.25, help="この倍率より遅ければ失敗にする")
+    parser.add_argument("--only", choices=("mapfield", "mainmap", "kouka", "particles"), help="一部だけ計測する")
+    args = parser.parse_args()
+
+    pygame.init()
+    screen = pygame.display.set_mode((MapField.SCREEN_WIDTH, MapField.SCREEN_HEIGHT))
+    results = {}
+    if args.only in (None, "mapfield"):
+        bench_mapfield(screen, args.iterations, results)
+    if args.only in (None, "mainmap"):
+        bench_mainmap(args.iterations, results)
+    if args.only in (None, "kouka"):
+        bench_kouka(args.iterations, results)
+    if args.only in (None, "particles"):
+        bench_particles(pygame.display.get_surface(), args.iterations, results)
+
+    for name, result in sorted(results.items()):
+        print(f"{name:<48} p50 {result['p50_us']:10.1f} us  p90 {result['p90_us']:10.1f} us")
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "machine": platform.machine(),
+            "iterations": args.iterations,
+        },
+        "results": results,
+    }
+    if args.output:
+        output = os.path.join(START_DIR, args.output)
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"-> {output}")
+
+    if args.compare:
+        slower = compare(results, os.path.join(START_DIR, args.compare), args.threshold)
+        if slower:
+            print(f"{len(slower)} 件が {args.threshold} 倍より遅くなりました")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
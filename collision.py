@@ -0,0 +1,138 @@
+"""
+ピクセル単位の移動用の当たり判定(pygame 非依存)
+
+障害物の矩形を一定の大きさのセルに振り分けておき(空間ハッシュ)、
+移動するときは移動前後に重なるセルの障害物だけを調べる。
+移動は x 軸・y 軸の順に1軸ずつ行い、進む向きにある最も近い障害物の
+手前で止める(軸ごとのスイープAABB)ので、速く動いてもすり抜けない。
+"""
+from tilemap import FLAG_PASSABLE
+
+CELL_SIZE = 64 # セルの大きさ(px)
+
+
+class CollisionGrid: # 障害物の空間ハッシュ
+    def __init__(self, cell_size=CELL_SIZE):
+        """
+        引数:
+            cell_size: セルの大きさ(px)。障害物や移動物体と同じくらいにする
+        """
+        self.cell_size = cell_size
+        self.rects = [] # 障害物 (x, y, w, h)
+        self.tags = [] # 障害物ごとの任意の値(地形・物体の区別など)
+        self.cells = {} # (セルx, セルy) -> 障害物番号リスト
+
+    def __len__(self):
+        return len(self.rects)
+
+    def cell_range(self, x, y, w, h): # 矩形が重なるセルの範囲
+        cs = self.cell_size
+        return int(x // cs), int(y // cs), int((x + w - 1e-9) // cs), int((y + h - 1e-9) // cs)
+
+    def add(self, rect, tag=None): # 障害物の追加
+        """
+        引数:
+            rect: (x, y, w, h)
+            tag: 任意の値
+        戻り値:
+            障害物番号
+        """
+        i = len(self.rects)
+        self.rects.append(tuple(rect))
+        self.tags.append(tag)
+        cx0, cy0, cx1, cy1 = self.cell_range(*rect)
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                self.cells.setdefault((cx, cy), []).append(i)
+        return i
+
+    def add_tilemap(self, map_data, tile_size, tag="tile"): # 通れないマスを障害物にする
+        """
+        横に続く通れないマスは1つの矩形にまとめて登録する
+        引数:
+            map_data: TileMap / MappedTileMap
+            tile_size: 1マスの大きさ(px)
+        """
+        for y in range(map_data.height):
+            x = 0
+            while x < map_data.width:
+                if map_data.flags(x, y) & FLAG_PASSABLE:
+                    x += 1
+                    continue
+                start = x
+                while x < map_data.width and not map_data.flags(x, y) & FLAG_PASSABLE:
+                    x += 1
+                self.add((start * tile_size, y * tile_size, (x - start) * tile_size, tile_size), tag)
+
+    def clear(self):
+        self.rects = []
+        self.tags = []
+        self.cells = {}
+
+    def query(self, rect): # 矩形と重なるセルにある障害物
+        """
+        戻り値:
+            障害物番号の集合(実際に重なっているかは調べない)
+        """
+        found = set()
+        cells = self.cells
+        cx0, cy0, cx1, cy1 = self.cell_range(*rect)
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                ids = cells.get((cx, cy))
+                if ids:
+                    found.update(ids)
+        return found
+
+    def collides(self, rect): # 障害物と重なっているか
+        x, y, w, h = rect
+        for i in self.query(rect):
+            ox, oy, ow, oh = self.rects[i]
+            if x < ox + ow and ox < x + w and y < oy + oh and oy < y + h:
+                return True
+        return False
+
+    def sweep_x(self, x, y, w, h, dx): # x 軸方向に動ける距離
+        if dx == 0:
+            return 0
+        swept = (min(x, x + dx), y, w + abs(dx), h) # 移動前後を含む範囲
+        for i in self.query(swept):
+            ox, oy, ow, oh = self.rects[i]
+            if not (y < oy + oh and oy < y + h): # 縦に重ならない
+                continue
+            if dx > 0 and ox >= x + w:
+                dx = min(dx, ox - (x + w))
+            elif dx < 0 and ox + ow <= x:
+                dx = max(dx, ox + ow - x)
+        return dx
+
+    def sweep_y(self, x, y, w, h, dy): # y 軸方向に動ける距離
+        if dy == 0:
+            return 0
+        swept = (x, min(y, y + dy), w, h + abs(dy))
+        for i in self.query(swept):
+            ox, oy, ow, oh = self.rects[i]
+            if not (x < ox + ow and ox < x + w): # 横に重ならない
+                continue
+            if dy > 0 and oy >= y + h:
+                dy = min(dy, oy - (y + h))
+            elif dy < 0 and oy + oh <= y:
+                dy = max(dy, oy + oh - y)
+        return dy
+
+    def move(self, rect, dx, dy): # 障害物に当たるまで動かす
+        """
+        x 軸、y 軸の順に動かす(壁に沿って滑れる)
+        最初から重なっている障害物は無視するので、埋まっていても抜け出せる
+        引数:
+            rect: 移動前の (x, y, w, h)
+            dx, dy: 動かしたい量(px)
+        戻り値:
+            (移動後の x, 移動後の y, 当たったか)
+        """
+        x, y, w, h = rect
+        mx = self.sweep_x(x, y, w, h, dx)
+        x += mx
+        my = self.sweep_y(x, y, w, h, dy)
+        y += my
+        return x, y, mx != dx or my != dy
@@ -0,0 +1,102 @@
+import pygame
+
+from profiler import profiler
+
+# ウィンドウが隠れていた部分を見せるときのイベント(変化していない領域も描き直しが要る)
+EXPOSE_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWSHOWN, pygame.WINDOWRESTORED)
+
+class DirtyRenderer: # 差分矩形による画面更新
+    """
+    前フレームから変化した領域だけを記録し、pygame.display.update(rects) で転送する
+    シーンが切り替わったフレームは画面全体を flip する
+    """
+    def __init__(self, enabled=True):
+        """
+        引数:
+            enabled: False なら毎フレーム全画面を描き直して flip する
+        """
+        self.enabled = enabled # 差分更新を使うか
+        self.scene = None # 前フレームのシーン
+        self.full = True # 全画面更新が必要か
+        self.rects = [] # 今フレームの変化領域
+        self.values = {} # 領域名 -> 前フレームの値
+
+    def begin_frame(self, scene): # フレーム開始
+        """
+        フレームの最初に呼ぶ。シーンが変わっていれば全画面更新にする
+        引数:
+            scene: シーンを表す値(状態やマップIDなど)
+        戻り値:
+            全画面を描き直す必要があれば True
+        """
+        self.rects = []
+        if not self.enabled or scene != self.scene:
+            self.scene = scene
+            self.full = True
+            self.values.clear() # 新しいシーンでは前の値を使わない
+        return self.full
+
+    def invalidate(self): # 次フレームを全画面更新にする
+        self.full = True
+
+    def handle_event(self, event): # ウィンドウが再び見えたら全画面更新にする
+        """
+        戻り値:
+            全画面更新にしたら True
+        """
+        if event.type in EXPOSE_EVENTS:
+            self.invalidate()
+            return True
+        return False
+
+    def changed(self, name, value): # 値の変化確認
+        """
+        前フレームから値が変わったか調べ、今回の値を記録する
+        引数:
+            name: 領域名
+            value: 比較する値(タプルなど)
+        戻り値:
+            変化していれば True
+        """
+        if self.values.get(name, self) == value: # 初回は必ず変化扱い
+            return False
+        self.values[name] = value
+        return True
+
+    def mark(self, rect): # 変化領域の追加
+        if not self.full:
+            self.rects.append(pygame.Rect(rect))
+
+    def mark_moved(self, name, rect): # 移動した物体の領域追加
+        """
+        物体の位置が変わっていれば移動前と移動後の両方を変化領域にする
+        引数:
+            name: 物体名
+            rect: 今フレームの矩形
+        戻り値:
+            移動していれば True
+        """
+        rect = pygame.Rect(rect)
+        old = self.values.get(name)
+        if not self.changed(name, tuple(rect)):
+            return False
+        if old is not None:
+            self.mark(old)
+        self.mark(rect)
+        return True
+
+    @property
+    def needs_draw(self): # 今フレーム描画が必要か
+        return self.full or bool(self.rects)
+
+    def present(self): # 画面への転送
+        """
+        全画面更新なら flip、そうでなければ変化領域だけを転送する
+        """
+        with profiler.section("present"):
+            if self.full:
+                pygame.display.flip()
+                self.full = not self.enabled
+            elif self.rects:
+                pygame.display.update(self.rects)
+        self.rects = []
@@ -0,0 +1,127 @@
+"""
+戦闘中の敵をまとめて持つ入れ物（pygame 非依存）
+
+敵1体ごとの辞書ではなく、HP・攻撃力・経験値・演出タイマー・矩形を
+項目ごとの配列(array)で持つ。タイマーが動いている敵の番号だけを
+active に入れておくので、毎フレームの処理は演出中の敵の数で済み、
+敵を消すのは撃破演出が終わったときの1回だけになる。
+"""
+from array import array
+
+NOT_DYING = -1.0  # 撃破演出に入っていない
+TIMER_EPSILON = 1e-9  # タイマーを dt ずつ減らしたとき、これ以下なら0とみなす（丸め誤差で1更新長引かせない）
+
+
+class EnemyStore:
+    def __init__(self):
+        self.names = []
+        self.kinds = []
+        self.hp = array("i")
+        self.max_hp = array("i")
+        self.atk = array("i")
+        self.xp = array("i")
+        self.flash = array("d")  # ダメージ演出の残り時間（秒）
+        self.death = array("d")  # 撃破演出の残り時間（秒）。NOT_DYING なら生存
+        self.rect_x = array("i")
+        self.rect_y = array("i")
+        self.rect_w = array("i")
+        self.rect_h = array("i")
+        self.active = set()  # タイマーが動いている敵の番号
+        self.alive = 0  # HPが残っている敵の数
+
+    def __len__(self):
+        return len(self.hp)
+
+    def add(self, name, kind, hp, atk, xp, rect):
+        self.names.append(name)
+        self.kinds.append(kind)
+        self.hp.append(hp)
+        self.max_hp.append(hp)
+        self.atk.append(atk)
+        self.xp.append(xp)
+        self.flash.append(0.0)
+        self.death.append(NOT_DYING)
+        x, y, w, h = rect
+        self.rect_x.append(x)
+        self.rect_y.append(y)
+        self.rect_w.append(w)
+        self.rect_h.append(h)
+        self.alive += 1
+        return len(self.hp) - 1
+
+    def rect(self, i):
+        return (self.rect_x[i], self.rect_y[i], self.rect_w[i], self.rect_h[i])
+
+    def is_dying(self, i):
+        return self.death[i] != NOT_DYING
+
+    def first_alive(self):
+        """先頭から見て最初のHPが残っている敵の番号（いなければ -1）"""
+        if self.alive == 0:
+            return -1
+        for i, hp in enumerate(self.hp):
+            if hp > 0:
+                return i
+        return -1
+
+    def hit(self, i, damage, flash_time):
+        was_alive = self.hp[i] > 0
+        self.hp[i] -= damage
+        self.flash[i] = flash_time
+        self.active.add(i)
+        if was_alive and self.hp[i] <= 0:
+            self.alive -= 1
+
+    def counterattack(self, rng, miss_rate):
+        """
+        生きている敵全員の反撃
+        戻り値: (合計ダメージ, 攻撃を外した敵の番号リスト)
+        """
+        total = 0
+        missed = []
+        randint = rng.randint
+        for i, hp in enumerate(self.hp):
+            if hp <= 0:
+                continue
+            if randint(0, 100) < miss_rate:
+                missed.append(i)
+            else:
+                a = self.atk[i]
+                total += randint(a - 3, a + 3)
+        return total, missed
+
+    def tick(self, dt, death_time):
+        """
+        演出中の敵のタイマーを dt 秒進める
+        戻り値: (撃破演出に入った敵の番号リスト, 撃破演出が終わった敵の番号リスト)
+        """
+        started = []
+        finished = []
+        for i in sorted(self.active):
+            if self.flash[i] > 0:  # 1. ダメージ演出
+                left = self.flash[i] - dt
+                self.flash[i] = left if left > TIMER_EPSILON else 0.0
+            if self.hp[i] <= 0:  # 2. 死亡演出
+                if self.death[i] == NOT_DYING:
+                    self.death[i] = death_time
+                    started.append(i)
+                self.death[i] -= dt
+                if self.death[i] <= TIMER_EPSILON:
+                    finished.append(i)
+            elif self.flash[i] == 0:
+                self.active.discard(i)
+        return started, finished
+
+    def remove(self, indices):
+        """指定した敵をまとめて消す（残りの順番は保つ）"""
+        if not indices:
+            return
+        drop = set(indices)
+        keep = [i for i in range(len(self.hp)) if i not in drop]
+        remap = {old: new for new, old in enumerate(keep)}
+        self.names = [self.names[i] for i in keep]
+        self.kinds = [self.kinds[i] for i in keep]
+        for name in ("hp", "max_hp", "atk", "xp", "flash", "death", "rect_x", "rect_y", "rect_w", "rect_h"):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, (column[i] for i in keep)))
+        self.active = {remap[i] for i in self.active if i in remap}
@@ -0,0 +1,106 @@
+import json
+import os
+import time
+
+import pygame
+
+from assets import BASE_DIR
+
+FONT_NAMES = ["meiryo", "msgothic", "yugothic", "hiraginosans", "notosanscjkjp"] # 優先する日本語フォント
+CACHE_PATH = os.path.join(BASE_DIR, ".font_cache.json") # 探した結果の保存先
+CACHE_VERSION = 1
+MISS_TTL = 7 * 24 * 3600 # 見つからなかった結果を信用する期間(秒)
+
+
+class FontCache: # 日本語フォントの共有管理
+    """
+    システムフォントの一覧作成(pygame.font.get_fonts / SysFont が毎回行う走査)は遅いので、
+    見つけたフォントファイルのパスと更新時刻をディスクに保存し、次回からは走査しない
+    フォントオブジェクトはサイズごとに1回だけ作る
+    """
+    def __init__(self, names=FONT_NAMES, cache_path=CACHE_PATH):
+        """
+        引数:
+            names: 探すフォント名(先頭ほど優先)
+            cache_path: 探した結果の保存先(None なら保存しない)
+        """
+        self.names = list(names)
+        self.cache_path = cache_path
+        self.path = None # フォントファイル(None なら pygame の既定フォント)
+        self.resolved = False # 探し終わったか
+        self.scanned = False # 今回の起動でシステムフォントを走査したか
+        self.fonts = {} # サイズ -> pygame.font.Font
+
+    def load_cache(self): # 保存した結果の読み込み
+        """
+        戻り値:
+            (有効か, フォントファイルのパス)
+        """
+        if not self.cache_path:
+            return False, None
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False, None
+        if data.get("version") != CACHE_VERSION or data.get("names") != self.names:
+            return False, None
+        path = data.get("path")
+        if path is None: # 見つからなかった結果は一定期間だけ使う
+            return time.time() - data.get("checked", 0) < MISS_TTL, None
+        try:
+            if os.path.getmtime(path) != data.get("mtime"): # フォントが更新・削除されていれば探し直す
+                return False, None
+        except OSError:
+            return False, None
+        return True, path
+
+    def save_cache(self, path): # 探した結果の保存
+        if not self.cache_path:
+            return
+        data = {"version": CACHE_VERSION, "names": self.names, "path": path, "checked": time.time()}
+        if path is not None:
+            data["mtime"] = os.path.getmtime(path)
+        try:
+            with open(self.cache_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+        except OSError: # 保存できなくても次回探し直すだけ
+            pass
+
+    def resolve(self): # フォントファイルの決定
+        """
+        戻り値:
+            フォントファイルのパス(見つからなければ None)
+        """
+        if self.resolved:
+            return self.path
+        valid, path = self.load_cache()
+        if not valid:
+            path = pygame.font.match_font(self.names) # システムフォントの走査(遅い)
+            self.scanned = True
+            self.save_cache(path)
+        self.path = path
+        self.resolved = True
+        return path
+
+    def get(self, size): # フォント取得
+        """
+        引数:
+            size: 文字の大きさ
+        戻り値:
+            pygame.font.Font(同じサイズなら同じオブジェクト)
+        """
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = pygame.font.Font(self.resolve(), size)
+        return font
+
+    def clear(self): # 保存した結果を捨てて次回探し直す
+        self.fonts.clear()
+        self.path = None
+        self.resolved = False
+        if self.cache_path and os.path.exists(self.cache_path):
+            os.remove(self.cache_path)
+
+
+fonts = FontCache() # ゲーム全体で共有するフォント
@@ -0,0 +1,134 @@
+import time
+
+import pygame
+
+from profiler import profiler
+
+TICK_RATE = 60 # 1秒あたりの更新回数(シミュレーション)
+MAX_STEPS_PER_FRAME = 5 # 1描画あたりの最大更新回数
+MAX_FRAME_TIME = 0.25 # これ以上の遅れは切り捨てる(秒)
+MAX_SKIPPED_FRAMES = 5 # 連続して描画を省略してよい回数
+MAX_IDLE_WAIT = 1.0 # 止まっているときに1回で待つ最長時間(秒)
+TIMER_EPSILON = 1e-9 # 秒のタイマーを dt ずつ減らしたとき、これ以下なら0とみなす(小数の丸め誤差で1回余分に待たない)
+
+
+class FixedStepLoop: # 固定時間刻みのゲームループ
+    """
+    経過時間を貯めて(アキュムレータ)、一定の刻み dt ごとに update(dt) を呼ぶ
+    描画は1フレームに1回。処理が追いつかないときは描画を省略して更新を優先するので、
+    遅いマシンでもゲーム速度は変わらない
+    画面が止まっているときは次の入力(またはタイマー)までイベント待ちで眠る
+    """
+    def __init__(self, tick_rate=TICK_RATE, max_fps=None, max_steps=MAX_STEPS_PER_FRAME):
+        """
+        引数:
+            tick_rate: 1秒あたりの更新回数
+            max_fps: 描画の上限フレームレート(None なら上限なし)
+            max_steps: 1描画あたりの最大更新回数
+        """
+        self.dt = 1.0 / tick_rate # 1回の更新で進める時間(秒)
+        self.max_fps = max_fps
+        self.max_steps = max_steps
+        self.clock = pygame.time.Clock()
+        self.accumulator = 0.0 # 未処理の経過時間
+        self.ticks = 0 # 更新回数の合計
+        self.frames = 0 # 描画回数の合計
+        self.skipped = 0 # 描画を省略した回数の合計
+        self.consecutive_skips = 0 # 連続して描画を省略した回数
+        self.idle_waits = 0 # イベント待ちで眠った回数の合計
+        self.idle_time = 0.0 # イベント待ちで眠った時間の合計(秒)
+        self.running = True
+
+    def stop(self): # ループ終了
+        self.running = False
+
+    def step(self, frame_time, handle_events, update, draw):
+        """
+        1フレーム分の処理(入力→必要な回数の更新→描画)
+        引数:
+            frame_time: 前フレームからの経過時間(秒)
+            handle_events: 入力処理
+            update: 更新処理 update(dt)
+            draw: 描画処理
+        戻り値:
+            描画したら True
+        """
+        self.accumulator += min(frame_time, MAX_FRAME_TIME)
+        profiler.record("frame", frame_time)
+        with profiler.section("events"):
+            handle_events()
+        steps = 0
+        while self.accumulator >= self.dt and steps < self.max_steps:
+            with profiler.section("update"):
+                update(self.dt)
+            self.accumulator -= self.dt
+            self.ticks += 1
+            steps += 1
+
+        behind = self.accumulator >= self.dt # まだ更新が残っている(負荷が高い)
+        if behind and self.consecutive_skips < MAX_SKIPPED_FRAMES:
+            self.consecutive_skips += 1
+            self.skipped += 1
+            return False
+        if behind: # 追いつけない分は捨てて描画する
+            self.accumulator %= self.dt
+        self.consecutive_skips = 0
+        with profiler.section("draw"):
+            draw()
+        self.frames += 1
+        return True
+
+    def run(self, handle_events, update, draw, realtime=True, next_wake=None):
+        """
+        stop() が呼ばれるまでループする
+        引数:
+            realtime: False なら待ち時間なしで1フレーム=1更新として回す(再生・計測用)
+            next_wake: 画面が止まっているかを返す関数。描画したフレームの後に呼ぶ
+                       0 なら毎フレーム回す、秒数ならその時間(タイマー)まで、
+                       None なら入力があるまでイベント待ちで眠る
+        """
+        if not realtime:
+            while self.running:
+                self.step(self.dt, handle_events, update, draw)
+            return
+        prev = time.perf_counter()
+        while self.running:
+            now = time.perf_counter()
+            drew = self.step(now - prev, handle_events, update, draw)
+            prev = now
+            wake = next_wake() if next_wake and drew and self.ticks else 0 # 最初の更新までは眠らない
+            if wake: # 次の更新より前には起きても仕方がない
+                wake = max(wake, self.dt - self.accumulator)
+            if wake != 0 and self.running:
+                if self.wait_idle(wake): # 入力で起きたら止まっていた時間は進めない
+                    prev = time.perf_counter() - self.dt # すぐに1回更新して入力を処理する
+                continue
+            if self.max_fps:
+                self.clock.tick(self.max_fps) # 描画の上限(CPUを使いすぎない)
+            else:
+                self.clock.tick()
+
+    def wait_idle(self, timeout): # 入力かタイマーまで眠る
+        """
+        引数:
+            timeout: 待つ時間(秒)。None なら入力があるまで(ただし MAX_IDLE_WAIT ごとに起きる)
+        戻り値:
+            止まっていた時間を捨ててよければ True(入力で起きた・待つタイマーが無かった)、
+            タイマーの時間になったら False
+        """
+        limit = MAX_IDLE_WAIT if timeout is None else min(timeout, MAX_IDLE_WAIT)
+        start = time.perf_counter()
+        event = pygame.event.wait(max(1, int(limit * 1000 + 0.5)))
+        waited = time.perf_counter() - start
+        self.idle_waits += 1
+        self.idle_time += waited
+        profiler.record("idle", waited)
+        self.clock.tick() # 眠っていた時間を次の tick の待ち時間に数えない
+        if event.type == pygame.NOEVENT:
+            return timeout is None # タイマーが無ければ止まっていた時間は捨てる
+        pygame.event.post(event) # 取り出したイベントは handle_events で処理する
+        return True
+
+    @property
+    def alpha(self): # 次の更新までの割合(描画の補間用)
+        return self.accumulator / self.dt
@@ -1,11 +1,27 @@
+import math
 import os
 import pygame
 import sys
-import random
 
 
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 import MapField
+import battle_engine
+from battle_engine import BattleEngine
+from collision import CollisionGrid
+from enemy_store import EnemyStore
+from dirtyrect import DirtyRenderer
+from gameloop import TICK_RATE, FixedStepLoop
+from messagelog import MSG_CRITICAL, MSG_DEFEAT, MSG_LEVELUP, MSG_NORMAL
+from particles import ParticlePool, PopupPool
+from profiler import profiler
+from replay import HELD_KEYS, InputPlayer, InputRecorder, LiveInput
+from rng import RngStreams
+from assets import assets
+from fonts import fonts
+from textcache import text_cache
+from transition import WIPE_IRIS, WIPE_RECT, WIPES, Transition
+from world import WorldManager
 
 # --- 資料の必須要件: 実行ディレクトリをファイルのある場所に固定 ---
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
@@ -13,6 +29,9 @@ os.chdir(os.path.dirname(os.path.abspath(__file__)))
 SCREEN_WIDTH = 800  # 設定
 SCREEN_HEIGHT = 600
 FPS = 60
+BLINK_RATE = 12  # 撃破演出の点滅（1秒あたりの切り替え回数）
+TRANSITION_WAIT = 1.0  # 画面が真っ暗になってから戦闘開始までの時間（秒）
+TRANSITION_WIPES = {False: WIPE_RECT, True: WIPE_IRIS}  # ボス戦かどうか -> ワイプの形
 
 
 WHITE = (255, 255, 255)  # 色定義
@@ -46,218 +65,255 @@ MAP_VILLAGE = 0  # マップID
 MAP_FIELD = 1
 MAP_CAMPUS = 2
 
+LOG_COLORS = {  # ログの種類ごとの色
+    MSG_NORMAL: WHITE,
+    MSG_CRITICAL: YELLOW,
+    MSG_DEFEAT: (255, 100, 100),
+    MSG_LEVELUP: GOLD,  # レベルアップは金色
+}
+LOG_LINES = 5  # 表示するログの行数
+
+FIELD_TILE_SIZE = min(SCREEN_WIDTH // len(MapField.MAP_FIELD[0]),
+                      SCREEN_HEIGHT // len(MapField.MAP_FIELD))  # フィールドのタイル1マスの大きさ（MapField.MAP_FIELD が縦横とも画面に収まる）
+PLAYER_HITBOX = (20, 40, 24, 24)  # 画像内の当たり判定（足元）の位置と大きさ
+BACKGROUNDS = {  # マップごとの背景画像（無ければ単色）
+    MAP_VILLAGE: "fig/2.png",
+    MAP_CAMPUS: "fig/gray-dot3.jpg",
+}
+
+ENEMY_COLORS = {battle_engine.ENEMY_MINION: BLUE, battle_engine.ENEMY_BOSS: YELLOW}  # 敵の種類ごとの色
+
+HIT_SPARKS = 24  # 通常のヒットで飛ぶ火花の数
+CRIT_SPARKS = 120  # 会心の一撃で飛ぶ火花の数
+LEVELUP_SPARKS = 200  # レベルアップで飛ぶ火花の数
+SPARK_COLOR = (255, 160, 40)  # 火花の色
+LEVEL_TEXT_POS = {STATE_BATTLE: (60, 385), STATE_MAP: (600, 35)}  # 画面ごとの Lv 表示の中心（レベルアップ演出の位置）
+
+BATTLE_COMMANDS = (  # 戦闘中のコマンド欄（1行ずつ）: (キー, 表示するキー名, 表示名, 行動)
+    ((pygame.K_a, "A", "たたかう", battle_engine.ACTION_ATTACK),
+     (pygame.K_m, "M", "まほう(30)", battle_engine.ACTION_MAGIC),
+     (pygame.K_i, "I", "ホイミ(10)", battle_engine.ACTION_HOIMI),
+     (pygame.K_SPACE, "SPACE", "攻撃", battle_engine.ACTION_STRIKE)),
+    ((pygame.K_h, "H", "回復", battle_engine.ACTION_HEAL),
+     (pygame.K_1, "1", "回復薬", battle_engine.ACTION_POTION),
+     (pygame.K_2, "2", "攻撃力アップ", battle_engine.ACTION_ATK_UP),
+     (pygame.K_3, "3", "防御力アップ", battle_engine.ACTION_DEF_UP)),
+)
+BATTLE_KEYS = {key: action for line in BATTLE_COMMANDS for key, _, _, action in line}  # 戦闘中のキーと行動
+BATTLE_COMMAND_TEXT = ["  ".join(f"[{name}]{label}" for _, name, label, _ in line)
+                       for line in BATTLE_COMMANDS]  # コマンド欄の文字（キーの表と必ず一致させる）
+
+
+def player_stat(name):  # 戦闘エンジンのプレイヤー値を Game の属性として扱う
+    return property(lambda self: getattr(self.engine.player, name),
+                    lambda self, value: setattr(self.engine.player, name, value))
+
+
 class Game:
-    def __init__(self):
+    player_level = player_stat("level")
+    player_exp = player_stat("exp")
+    player_next_exp = player_stat("next_exp")
+    player_max_hp = player_stat("max_hp")
+    player_hp = player_stat("hp")
+    player_max_mp = player_stat("max_mp")
+    player_mp = player_stat("mp")
+    items = player_stat("items")
+
+    def __init__(self, asset_report=False, profile_csv=None, seed=None, record=None, replay=None, wipe=None):
+        self.asset_report = asset_report  # 終了時に画像の読み込み時間とメモリを表示
+        self.profile_csv = profile_csv  # 終了時に処理時間の集計を書き出すCSV
+
+        # 入力と乱数（記録ファイルを再生するときはそのシードを使う）
+        self.input = InputPlayer(replay) if replay else LiveInput()
+        if replay:
+            seed = self.input.seed
+        self.rng = RngStreams(seed)
+        if record:
+            self.input = InputRecorder(self.input, record, self.rng.seed, TICK_RATE)
+        self.replaying = bool(replay)
+
         # Pygameの初期化
         pygame.init()
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption("RPG 工科クエスト")
-        self.clock = pygame.time.Clock()
-
-        # フォント設定
-        try:
-            self.font = pygame.font.SysFont("meiryo", 32)
-            self.small_font = pygame.font.SysFont("meiryo", 24)
-            self.msg_font = pygame.font.SysFont("meiryo", 20)
-        except:
-            self.font = pygame.font.Font(None, 32)
-            self.small_font = pygame.font.Font(None, 24)
-            self.msg_font = pygame.font.Font(None, 20)
-
-        # --- 背景画像の読み込み ---
-        # 1. 最初の村
-        try:
-            self.bg_village_original = pygame.image.load("fig/2.png")
-            self.bg_village = pygame.transform.scale(self.bg_village_original, (SCREEN_WIDTH, SCREEN_HEIGHT))
-        except FileNotFoundError:
-            print("エラー: 画像が見つかりません。figフォルダに 2.png を入れてください。")
-            self.bg_village = None
-
-        # 2. キャンパス
-        try:
-            self.bg_campus_original = pygame.image.load("fig/gray-dot3.jpg")
-            self.bg_campus = pygame.transform.scale(self.bg_campus_original, (SCREEN_WIDTH, SCREEN_HEIGHT))
-        except FileNotFoundError:
-            print("エラー: 画像が見つかりません。figフォルダに gray-dot3.jpg を入れてください。")
-            self.bg_campus = None
-
-        # --- 敵画像の読み込み ---
-        self.enemy_images = []
-        self.boss_image = None
-        try:
-            # 雑魚敵用 (1と2)
-            img1 = pygame.image.load("fig/enemy_1.png").convert_alpha()
-            img1 = pygame.transform.scale(img1, (100, 100)) # 雑魚敵サイズ
-            
-            img2 = pygame.image.load("fig/enemy_2.png").convert_alpha()
-            img2 = pygame.transform.scale(img2, (100, 100)) # 雑魚敵サイズ
-            
-            self.enemy_images = [img1, img2]
+        self.loop = FixedStepLoop(max_fps=FPS)  # 固定時間刻みのループ
 
-            # ボス用 (3)
-            img3 = pygame.image.load("fig/enemy_3.png").convert_alpha()
-            self.boss_image = pygame.transform.scale(img3, (200, 200)) # ボスサイズ
-            
-        except FileNotFoundError:
-            print("警告: 敵画像(fig/enemy_*.png)が見つかりません。四角で表示します。")
+        # フォント設定（フォントファイルは前回探した結果を使う）
+        self.font = fonts.get(32)
+        self.small_font = fonts.get(24)
+        self.msg_font = fonts.get(20)
 
-        # --- プレイヤー画像の読み込み ---
+        # 背景画像は assets が最初に使われたときに読み込む（下のプロパティ参照）
         self.player_size = 64
-        try:
-            # MapFieldで使用している魔法使いの画像を読み込む
-            self.img_front = pygame.image.load("fig/map_mahou_1.png").convert_alpha()
-            self.img_back = pygame.image.load("fig/map_mahou_b_1.png").convert_alpha()
-            self.img_left = pygame.image.load("fig/map_mahou_l_1.png").convert_alpha()
-            self.img_right = pygame.image.load("fig/map_mahou_r_1.png").convert_alpha()
-            
-            # サイズ調整
-            self.img_front = pygame.transform.scale(self.img_front, (self.player_size, self.player_size))
-            self.img_back = pygame.transform.scale(self.img_back, (self.player_size, self.player_size))
-            self.img_left = pygame.transform.scale(self.img_left, (self.player_size, self.player_size))
-            self.img_right = pygame.transform.scale(self.img_right, (self.player_size, self.player_size))
-            
-            self.player_img = self.img_front 
-        except FileNotFoundError:
-            print("警告: キャラクター画像が見つかりません。")
-            self.player_img = None
 
         # プレイヤー初期設定
         self.player_pos = [400, 200]
-        self.speed = 5
+        self.speed = 300  # 移動速度（px/秒）
         
-        # ステータス初期値
-        self.player_level = 1
-        self.player_exp = 0
-        self.player_next_exp = 100
-        self.player_max_hp = 100
-        self.player_hp = 100
-        self.player_max_mp = 100
-        self.player_mp = 100
+        # ステータスと戦闘処理は戦闘エンジンが持つ
+        self.engine = BattleEngine(rng=self.rng.damage, spawn_rng=self.rng.spawn)
+        self.log_surfaces = {}  # ログの通し番号 -> 描画済みの行
+        self.engine.logs.listeners.append(self.render_log_line)  # ログ追加時に1回だけ描画
             
         # ゲーム進行管理フラグ
         self.state = STATE_MAP
         self.current_map = MAP_VILLAGE
         self.is_boss_battle = False
-        
-        
-        self.enemies = []  # 戦闘用変数
-        self.battle_logs = []
 
         self.transition_step = 0  # 遷移演出　担当田代
-        self.transition_speed = 32
+        self.transition_speed = 1920  # 黒い矩形の広がる速さ（px/秒）
         self.next_is_boss = False
+        self.transition = Transition()  # 遷移前の画面を保存してワイプを重ねる
+        self.wipe = wipe  # ワイプの形（省略時はボス戦かどうかで決める）
+
+        self.renderer = DirtyRenderer()  # 差分矩形による画面更新
+        self.particles = ParticlePool(rng=self.rng.effects)  # ヒット・レベルアップの火花
+        self.popups = PopupPool()  # 浮かび上がるダメージ数字
+
+        # マップごとの当たり判定（フィールドは MapField のタイルデータの通れないマス）
+        self.field_map = MapField.load_field_map()
+        self.collision = {MAP_FIELD: CollisionGrid()}
+        self.collision[MAP_FIELD].add_tilemap(self.field_map, FIELD_TILE_SIZE)
+        self.field_background = None  # フィールドの地形（初回描画時に作成）
+
+        # 隣のマップの画像は出口に近づいたら別スレッドで先読みする
+        self.world = self.create_world()
+
+    def create_world(self):  # マップのつながりと画像の登録
+        world = WorldManager((SCREEN_WIDTH, SCREEN_HEIGHT))
+        screen_size = (SCREEN_WIDTH, SCREEN_HEIGHT)
+        tile_size = (FIELD_TILE_SIZE, FIELD_TILE_SIZE)
+        world.add_map(MAP_VILLAGE, [(BACKGROUNDS[MAP_VILLAGE], screen_size, False)],
+                      edges={"right": MAP_FIELD})
+        world.add_map(MAP_FIELD, [(path, tile_size, True) for path in MapField.TILE_IMAGES.values()],
+                      edges={"left": MAP_VILLAGE, "right": MAP_CAMPUS},
+                      warps=[(((x + 0.5) * FIELD_TILE_SIZE, (y + 0.5) * FIELD_TILE_SIZE), MAP_CAMPUS)
+                             for x, y in MapField.WARP_POINTS])
+        world.add_map(MAP_CAMPUS, [(BACKGROUNDS[MAP_CAMPUS], screen_size, False)],
+                      edges={"left": MAP_FIELD})
+        world.on_ready = self.on_map_ready
+        world.on_release = self.on_map_release
+        return world
+
+    def on_map_ready(self, map_id):  # 先読みが終わったマップの準備
+        if map_id == MAP_FIELD:
+            self.get_field_background()  # 地形の描き込みも入る前に済ませる
+
+    def on_map_release(self, map_id):  # しばらく訪れていないマップの解放
+        if map_id == MAP_FIELD:
+            self.field_background = None
+
+    # --- 画像（初回アクセス時に読み込み） ---
+    @property
+    def bg_village(self):  # 1. 最初の村
+        return assets.scaled(BACKGROUNDS[MAP_VILLAGE], (SCREEN_WIDTH, SCREEN_HEIGHT), alpha=False, keep_source=False)
+
+    @property
+    def bg_campus(self):  # 2. キャンパス
+        return assets.scaled(BACKGROUNDS[MAP_CAMPUS], (SCREEN_WIDTH, SCREEN_HEIGHT), alpha=False, keep_source=False)
+
+    @property
+    def enemies(self):  # 戦闘中の敵
+        return self.engine.state.enemies if self.engine.state else EnemyStore()
+
+    @property
+    def battle_logs(self):
+        return self.engine.logs
+
+    def add_message(self, text, kind=MSG_NORMAL):
+        self.engine.add_message(text, kind)
+
+    def render_log_line(self, seq, kind, text):  # ログ1行の描画（追加時に1回だけ）
+        self.log_surfaces[seq] = text_cache.render(self.small_font, text, LOG_COLORS[kind])
+        self.log_surfaces.pop(seq - self.battle_logs.capacity, None)  # リングから消えた行は捨てる
 
     def get_japanese_font(self, size):
-        font_names = ["meiryo", "msgothic", "yugothic", "hiraginosans", "notosanscjkjp"]
-        available_fonts = pygame.font.get_fonts()
-        for name in font_names:
-            if name in available_fonts:
-                return pygame.font.SysFont(name, size)
-        return pygame.font.Font(None, size)
+        return fonts.get(size)
 
     def run(self):
-        while True:
-            self.handle_events()
-            self.update()
-            self.draw()
-            self.clock.tick(FPS)
+        if self.replaying:  # 再生は待ち時間なしで最後まで回す
+            self.loop.run(self.handle_events, self.update, self.draw, realtime=False)
+            self.quit()
+        self.loop.run(self.handle_events, self.update, self.draw,  # 入力→更新(固定刻み)→描画
+                      next_wake=self.next_wake)  # 止まっている画面では入力まで眠る
+
+    def next_wake(self):  # 画面が止まっているか（FixedStepLoop.run 用）
+        """
+        戻り値:
+            0 なら動いている、None なら入力があるまで何も変わらない
+        """
+        if profiler.overlay or self.input.pending:
+            return 0
+        if self.state == STATE_TRANSITION or self.particles.count or self.popups.count:  # ワイプ・火花の途中
+            return 0
+        if self.state == STATE_BATTLE and self.enemies.active:  # 点滅・撃破演出中
+            return 0
+        if self.state == STATE_MAP:
+            pressed = pygame.key.get_pressed()
+            if any(pressed[key] for key in HELD_KEYS) or self.world.loading:  # 移動中・先読み中
+                return 0
+        return None  # GAME OVER・エンディング・コマンド待ち・立ち止まり
+
+    def quit(self):
+        if self.asset_report:
+            print("\n".join(assets.report()))
+        if self.profile_csv:
+            profiler.dump_csv(self.profile_csv)
+        self.input.close()
+        self.world.close()
+        pygame.quit()
+        sys.exit()
 
     def handle_events(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            
-                pygame.quit(); sys.exit()
-            
-            if event.type == pygame.KEYDOWN:
-                if self.state == STATE_BATTLE:
-                    if event.key == pygame.K_SPACE:
-                        # 攻撃
-                        base_damage = random.randint(30, 60)
-                        damage = int(base_damage * self.atk_multiplier)
-                        self.enemy_hp -= damage
-                        self.add_message(f"こうかとんの攻撃！ {damage} のダメージ！")
-                        if self.enemy_hp > 0:
-                            self.enemy_counterattack()
-                        else:
-                            self.add_message("敵を倒した！")
-                            self.end_battle(win=True)
-
-                    elif event.key == pygame.K_h: # 回復
-                        if self.heals_left > 0:
-                            heal = random.randint(200, 400)
-                            old_hp = self.player_hp
-                            self.player_hp = min(self.player_max_hp, self.player_hp + heal)
-                            self.heals_left -= 1
-                            self.add_message(f"回復した！ +{self.player_hp - old_hp} HP")
-                            if self.enemy_hp > 0: self.enemy_counterattack()
-                        else:
-                            self.add_message("回復回数がありません！")
-
-                    # アイテム使用キー (1, 2, 3)
-                    elif event.key == pygame.K_1:
-                        if self.items["potion"] > 0:
-                            self.items["potion"] -= 1
-                            self.player_hp = min(self.player_max_hp, self.player_hp + 150)
-                            self.add_message("回復薬を使用！")
-                            if self.enemy_hp > 0: self.enemy_counterattack()
-                    elif event.key == pygame.K_2:
-                        if self.items["atk"] > 0:
-                            self.items["atk"] -= 1; self.atk_buff_turns = 3; self.atk_multiplier = 1.5
-                            self.add_message("攻撃力アップ！")
-                            if self.enemy_hp > 0: self.enemy_counterattack()
-                    elif event.key == pygame.K_3:
-                        if self.items["def"] > 0:
-                            self.items["def"] -= 1; self.def_buff_turns = 3; self.def_multiplier = 0.5
-                            self.add_message("防御力アップ！")
-                            if self.enemy_hp > 0: self.enemy_counterattack()
-
-                elif self.state in [STATE_ENDING, STATE_GAME_OVER]:
-                    if event.key == pygame.K_ESCAPE:
-                        pygame.quit(); sys.exit()
-                    if self.state == STATE_GAME_OVER and event.key == pygame.K_r:
-                        self.restart()
-    def update(self):
+                self.quit()
+            if profiler.handle_event(event):  # F3で計測結果の表示切り替え
+                self.renderer.invalidate()
+            self.renderer.handle_event(event)  # 隠れていたウィンドウが見えたら全体を描き直す
+            self.input.feed_event(event)  # キー入力は次の更新でまとめて処理する
+
+    def handle_key(self, key):  # 押されたキーの処理
+        if self.state == STATE_BATTLE:
+            action = BATTLE_KEYS.get(key)
+            if action:
+                self.engine.act(action)
+                self.check_battle_result()
+
+        elif self.state in [STATE_ENDING, STATE_GAME_OVER]:
+            if key == pygame.K_ESCAPE:
+                self.quit()
+            if self.state == STATE_GAME_OVER and key == pygame.K_r:
+                self.restart()
+
+    def update(self, dt=1 / FPS):  # dt: 経過時間（秒）
+        held, presses = self.input.poll()  # 更新1回分の入力（記録・再生の単位）
+        if self.input.finished:  # 再生終了
+            self.loop.stop()
+            return
+        for key in presses:
+            self.handle_key(key)
+
         if self.state == STATE_BATTLE:  # 敵のアニメーション処理
-            enemies_to_remove = []
-            
-            for enemy in self.enemies:
-                if enemy.get("flash_timer", 0) > 0:  # 1. ダメージ演出
-                    enemy["flash_timer"] -= 1
-                if enemy["hp"] <= 0:  # 2. 死亡演出
-                    if "death_timer" not in enemy:
-                        enemy["death_timer"] = 60 
-                        self.battle_logs.append(f"{enemy['name']}をやっつけた！")
-                    enemy["death_timer"] -= 1
-                    if enemy["death_timer"] <= 0:  # タイマー0で消滅（経験値獲得）
-                        self.gain_exp(enemy["xp"])   # 経験値処理へ
-                        enemies_to_remove.append(enemy)
-
-            for enemy in enemies_to_remove:  # リスト消滅実行
-                if enemy in self.enemies:
-                    self.enemies.remove(enemy)
-            if len(self.enemies) == 0:
-                self.end_battle(win=True)
+            self.engine.update(dt)
+            self.check_battle_result()
 
         if self.state == STATE_MAP:  # 移動画面処理
-            keys = pygame.key.get_pressed()
-            moved = False
-            
-            if keys[pygame.K_LEFT]:
-                self.player_pos[0] -= self.speed
-                moved = True
-            if keys[pygame.K_RIGHT]:
-                self.player_pos[0] += self.speed
-                moved = True
-            if keys[pygame.K_UP]:
-                self.player_pos[1] -= self.speed
-                moved = True
-            if keys[pygame.K_DOWN]:
-                self.player_pos[1] += self.speed
-                moved = True
-
+            dx = dy = 0
+            if pygame.K_LEFT in held:
+                dx -= self.speed * dt
+            if pygame.K_RIGHT in held:
+                dx += self.speed * dt
+            if pygame.K_UP in held:
+                dy -= self.speed * dt
+            if pygame.K_DOWN in held:
+                dy += self.speed * dt
+            start = tuple(self.player_pos)
+            moved = bool(dx or dy) and self.move_player(dx, dy)  # 岩に押し付けているだけなら動いていない
             self.check_map_transition()
+            moved = moved and tuple(self.player_pos) != start  # 画面端で押し戻された場合も動いていない
+            center = (self.player_pos[0] + self.player_size / 2, self.player_pos[1] + self.player_size / 2)
+            self.world.update(self.current_map, center, dt)  # 出口に近ければ隣のマップを先読み
             if moved and self.current_map == MAP_FIELD:
                 self.check_random_encounter()
             
@@ -265,41 +321,71 @@ class Game:
                 self.start_transition_to_battle(is_boss=True)
 
         if self.state == STATE_TRANSITION:  # 遷移演出
-            self.update_transition()
+            self.update_transition(dt)
+
+        self.update_effects(dt)
+
+    def update_effects(self, dt):  # 戦闘エンジンの出来事から火花と数字を出して動かす
+        for kind, rect, amount in self.engine.take_events():
+            if kind == battle_engine.EVENT_LEVELUP:
+                pos = LEVEL_TEXT_POS.get(self.state)
+                if pos is None:  # エンディングなど Lv を表示しない画面
+                    continue
+                self.particles.emit(*pos, LEVELUP_SPARKS, GOLD, speed=(80, 320), life=(0.6, 1.2),
+                                    angle=(-math.pi, 0.0))
+                self.popups.spawn(text_cache.render(self.font, "LEVEL UP!", GOLD), pos[0] + 60, pos[1] - 30)
+            else:
+                x, y, w, h = rect
+                center = (x + w / 2, y + h / 2)
+                if kind == battle_engine.EVENT_CRITICAL:
+                    self.particles.emit(*center, CRIT_SPARKS, YELLOW, speed=(120, 420), size=5)
+                    image = text_cache.render(self.font, f"{amount}!", YELLOW)
+                else:
+                    self.particles.emit(*center, HIT_SPARKS, SPARK_COLOR)
+                    image = text_cache.render(self.font, str(amount), WHITE)
+                self.popups.spawn(image, center[0], y)
+        if self.particles.count:
+            self.particles.update(dt)
+        if self.popups.count:
+            self.popups.update(dt)
+
+    def draw_effects(self):  # 火花と数字（画面の一番上に描く）
+        self.particles.draw(self.screen)
+        self.popups.draw(self.screen)
 
     
-    def gain_exp(self, amount):  # 重要：経験値とレベルアップ処理
-        self.player_exp += amount
-        self.battle_logs.append(f"{amount} Expを獲得！")
-        
-        while self.player_exp >= self.player_next_exp:  # レベルアップ判定
-            self.player_level += 1
-            self.player_exp -= self.player_next_exp # 現在のExpを消費して次のレベルへ
-            self.player_next_exp = int(self.player_next_exp * 1.5) # 必要経験値増加
-            
-            # ステータス上昇
-            self.player_max_hp += 20
-            self.player_max_mp += 10
-            
-            # 全回復（ボーナス）
-            self.player_hp = self.player_max_hp
-            self.player_mp = self.player_max_mp
-            
-            self.battle_logs.append(f"レベルアップ！ Lv{self.player_level} になった！")
-            self.battle_logs.append("最大HPとMPが増え、全回復した！")
+    def move_player(self, dx, dy):  # 障害物に当たるまでプレイヤーを動かす（実際に動いたら True）
+        before = tuple(self.player_pos)
+        grid = self.collision.get(self.current_map)
+        if grid is None:
+            self.player_pos[0] += dx
+            self.player_pos[1] += dy
+        else:
+            ox, oy, w, h = PLAYER_HITBOX
+            x, y, _ = grid.move((self.player_pos[0] + ox, self.player_pos[1] + oy, w, h), dx, dy)
+            self.player_pos[0] = x - ox
+            self.player_pos[1] = y - oy
+        return tuple(self.player_pos) != before
+
+    def gain_exp(self, amount):  # 経験値とレベルアップ処理
+        self.engine.gain_exp(amount)
 
     def start_transition_to_battle(self, is_boss):  # 遷移演出処理　担当田代
         self.state = STATE_TRANSITION
         self.transition_step = 0
         self.transition_wait_timer = 0
         self.next_is_boss = is_boss
+        self.particles.clear()  # ワイプに残らないように消す
+        self.popups.clear()
+        self.draw_map_elements()  # 遷移前のマップ画面を1回だけ描いて保存する
+        self.transition.start(self.screen, self.wipe or TRANSITION_WIPES[is_boss])
 
-    def update_transition(self):  # 遷移演出　担当田代
+    def update_transition(self, dt):  # 遷移演出　担当田代
         if self.transition_step < SCREEN_WIDTH + 100:  # 画面より大きくなるまで広げる
-            self.transition_step += self.transition_speed
+            self.transition_step += int(self.transition_speed * dt)
         else:  # 画面が真っ暗になったらタイマーを作動させる
-            self.transition_wait_timer += 1
-            if self.transition_wait_timer > 60:  # 60フレーム（約1秒）待ったら戦闘開始
+            self.transition_wait_timer += dt
+            if self.transition_wait_timer > TRANSITION_WAIT:  # 約1秒待ったら戦闘開始
                 self.start_battle(self.next_is_boss)
         
     def check_map_transition(self):  # 画面端でのマップ切り替え
@@ -317,115 +403,29 @@ class Game:
         if self.player_pos[1] > SCREEN_HEIGHT - self.player_size: self.player_pos[1] = SCREEN_HEIGHT - self.player_size
 
     def check_random_encounter(self):
-        if random.randint(0, 100) < 1:
+        if self.rng.encounter.randint(0, 100) < 1:
             self.start_transition_to_battle(is_boss=False)
 
-    def start_battle(self, is_boss):
+    def start_battle(self, is_boss, num_enemies=None):  # num_enemies: 雑魚敵の数（省略時はランダム）
         self.state = STATE_BATTLE
         self.is_boss_battle = is_boss
-        self.heals_left = 5 if is_boss else 3
-        self.message_log = []
-        self.enemies = []
-        
-        if is_boss:
-            self.enemy_hp = 200
-            self.add_message("ボスが現れた！")
-            self.enemies.append({
-                "name": "BOSS", 
-                "hp": 1000, 
-                "max_hp": 1000, 
-                "color": YELLOW, 
-                "rect": pygame.Rect(300, 50, 200, 200),
-                "img": self.boss_image 
-            })
-        else:
-            num_enemies = random.randint(1, 3)
-            for i in range(num_enemies):
-                x_pos = 150 + i * 180
-                self.enemies.append({
-                    "name": f"課題{i+1}",
-                    "hp": 50, "max_hp": 50, "atk": 10, "xp": 40, # 雑魚は40Exp
-                    "color": BLUE, "rect": pygame.Rect(x_pos, 100, 100, 100),
-                    "flash_timer": 0
-                })
-    
+        self.engine.start_battle(is_boss, num_enemies)
+
     def execute_turn(self, action_type):
-        self.battle_logs = [] 
-        valid_targets = [e for e in self.enemies if e["hp"] > 0]
+        self.engine.act(action_type)
+        self.check_battle_result()
 
-        if not valid_targets and len(self.enemies) == 0:
+    def check_battle_result(self):  # 戦闘エンジンの勝敗を画面状態に反映
+        if self.state != STATE_BATTLE or self.engine.state is None:
             return
-
-        # --- プレイヤー行動 ---
-        # レベルに応じた威力補正
-        level_bonus = (self.player_level - 1) * 2
-
-        if action_type == "HOIMI":
-            if self.player_mp >= 10:
-                self.player_mp -= 10
-                base_heal = random.randint(30, 50)
-                heal_amount = base_heal + level_bonus # レベルで回復量も増える
-                
-                old_hp = self.player_hp
-                self.player_hp = min(self.player_max_hp, self.player_hp + heal_amount)
-                recovered = self.player_hp - old_hp
-                self.battle_logs.append(f"ホイミ！ HPが{recovered}回復！")
-            else:
-                self.battle_logs.append("MPが足りない！")
-
-        elif action_type == "MAGIC":
-            if self.player_mp >= 30:
-                if valid_targets:
-                    target = valid_targets[0]
-                    self.player_mp -= 30
-                    
-                    base_dmg = random.randint(50, 80)
-                    damage = base_dmg + (level_bonus * 2) # 魔法はレベル恩恵大
-                    
-                    if random.randint(0, 100) < 10:
-                        damage = int(damage * 1.5)
-                        self.battle_logs.append("会心の一撃！！")
-                    
-                    target["hp"] -= damage
-                    target["flash_timer"] = 10 
-                    self.battle_logs.append(f"魔法攻撃！{target['name']}に{damage}ダメ！")
-            else:
-                self.battle_logs.append("MPが足りない！")
-
-        elif action_type == "ATTACK":
-            if valid_targets:
-                target = valid_targets[0]
-                base_dmg = random.randint(20, 30)
-                damage = base_dmg + level_bonus
-
-                if random.randint(0, 100) < 15:
-                    damage = damage * 2
-                    self.battle_logs.append("会心の一撃！！")
-
-                target["hp"] -= damage
-                target["flash_timer"] = 10 
-                self.battle_logs.append(f"攻撃！ {target['name']}に{damage}ダメ！")
-
-        # --- 敵の反撃 ---
-        surviving_enemies = [e for e in self.enemies if e["hp"] > 0]
-        total_dmg = 0
-        for enemy in surviving_enemies:
-            hit_chance = random.randint(0, 100)
-            if hit_chance < 20: 
-                self.battle_logs.append(f"{enemy['name']}の攻撃ミス！")
-            else:
-                dmg = random.randint(enemy["atk"] - 3, enemy["atk"] + 3)
-                total_dmg += dmg
-        
-        if total_dmg > 0:
-            self.player_hp -= total_dmg
-            self.battle_logs.append(f"敵の攻撃！ 計{total_dmg}のダメージ！")
-
-        if self.player_hp <= 0:
-            self.player_hp = 0
+        result = self.engine.state.result
+        if result == battle_engine.RESULT_WIN:
+            self.end_battle(win=True)
+        elif result == battle_engine.RESULT_LOSE:
             self.end_battle(win=False)
 
     def end_battle(self, win):
+        self.engine.end_battle(win)
         if win:
             if self.is_boss_battle:
                 self.state = STATE_ENDING
@@ -434,19 +434,90 @@ class Game:
         else:
             self.state = STATE_GAME_OVER
 
+    def restart(self):  # GAME OVER からのリトライ（村に戻りHP回復）
+        self.engine.restore()
+        self.current_map = MAP_VILLAGE
+        self.player_pos = [400, 200]
+        self.state = STATE_MAP
+
+    def get_field_background(self):  # フィールドの地形（1回だけ描く）
+        if self.field_background is None:
+            surf = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+            surf.fill(GREEN)
+            ts = FIELD_TILE_SIZE
+            images = {tile_id: assets.scaled(path, (ts, ts)) for tile_id, path in MapField.TILE_IMAGES.items()}
+            for y in range(self.field_map.height):
+                for x, tile in enumerate(self.field_map.row(y)):
+                    if images.get(tile):
+                        surf.blit(images[tile], (x * ts, y * ts))
+                    elif tile:  # 画像が無ければ色で描く（草は地の色）
+                        surf.fill(MapField.COLORS[tile], (x * ts, y * ts, ts, ts))
+            self.field_background = surf
+        return self.field_background
+
     def draw_map_elements(self):
         color = GREEN
         if self.current_map == MAP_VILLAGE: color = (100, 200, 100)
         elif self.current_map == MAP_CAMPUS: color = GRAY
-        pygame.draw.rect(self.screen, color, (0, 0, SCREEN_WIDTH, SCREEN_HEIGHT))
+        background = None
+        if self.current_map == MAP_FIELD:
+            background = self.get_field_background()
+        elif self.current_map == MAP_VILLAGE:
+            background = self.bg_village
+        elif self.current_map == MAP_CAMPUS:
+            background = self.bg_campus
+        if background:
+            self.screen.blit(background, (0, 0))
+        else:
+            pygame.draw.rect(self.screen, color, (0, 0, SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.draw.rect(self.screen, RED, (*self.player_pos, self.player_size, self.player_size))
         
         # マップ画面のステータス表示
         status_str = f"Lv:{self.player_level}  HP:{self.player_hp}/{self.player_max_hp}"
-        status = self.font.render(status_str, True, BLACK)
+        status = text_cache.render(self.font, status_str, BLACK)
         self.screen.blit(status, (550, 20))
 
+    def mark_dirty_regions(self):  # 前フレームから変化した領域の登録
+        r = self.renderer
+        if self.state == STATE_MAP:
+            r.mark_moved("player", (*self.player_pos, self.player_size, self.player_size))
+            if r.changed("status", (self.player_level, self.player_hp, self.player_max_hp)):
+                r.mark((550, 20, SCREEN_WIDTH - 550, 40))
+
+        elif self.state == STATE_BATTLE:
+            enemies = self.enemies
+            enemy_view = (  # HP・点滅中かどうか・撃破演出の点滅状態（描画で使う状態だけ比べる）
+                bytes(enemies.hp), tuple(f > 0 for f in enemies.flash),
+                tuple(int(t * BLINK_RATE) % 2 for t in enemies.death),
+            )
+            if r.changed("enemies", enemy_view):  # 敵のHPバー・点滅
+                r.mark((0, 0, SCREEN_WIDTH, 350))
+            hud = (self.player_level, self.player_exp, self.player_next_exp,
+                   self.player_hp, self.player_max_hp, self.player_mp, self.player_max_mp)
+            if r.changed("hud", hud):  # ステータス欄
+                r.mark((0, 350, SCREEN_WIDTH, 100))
+            if r.changed("logs", (self.battle_logs.seq, len(self.battle_logs))):  # ログ欄
+                r.mark((0, 450, SCREEN_WIDTH, SCREEN_HEIGHT - 450))
+
+        elif self.state == STATE_TRANSITION:
+            for rect in self.transition.dirty_rects(self.transition_progress()):  # 黒くなった部分
+                r.mark(rect)
+
+        if self.state != STATE_TRANSITION:  # 火花と数字（前フレームの位置も消す）
+            r.mark_moved("sparks", self.particles.bounds() or (0, 0, 0, 0))
+            r.mark_moved("popups", self.popups.bounds() or (0, 0, 0, 0))
+
+    def transition_progress(self):  # 遷移演出の進み具合（0〜1）
+        return min(1.0, self.transition_step / SCREEN_WIDTH)
+
     def draw(self):
+        self.renderer.begin_frame((self.state, self.current_map))  # シーンが変われば全画面更新
+        self.mark_dirty_regions()
+        if profiler.overlay:  # 計測結果の表示中は毎フレーム更新
+            self.renderer.mark(profiler.overlay_rect())
+        if not self.renderer.needs_draw:  # 何も変わっていなければ描画しない
+            return
+
         #self.screen.fill(BLACK)  各状態で背景を描く
         if self.state == STATE_MAP:
             self.screen.fill(BLACK)
@@ -454,20 +525,22 @@ class Game:
 
         elif self.state == STATE_BATTLE:
             self.screen.fill(BLACK)
-            for enemy in self.enemies:
-                if "death_timer" in enemy:
-                    if (enemy["death_timer"] // 5) % 2 == 0:
-                        pygame.draw.rect(self.screen, (100, 0, 0), enemy["rect"])
+            enemies = self.enemies
+            for i in range(len(enemies)):
+                rect = pygame.Rect(enemies.rect(i))
+                if enemies.is_dying(i):
+                    if int(enemies.death[i] * BLINK_RATE) % 2 == 0:
+                        pygame.draw.rect(self.screen, (100, 0, 0), rect)
                 else:
-                    draw_color = enemy["color"]
-                    if enemy.get("flash_timer", 0) > 0:
+                    draw_color = ENEMY_COLORS[enemies.kinds[i]]
+                    if enemies.flash[i] > 0:
                         draw_color = FLASH_COLOR
-                    pygame.draw.rect(self.screen, draw_color, enemy["rect"])
+                    pygame.draw.rect(self.screen, draw_color, rect)
                     
-                    if enemy["hp"] > 0:
-                        hp_rate = max(0, enemy["hp"] / enemy["max_hp"])
-                        pygame.draw.rect(self.screen, RED, (enemy["rect"].x, enemy["rect"].y - 10, enemy["rect"].width, 5))
-                        pygame.draw.rect(self.screen, GREEN, (enemy["rect"].x, enemy["rect"].y - 10, enemy["rect"].width * hp_rate, 5))
+                    if enemies.hp[i] > 0:
+                        hp_rate = max(0, enemies.hp[i] / enemies.max_hp[i])
+                        pygame.draw.rect(self.screen, RED, (rect.x, rect.y - 10, rect.width, 5))
+                        pygame.draw.rect(self.screen, GREEN, (rect.x, rect.y - 10, rect.width * hp_rate, 5))
 
             # UI描画
             ui_y_start = 350
@@ -481,64 +554,58 @@ class Game:
             # LvとExp
             lv_text = f"Lv: {self.player_level}"
             exp_text = f"Exp: {self.player_exp}/{self.player_next_exp}"
-            self.screen.blit(self.font.render(lv_text, True, GOLD), (30, ui_y_start + 15))
-            self.screen.blit(self.small_font.render(exp_text, True, WHITE), (120, ui_y_start + 20))
+            self.screen.blit(text_cache.render(self.font, lv_text, GOLD), (30, ui_y_start + 15))
+            self.screen.blit(text_cache.render(self.small_font, exp_text, WHITE), (120, ui_y_start + 20))
 
             # HPとMP
             hp_text = f"HP: {self.player_hp}/{self.player_max_hp}"
             mp_text = f"MP: {self.player_mp}/{self.player_max_mp}"
-            self.screen.blit(self.font.render(hp_text, True, hp_color), (300, ui_y_start + 15))
-            self.screen.blit(self.font.render(mp_text, True, CYAN), (550, ui_y_start + 15))
+            self.screen.blit(text_cache.render(self.font, hp_text, hp_color), (300, ui_y_start + 15))
+            self.screen.blit(text_cache.render(self.font, mp_text, CYAN), (550, ui_y_start + 15))
 
             # コマンド
-            cmd_text = "[A]たたかう  [M]まほう(30)  [H]ホイミ(10)"
-            self.screen.blit(self.font.render(cmd_text, True, YELLOW), (30, ui_y_start + 60))
+            for i, cmd_text in enumerate(BATTLE_COMMAND_TEXT):
+                self.screen.blit(text_cache.render(self.small_font, cmd_text, YELLOW), (30, ui_y_start + 50 + i * 24))
 
             # 区切り線
             line_y = ui_y_start + 100
             pygame.draw.line(self.screen, WHITE, (0, line_y), (SCREEN_WIDTH, line_y), 1)
 
             # ログ
-            display_logs = self.battle_logs[-5:] 
-            for i, log in enumerate(display_logs):
-                log_color = WHITE
-                if "会心" in log: log_color = YELLOW
-                if "やっつけた" in log: log_color = (255, 100, 100)
-                if "レベルアップ" in log: log_color = GOLD # レベルアップは金色
-                
-                txt = self.small_font.render(log, True, log_color)
-                self.screen.blit(txt, (30, line_y + 10 + i * 28))
+            for i, (seq, kind, log) in enumerate(self.battle_logs.latest(LOG_LINES)):
+                self.screen.blit(self.log_surfaces[seq], (30, line_y + 10 + i * 28))
 
         elif self.state == STATE_TRANSITION:
-            self.draw_map_elements()  # 中央から広がる黒い矩形を描く
-            rect_w = self.transition_step
-            rect_h = int(self.transition_step * (SCREEN_HEIGHT / SCREEN_WIDTH))
-            
-            # 中央座標
-            center_x = SCREEN_WIDTH // 2
-            center_y = SCREEN_HEIGHT // 2
-            
-            # Rect作成（中央から広げる計算）
-            black_rect = pygame.Rect(
-                center_x - rect_w // 2,
-                center_y - rect_h // 2,
-                rect_w,
-                rect_h
-            )
-            pygame.draw.rect(self.screen, BLACK, black_rect)
+            # 保存したマップ画面にワイプを重ねる（全画面更新でなければ変わった部分だけ）
+            self.transition.draw(self.screen, self.transition_progress(), full=self.renderer.full)
 
         elif self.state == STATE_ENDING:
             self.screen.fill(WHITE)
-            msg = self.font.render("MISSION COMPLETE!", True, BLACK)
+            msg = text_cache.render(self.font, "MISSION COMPLETE!", BLACK)
             self.screen.blit(msg, (200, 300))
 
         elif self.state == STATE_GAME_OVER:
             self.screen.fill(BLACK)
-            msg = self.font.render("GAME OVER...", True, RED)
+            msg = text_cache.render(self.font, "GAME OVER...", RED)
             self.screen.blit(msg, (300, 300))
 
-        pygame.display.flip()
+        if self.state != STATE_TRANSITION:
+            self.draw_effects()
+        profiler.draw_overlay(self.screen)
+        self.renderer.present()
 
 if __name__ == "__main__":
-    game = Game()
+    import argparse
+    parser = argparse.ArgumentParser(description="RPG 工科クエスト")
+    parser.add_argument("--asset-report", action="store_true", help="終了時に画像の読み込み時間とメモリを表示")
+    parser.add_argument("--profile-csv", metavar="PATH", help="終了時に処理段階ごとの時間をCSVに書き出す")
+    parser.add_argument("--seed", type=int, help="乱数のシード")
+    parser.add_argument("--record", metavar="PATH", help="入力を記録する")
+    parser.add_argument("--replay", metavar="PATH", help="記録した入力を画面なしで最速再生する")
+    parser.add_argument("--wipe", choices=WIPES, help="戦闘に入るときのワイプの形")
+    args = parser.parse_args()
+    if args.replay:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"  # 画面を開かずに再生
+    game = Game(asset_report=args.asset_report, profile_csv=args.profile_csv,
+                seed=args.seed, record=args.record, replay=args.replay, wipe=args.wipe)
     game.run()
\ No newline at end of file
@@ -1,8 +1,15 @@
 import pygame
 import sys
-import random
 import os
 
+from assets import assets
+from dirtyrect import DirtyRenderer
+from gameloop import TIMER_EPSILON, FixedStepLoop
+from profiler import profiler
+from rng import RngStreams
+from maplayer import StaticMapLayer
+from tilemap import FLAG_ENCOUNTER, FLAG_PASSABLE, TileMap
+
 # =====================
 # 基本設定
 # =====================
@@ -11,6 +18,11 @@ SCREEN_HEIGHT = 600 #画面高
 TILE_SIZE = 64 # タイルサイズ 
 FPS = 60 # フレームレート
 
+RENDER_TILES = "tiles" # 毎フレーム全タイルを描画
+RENDER_BAKED = "baked" # 事前描画した地形レイヤーを貼る
+BAKE_ALL_LIMIT = 64 * 64 # これ以下のマス数なら読み込み時に全体を焼き込む
+LAYER_MAX_CHUNKS = 12 # 大きなマップで保持する焼き込み済みチャンク数
+
 # =====================
 # 色（画像が無い時の代用）
 # =====================
@@ -53,21 +65,22 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 # ゲーム本体
 # =====================
 class Game:
-    def __init__(self): # 初期化
+    def __init__(self, seed=None): # 初期化
         pygame.init() # pygame初期化
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT)) # 画面設定
         pygame.display.set_caption("ドラクエ風タイルRPG") # タイトル設定
-        self.clock = pygame.time.Clock() # クロック設定
+        self.loop = FixedStepLoop(max_fps=FPS) # 固定時間刻みのループ
+        self.rng = RngStreams(seed) # サブシステムごとの乱数列
 
-        self.map_data = MAP_VILLAGE # マップデータ
+        self.map_data = TileMap.from_rows(MAP_VILLAGE) # マップデータ
 
         # プレイヤー（マス座標）
         self.player_x = 1 # 初期X座標
         self.player_y = 1 # 初期Y座標
 
         # 移動制御（押しっぱなし用）
-        self.MOVE_INTERVAL_FIRST = 6   # 押し始め（遅い）
-        self.MOVE_INTERVAL_REPEAT = 6   # 押しっぱなし（速い）
+        self.MOVE_INTERVAL_FIRST = 0.1   # 押し始め（遅い）（秒）
+        self.MOVE_INTERVAL_REPEAT = 0.1   # 押しっぱなし（速い）（秒）
         self.move_cooltime = 0
         self.moving = False
 
@@ -75,16 +88,38 @@ class Game:
         self.tile_images = self.load_tiles() # タイル画像
         self.player_image = self.load_image("fig/map_yuusha_1.png") # プレイヤー画像
 
+        # 地形の事前描画
+        self.render_mode = RENDER_BAKED # 描画方式
+        self.static_layer = None # 事前描画した地形レイヤー
+        self.layer_version = None # 地形レイヤーに焼き込んだ地形の版
+        self.renderer = DirtyRenderer() # 差分矩形による画面更新
+        self.set_map(self.map_data)
+
+    # ---------------------
+    # マップ切り替え
+    # ---------------------
+    def set_map(self, map_data): # マップ読み込み
+        self.map_data = map_data
+        if map_data.width * map_data.height <= BAKE_ALL_LIMIT:
+            self.static_layer = StaticMapLayer(map_data, TILE_SIZE, self.tile_images.get, COLORS)
+            self.static_layer.bake_all() # 読み込み時に地形を焼き込む
+        else: # 大きなマップは見えたチャンクだけ焼き込み、古いものは捨てる
+            self.static_layer = StaticMapLayer(map_data, TILE_SIZE, self.tile_images.get, COLORS,
+                                               max_chunks=LAYER_MAX_CHUNKS)
+        self.layer_version = map_data.version
+        self.renderer.invalidate() # マップが変わったら全体を更新
+
     # ---------------------
     # 画像ロード共通
     # ---------------------
     def load_image(self, relative_path):
         path = os.path.join(BASE_DIR, relative_path)
-        if not os.path.exists(path):
+        img = assets.image(relative_path) # 共有の画像管理から取得(初回のみ読み込み)
+        if img is None:
             print("画像が見つかりません:", path)
             return None
         print("画像読み込み成功:", path)
-        return pygame.image.load(path).convert_alpha()
+        return img
     
 
     def load_tiles(self): # タイル画像ロード
@@ -100,11 +135,20 @@ class Game:
     # メインループ
     # ---------------------
     def run(self): # メインループ
-        while True: # 無限ループ
-            self.handle_events()
-            self.update()
-            self.draw()
-            self.clock.tick(FPS)
+        self.loop.run(self.handle_events, self.update, self.draw, # 入力→更新(固定刻み)→描画
+                      next_wake=self.next_wake) # 立ち止まっている間は入力まで眠る
+
+    def next_wake(self): # 画面が止まっているか（FixedStepLoop.run 用）
+        """
+        戻り値:
+            0 なら動いている、None なら入力があるまで何も変わらない
+        """
+        if profiler.overlay or self.move_cooltime > 0:
+            return 0
+        keys = pygame.key.get_pressed()
+        if keys[pygame.K_LEFT] or keys[pygame.K_RIGHT] or keys[pygame.K_UP] or keys[pygame.K_DOWN]:
+            return 0
+        return None
 
     # ---------------------
     # 入力処理（DQ風）
@@ -114,12 +158,17 @@ class Game:
             if event.type == pygame.QUIT: # 終了イベント
                 pygame.quit() # pygame終了
                 sys.exit() # プログラム終了
+            if profiler.handle_event(event): # F3で計測結果の表示切り替え
+                self.renderer.invalidate()
+            self.renderer.handle_event(event) # 隠れていたウィンドウが見えたら全体を描き直す
     # ---------------------
     # 更新処理（押しっぱなし移動）
     # ---------------------
-    def update(self):
+    def update(self, dt=1 / FPS): # dt: 経過時間（秒）
         if self.move_cooltime > 0:
-            self.move_cooltime -= 1
+            self.move_cooltime -= dt
+            if self.move_cooltime <= TIMER_EPSILON:  # 丸め誤差が残っても次の更新で動けるようにする
+                self.move_cooltime = 0
             return
 
         keys = pygame.key.get_pressed()
@@ -152,46 +201,75 @@ class Game:
         nx = self.player_x + dx # 新X座標
         ny = self.player_y + dy # 新Y座標
 
-        if 0 <= ny < len(self.map_data) and 0 <= nx < len(self.map_data[0]): # 範囲内チェック
-            tile = self.map_data[ny][nx] # タイルID取得
+        flags = self.map_data.flags(nx, ny) # タイルのフラグ取得（範囲外は0）
 
-            # 通行可能タイル
-            if tile in [0, 1]: # 草・土のみ通行可能
-                self.player_x = nx # 移動確定
-                self.player_y = ny # 移動確定
+        # 通行可能タイル
+        if flags & FLAG_PASSABLE: # 草・土のみ通行可能
+            self.player_x = nx # 移動確定
+            self.player_y = ny # 移動確定
 
-                # ランダムエンカウント（例）
-                if tile == 0 and random.randint(0, 100) < 5: # 草タイルで5%の確率
-                    print("敵が現れた！（仮）") # エンカウントメッセージ
-                return True # 移動成功
+            # ランダムエンカウント（例）
+            if flags & FLAG_ENCOUNTER and self.rng.encounter.randint(0, 100) < 5: # 草タイルで5%の確率
+                print("敵が現れた！（仮）") # エンカウントメッセージ
+            return True # 移動成功
         return False # 移動失敗
 
+    # ---------------------
+    # カメラ
+    # ---------------------
+    def get_camera(self): # カメラ位置計算
+        """
+        プレイヤーを画面中央に置き、マップの端では止める
+        戻り値:
+            (camera_x, camera_y) カメラ左上のワールド座標(px)
+        """
+        map_width = self.map_data.width * TILE_SIZE # マップ幅(px)
+        map_height = self.map_data.height * TILE_SIZE # マップ高さ(px)
+        camera_x = self.player_x * TILE_SIZE - SCREEN_WIDTH // 2
+        camera_y = self.player_y * TILE_SIZE - SCREEN_HEIGHT // 2
+        camera_x = max(0, min(camera_x, map_width - SCREEN_WIDTH))
+        camera_y = max(0, min(camera_y, map_height - SCREEN_HEIGHT))
+        return camera_x, camera_y
+
+    def visible_tiles(self, camera_x, camera_y): # 画面に映るマスの範囲
+        """
+        戻り値:
+            (x0, y0, x1, y1) x0 <= x < x1, y0 <= y < y1 のマスが映る
+        """
+        x0, y0 = max(0, camera_x // TILE_SIZE), max(0, camera_y // TILE_SIZE)
+        x1 = min(self.map_data.width, (camera_x + SCREEN_WIDTH - 1) // TILE_SIZE + 1)
+        y1 = min(self.map_data.height, (camera_y + SCREEN_HEIGHT - 1) // TILE_SIZE + 1)
+        return x0, y0, x1, y1
+
     # ---------------------
     # 描画
     # ---------------------
     def draw(self): # 描画処理
+        self.renderer.begin_frame("map") # 差分更新の開始
+        camera_x, camera_y = self.get_camera() # カメラ位置計算
+        if self.renderer.changed("camera", (camera_x, camera_y)): # カメラが動いたら全体を更新
+            self.renderer.invalidate()
+        if self.layer_version != self.map_data.version: # 地形が変わったら焼き直して全体を更新
+            self.static_layer.invalidate()
+            self.layer_version = self.map_data.version
+            self.renderer.invalidate()
+        px = self.player_x * TILE_SIZE - camera_x # 画面X座標
+        py = self.player_y * TILE_SIZE - camera_y # 画面Y座標
+        self.renderer.mark_moved("player", (px, py, TILE_SIZE, TILE_SIZE)) # プレイヤーの移動前後
+        if profiler.overlay: # 計測結果の表示中は毎フレーム更新
+            self.renderer.mark(profiler.overlay_rect())
+        if not self.renderer.needs_draw: # 何も変わっていなければ描画しない
+            return
+
         self.screen.fill((0, 0, 0)) # 画面クリア
 
         # マップ描画
-        for y, row in enumerate(self.map_data): # 行ループ
-            for x, tile_id in enumerate(row): # 列ループ
-                px = x * TILE_SIZE # 画面X座標
-                py = y * TILE_SIZE # 画面Y座標
-
-                img = self.tile_images.get(tile_id) # タイル画像取得
-                if img: # 画像がある場合
-                    self.screen.blit(img, (px, py)) # 画像描画
-                else: # 画像が無い場合
-                    pygame.draw.rect( # タイル描画
-                        self.screen, # 画面
-                        COLORS[tile_id], # 色
-                        (px, py, TILE_SIZE, TILE_SIZE) # 四角形
-                    )
+        if self.render_mode == RENDER_BAKED: # 焼き込み済みレイヤーを貼るだけ
+            self.static_layer.draw(self.screen, camera_x, camera_y)
+        else:
+            self.draw_tiles(camera_x, camera_y)
 
         # プレイヤー描画
-        px = self.player_x * TILE_SIZE # 画面X座標
-        py = self.player_y * TILE_SIZE # 画面Y座標
-
         if self.player_image:
             img = pygame.transform.scale(
                 self.player_image,
@@ -205,7 +283,25 @@ class Game:
                 (px, py, TILE_SIZE, TILE_SIZE) # 四角形
             )
 
-        pygame.display.flip() # 画面更新
+        profiler.draw_overlay(self.screen) # 計測結果の表示
+        self.renderer.present() # 変化した領域だけ画面更新
+
+    def draw_tiles(self, camera_x, camera_y): # 画面に映るタイルだけを1枚ずつ描画
+        x0, y0, x1, y1 = self.visible_tiles(camera_x, camera_y)
+        for y in range(y0, y1): # 行ループ(画面内の行だけ)
+            py = y * TILE_SIZE - camera_y # 画面Y座標
+            for i, tile_id in enumerate(self.map_data.row(y, x0, x1)): # 列ループ(画面内の列だけ)
+                px = (x0 + i) * TILE_SIZE - camera_x # 画面X座標
+
+                img = self.tile_images.get(tile_id) # タイル画像取得
+                if img: # 画像がある場合
+                    self.screen.blit(img, (px, py)) # 画像描画
+                else: # 画像が無い場合
+                    pygame.draw.rect( # タイル描画
+                        self.screen, # 画面
+                        COLORS[tile_id], # 色
+                        (px, py, TILE_SIZE, TILE_SIZE) # 四角形
+                    )
 
 # =====================
 # 起動
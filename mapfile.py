@@ -0,0 +1,248 @@
+"""
+マップのバイナリ形式とチャンク読み込み
+
+形式(リトルエンディアン):
+    ヘッダ  : マジック "KQMP", 版, チャンク一辺のマス数, 幅, 高さ, ワープ地点数
+    ワープ  : (x, y) をワープ地点数だけ
+    チャンク: チャンク一辺^2 バイトのタイルIDを、チャンク行優先で並べる
+              (マップ端のチャンクは 0 で埋める)
+
+MappedTileMap は mmap でファイルを開き、カメラ付近のチャンクだけを
+メモリに展開して遠いチャンクは捨てる。マップが大きくなっても
+起動時間とメモリは増えない。
+
+使い方:
+    python mapfile.py maps/field.kqm                 # MAP_FIELD を書き出す
+    python mapfile.py maps/big.kqm --random 2000 2000 # 試験用の大きなマップ
+"""
+import mmap
+import random
+import struct
+from collections import OrderedDict
+
+from tilemap import FLAG_ENCOUNTER, FLAG_PASSABLE, FLAG_WARP, TILE_FLAGS
+
+MAGIC = b"KQMP"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIII") # マジック, 版, チャンク一辺, 幅, 高さ, ワープ地点数
+WARP = struct.Struct("<II")
+CHUNK_SIZE = 32 # 既定のチャンク一辺(マス)
+
+
+def write_map(path, tilemap, chunk_size=CHUNK_SIZE, warps=()):
+    """
+    タイルマップをバイナリ形式で書き出す
+    引数:
+        path: 出力先
+        tilemap: TileMapオブジェクト
+        chunk_size: チャンク一辺のマス数
+        warps: ワープ地点 (x, y) のリスト
+    """
+    cols = (tilemap.width + chunk_size - 1) // chunk_size
+    rows = (tilemap.height + chunk_size - 1) // chunk_size
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, chunk_size, tilemap.width, tilemap.height, len(warps)))
+        for x, y in warps:
+            f.write(WARP.pack(x, y))
+        for cy in range(rows):
+            for cx in range(cols):
+                chunk = bytearray(chunk_size * chunk_size)
+                x0 = cx * chunk_size
+                x1 = min(x0 + chunk_size, tilemap.width)
+                for ly in range(chunk_size):
+                    y = cy * chunk_size + ly
+                    if y >= tilemap.height:
+                        break
+                    chunk[ly * chunk_size:ly * chunk_size + (x1 - x0)] = tilemap.row(y, x0, x1)
+                f.write(chunk)
+
+
+class MappedTileMap: # mmap で開くチャンク読み込み式タイルマップ
+    """
+    TileMap と同じ参照方法(get / flags / is_passable / row など)を持つ
+    チャンクは参照されたときに読み込み、update_camera で遠いものを捨てる
+    """
+    def __init__(self, path, tile_flags=TILE_FLAGS, max_chunks=64):
+        """
+        引数:
+            path: マップファイル
+            tile_flags: タイル種別ごとのフラグ表
+            max_chunks: メモリに置くチャンク数の上限
+        """
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.chunk_size, self.width, self.height, warp_count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"not a map file: {path}")
+        self.warps = {}  # チャンク座標 -> そのチャンク内のワープ地点リスト
+        offset = HEADER.size
+        for _ in range(warp_count):
+            x, y = WARP.unpack_from(self.data, offset)
+            offset += WARP.size
+            self.warps.setdefault((x // self.chunk_size, y // self.chunk_size), []).append((x, y))
+        self.chunks_offset = offset
+        self.chunk_cols = (self.width + self.chunk_size - 1) // self.chunk_size
+        self.chunk_rows = (self.height + self.chunk_size - 1) // self.chunk_size
+        self.tile_flags = tile_flags
+        self.max_chunks = max_chunks
+        self.chunks = OrderedDict() # (cx, cy) -> (タイルID, フラグ)
+        self.pinned = set() # 書き換えたので捨てないチャンク
+        self.version = 0
+        self.changes = [] # 変わったマス (x, y)。changes[v:] が版 v より後の変更
+        self.loads = 0 # チャンクを読み込んだ回数
+
+    def close(self): # ファイルを閉じる
+        self.chunks.clear()
+        self.data.close()
+        self.file.close()
+
+    def chunk(self, cx, cy): # チャンク取得(無ければ読み込み)
+        key = (cx, cy)
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            self.chunks.move_to_end(key)
+            return chunk
+        n = self.chunk_size * self.chunk_size
+        start = self.chunks_offset + (cy * self.chunk_cols + cx) * n
+        tiles = bytearray(self.data[start:start + n])
+        flags = tiles.translate(self.tile_flags)
+        for x, y in self.warps.get(key, ()):
+            flags[(y % self.chunk_size) * self.chunk_size + x % self.chunk_size] |= FLAG_WARP
+        chunk = (tiles, flags)
+        self.chunks[key] = chunk
+        self.loads += 1
+        self.evict_over_limit()
+        return chunk
+
+    def evict_over_limit(self): # 上限を超えた分を古い順に捨てる
+        for key in list(self.chunks):
+            if len(self.chunks) <= self.max_chunks:
+                break
+            if key not in self.pinned:
+                del self.chunks[key]
+
+    def update_camera(self, x, y, radius=1):
+        """
+        カメラ(プレイヤー)のいるマス周辺のチャンクを読み込み、離れたチャンクを捨てる
+        引数:
+            x, y: カメラ中心のマス座標
+            radius: 読み込んでおくチャンクの範囲(中心チャンクから何チャンクか)
+        """
+        ccx = x // self.chunk_size
+        ccy = y // self.chunk_size
+        for cy in range(max(0, ccy - radius), min(self.chunk_rows, ccy + radius + 1)):
+            for cx in range(max(0, ccx - radius), min(self.chunk_cols, ccx + radius + 1)):
+                self.chunk(cx, cy)
+        keep = radius + 1 # 境界で読み書きを繰り返さないよう1チャンク余分に残す
+        for key in list(self.chunks):
+            if key in self.pinned:
+                continue
+            if abs(key[0] - ccx) > keep or abs(key[1] - ccy) > keep:
+                del self.chunks[key]
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def get(self, x, y): # タイルID取得
+        cs = self.chunk_size
+        tiles, _ = self.chunk(x // cs, y // cs)
+        return tiles[(y % cs) * cs + x % cs]
+
+    def set(self, x, y, tile): # タイルID変更(メモリ上のみ)
+        cs = self.chunk_size
+        key = (x // cs, y // cs)
+        tiles, flags = self.chunk(*key)
+        i = (y % cs) * cs + x % cs
+        tiles[i] = tile
+        flags[i] = self.tile_flags[tile] | (flags[i] & FLAG_WARP)
+        self.pinned.add(key)
+        self.changes.append((x, y))
+        self.version += 1
+
+    def flags(self, x, y): # マスのフラグ取得(範囲外は0)
+        if 0 <= x < self.width and 0 <= y < self.height:
+            cs = self.chunk_size
+            _, flags = self.chunk(x // cs, y // cs)
+            return flags[(y % cs) * cs + x % cs]
+        return 0
+
+    def is_passable(self, x, y):
+        return bool(self.flags(x, y) & FLAG_PASSABLE)
+
+    def is_encounter(self, x, y):
+        return bool(self.flags(x, y) & FLAG_ENCOUNTER)
+
+    def is_warp(self, x, y):
+        return bool(self.flags(x, y) & FLAG_WARP)
+
+    def row(self, y, x0=0, x1=None): # 1行分(またはその一部)のタイルID
+        if x1 is None:
+            x1 = self.width
+        cs = self.chunk_size
+        out = bytearray()
+        ly = (y % cs) * cs
+        x = x0
+        while x < x1:
+            tiles, _ = self.chunk(x // cs, y // cs)
+            end = min(x1, (x // cs + 1) * cs)
+            out += tiles[ly + x % cs:ly + x % cs + (end - x)]
+            x = end
+        return out
+
+    def row_flags(self, y, x0=0, x1=None): # 1行分(またはその一部)のマスのフラグ
+        """
+        読み込み済みのチャンクはその内容を、まだのチャンクは mmap から直接読んで
+        フラグに変換する(チャンクのキャッシュには入れない)。
+        経路探索がマップを広く読んでも、カメラ付近のチャンクが追い出されない
+        """
+        if x1 is None:
+            x1 = self.width
+        cs = self.chunk_size
+        cy = y // cs
+        ly = (y % cs) * cs
+        out = bytearray()
+        x = x0
+        while x < x1:
+            cx = x // cs
+            end = min(x1, (cx + 1) * cs)
+            start = ly + x % cs
+            chunk = self.chunks.get((cx, cy))
+            if chunk is not None:
+                out += chunk[1][start:start + (end - x)]
+            else:
+                base = self.chunks_offset + (cy * self.chunk_cols + cx) * cs * cs + start
+                part = self.data[base:base + (end - x)].translate(self.tile_flags)
+                out += part
+                for wx, wy in self.warps.get((cx, cy), ()):
+                    if wy == y and x <= wx < end:
+                        out[len(out) - (end - wx)] |= FLAG_WARP
+            x = end
+        return out
+
+
+def main():
+    import argparse
+    import MapField
+    from tilemap import TileMap
+
+    parser = argparse.ArgumentParser(description="マップをバイナリ形式で書き出す")
+    parser.add_argument("path", help="出力先")
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE, help="チャンク一辺のマス数")
+    parser.add_argument("--random", nargs=2, type=int, metavar=("W", "H"), help="試験用のランダムマップを作る")
+    args = parser.parse_args()
+
+    if args.random:
+        width, height = args.random
+        rng = random.Random(0)
+        tilemap = TileMap(width, height, bytes(rng.choice((0, 0, 0, 1, 2, 3, 4)) for _ in range(width * height)))
+        warps = [(width - 1, height // 2)]
+    else:
+        tilemap = TileMap.from_rows(MapField.MAP_FIELD)
+        warps = MapField.WARP_POINTS
+    write_map(args.path, tilemap, args.chunk, warps)
+    print(f"{args.path}: {tilemap.width}x{tilemap.height}")
+
+
+if __name__ == "__main__":
+    main()
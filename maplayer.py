@@ -0,0 +1,118 @@
+from collections import OrderedDict
+
+import pygame
+
+CHUNK_TILES = 16 # 1チャンクあたりのタイル数(縦横)
+
+
+class StaticMapLayer: # 地形の事前描画レイヤー
+    """
+    変化しない地形をチャンク単位の大きな画像に焼き込んでおき、
+    毎フレームはカメラ位置に合わせてチャンクを貼るだけにする
+    """
+    def __init__(self, map_data, tile_size, get_image, colors, chunk_tiles=CHUNK_TILES, max_chunks=None):
+        """
+        引数:
+            map_data: マップデータ(TileMap)
+            tile_size: タイルサイズ(px)
+            get_image: タイルIDから描画用画像を返す関数(画像が無ければNone)
+            colors: 画像が無い時の代用色の辞書
+            chunk_tiles: 1チャンクあたりのタイル数
+            max_chunks: 保持するチャンク数の上限(None なら無制限)
+        """
+        self.map_data = map_data
+        self.tile_size = tile_size
+        self.get_image = get_image
+        self.colors = colors
+        self.chunk_tiles = chunk_tiles
+        self.chunk_px = chunk_tiles * tile_size # チャンクの一辺(px)
+        self.map_w = map_data.width # マップ幅(タイル数)
+        self.map_h = map_data.height # マップ高さ(タイル数)
+        self.max_chunks = max_chunks
+        self.chunks = OrderedDict() # (チャンクX, チャンクY) -> 画像(最近使った順)
+
+    @property
+    def pixel_size(self): # マップ全体のサイズ(px)
+        return self.map_w * self.tile_size, self.map_h * self.tile_size
+
+    def bake_all(self): # 全チャンクを事前描画
+        """
+        マップ読み込み時に全チャンクを焼き込む
+        """
+        cols = (self.map_w + self.chunk_tiles - 1) // self.chunk_tiles
+        rows = (self.map_h + self.chunk_tiles - 1) // self.chunk_tiles
+        for cy in range(rows):
+            for cx in range(cols):
+                self.get_chunk(cx, cy)
+
+    def invalidate(self): # 焼き込み済みチャンクの破棄
+        self.chunks.clear()
+
+    def get_chunk(self, cx, cy): # チャンク画像取得
+        """
+        チャンク画像を返す。まだ無ければその場で焼き込む
+        引数:
+            cx, cy: チャンク座標
+        戻り値:
+            チャンク画像
+        """
+        chunk = self.chunks.get((cx, cy))
+        if chunk is not None:
+            self.chunks.move_to_end((cx, cy))
+            return chunk
+        chunk = self.bake_chunk(cx, cy)
+        self.chunks[(cx, cy)] = chunk
+        if self.max_chunks is not None and len(self.chunks) > self.max_chunks:
+            self.chunks.popitem(last=False) # 最も長く使っていないチャンクを捨てる
+        return chunk
+
+    def bake_chunk(self, cx, cy): # 1チャンク分の焼き込み
+        """
+        チャンク範囲のタイルを1枚の画像に描画する
+        引数:
+            cx, cy: チャンク座標
+        戻り値:
+            チャンク画像
+        """
+        ts = self.tile_size
+        x0 = cx * self.chunk_tiles # 先頭タイルX
+        y0 = cy * self.chunk_tiles # 先頭タイルY
+        x1 = min(x0 + self.chunk_tiles, self.map_w)
+        y1 = min(y0 + self.chunk_tiles, self.map_h)
+        surf = pygame.Surface(((x1 - x0) * ts, (y1 - y0) * ts))
+        if pygame.display.get_surface() is not None: # 画面形式に合わせて高速化
+            surf = surf.convert()
+        for y in range(y0, y1):
+            row = self.map_data.row(y, x0, x1)
+            for x in range(x0, x1):
+                tile = row[x - x0]
+                px = (x - x0) * ts
+                py = (y - y0) * ts
+                img = self.get_image(tile)
+                if img:
+                    surf.blit(img, (px, py))
+                else:
+                    pygame.draw.rect(surf, self.colors.get(tile, (0, 0, 0)), (px, py, ts, ts))
+        return surf
+
+    def draw(self, screen, camera_x, camera_y): # カメラ位置での描画
+        """
+        画面に映る範囲のチャンクだけを貼り付ける
+        引数:
+            screen: 描画先
+            camera_x, camera_y: カメラ左上のワールド座標(px)
+        """
+        view_w, view_h = screen.get_size()
+        cp = self.chunk_px
+        cx0 = max(0, camera_x // cp)
+        cy0 = max(0, camera_y // cp)
+        cx1 = min((self.map_w - 1) // self.chunk_tiles, (camera_x + view_w - 1) // cp)
+        cy1 = min((self.map_h - 1) // self.chunk_tiles, (camera_y + view_h - 1) // cp)
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                chunk = self.get_chunk(cx, cy)
+                left = cx * cp - camera_x
+                top = cy * cp - camera_y
+                # 画面外部分を切り落として必要な範囲だけ転送する
+                area = pygame.Rect(max(0, -left), max(0, -top), view_w, view_h)
+                screen.blit(chunk, (max(0, left), max(0, top)), area)
@@ -0,0 +1,54 @@
+"""
+戦闘メッセージのログ（pygame 非依存）
+
+決まった件数だけを保持するリングバッファ。メッセージは種類と一緒に持つので、
+表示側は文字列の中身を調べずに色を決められる。追加時に listeners を呼ぶので、
+表示側はその時点で1回だけ文字を描画しておける。
+"""
+MSG_NORMAL = 0  # 通常
+MSG_CRITICAL = 1  # 会心の一撃
+MSG_DEFEAT = 2  # 敵を倒した
+MSG_LEVELUP = 3  # レベルアップ
+
+CAPACITY = 32  # 既定の保持件数
+
+
+class MessageLog:
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.entries = [None] * capacity  # (通し番号, 種類, 文字列)
+        self.head = 0  # 次に書き込む位置
+        self.count = 0  # 保持している件数
+        self.seq = 0  # これまでに追加した件数（通し番号）
+        self.listeners = []  # 追加時に呼ぶ関数 f(通し番号, 種類, 文字列)
+
+    def __len__(self):
+        return self.count
+
+    def add_message(self, text, kind=MSG_NORMAL):
+        """メッセージを追加する。いっぱいなら最も古いものを上書きする"""
+        seq = self.seq
+        self.seq += 1
+        self.entries[self.head] = (seq, kind, text)
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        for listener in self.listeners:
+            listener(seq, kind, text)
+        return seq
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+
+    def latest(self, n):
+        """新しい順に最大 n 件を、古いものから並べて返す"""
+        n = min(n, self.count)
+        start = self.head - n
+        return [self.entries[(start + i) % self.capacity] for i in range(n)]
+
+    def texts(self):
+        """保持している文字列（古い順）"""
+        return [entry[2] for entry in self.latest(self.count)]
+
+    def __iter__(self):
+        return iter(self.texts())
@@ -0,0 +1,224 @@
+"""
+火花(パーティクル)と浮かび上がるダメージ数字
+
+粒1つごとのオブジェクトは作らず、位置・速度・時刻などを項目ごとの
+配列(array)で最初に確保しておく(EnemyStore と同じ持ち方)。
+生きている粒は先頭から count 個に詰めて並べ、消えた粒は末尾の粒と入れ替えるので、
+毎フレームの処理は生きている粒の数だけで済み、上限を超えた分は出さない。
+"""
+import math
+import random
+from array import array
+
+import pygame
+
+MAX_PARTICLES = 1024 # 同時に出せる火花の数(満杯でも描画が1フレームの予算に十分収まる数)
+MAX_POPUPS = 32 # 同時に出せる数字の数
+GRAVITY = 600.0 # 火花の重力(px/秒^2)
+POPUP_RISE = 60.0 # 数字の浮かぶ速さ(px/秒)
+POPUP_TIME = 0.8 # 数字の表示時間(秒)
+
+
+class ParticlePool: # 火花の入れ物
+    """
+    位置は毎フレーム足し込まず、出した位置・初速・出した時刻から描くときに計算する
+    (重力つきの等加速度運動)。update は時刻を進めて消えた粒を詰めるだけになる
+    """
+    def __init__(self, capacity=MAX_PARTICLES, rng=None, gravity=GRAVITY):
+        """
+        引数:
+            capacity: 同時に出せる数(これ以上は emit しても出ない)
+            rng: 飛び散る向きと速さに使う乱数列(ゲームの乱数とは別にする)
+            gravity: 重力(px/秒^2)
+        """
+        self.capacity = capacity
+        self.rng = rng or random.Random()
+        self.gravity = gravity
+        zeros = [0.0] * capacity
+        self.x = array("d", zeros) # 出した位置
+        self.y = array("d", zeros)
+        self.vx = array("d", zeros) # 初速(px/秒)
+        self.vy = array("d", zeros)
+        self.born = array("d", zeros) # 出した時刻(秒)
+        self.death = array("d", zeros) # 消える時刻(秒)
+        self.color = array("B", bytes(capacity)) # 色の番号(palette の位置)
+        self.size = array("B", bytes(capacity)) # 一辺(px)
+        self.count = 0 # 生きている数(先頭から count 個)
+        self.time = 0.0 # update に渡された時間の合計(秒)
+        self.dropped = 0 # 上限で出せなかった数の合計
+        self.palette = [] # 使った色
+        self.squares = [] # 色の番号 -> 一辺 -> 塗りつぶした四角の画像
+
+    def __len__(self):
+        return self.count
+
+    def emit(self, x, y, n, color, speed=(60, 240), life=(0.3, 0.7), size=4, angle=(0.0, math.tau)):
+        """
+        (x, y) から n 個の火花を飛ばす
+        引数:
+            speed: 初速の範囲(px/秒)
+            life: 表示時間の範囲(秒)
+            size: 一辺(px)
+            angle: 飛ぶ向きの範囲(ラジアン。0 が右、-π/2 が上)
+        戻り値:
+            実際に出した数
+        """
+        room = max(0, self.capacity - self.count)
+        self.dropped += max(0, n - room)
+        n = min(n, room)
+        if n <= 0:
+            return 0
+        uniform = self.rng.uniform
+        now = self.time
+        color = self.color_index(color)
+        for i in range(self.count, self.count + n):
+            a = uniform(*angle)
+            v = uniform(*speed)
+            self.x[i] = x
+            self.y[i] = y
+            self.vx[i] = math.cos(a) * v
+            self.vy[i] = math.sin(a) * v
+            self.born[i] = now
+            self.death[i] = now + uniform(*life)
+            self.color[i] = color
+            self.size[i] = size
+        self.count += n
+        return n
+
+    def update(self, dt): # 時刻を進め、消えた粒を末尾の粒と入れ替えて詰める
+        now = self.time = self.time + dt
+        death = self.death
+        i = 0
+        n = self.count
+        while i < n:
+            if death[i] <= now:
+                n -= 1
+                self.move(n, i)
+            else:
+                i += 1
+        self.count = n
+
+    def move(self, src, dst): # src 番目の粒を dst 番目に写す
+        if src == dst:
+            return
+        for column in (self.x, self.y, self.vx, self.vy, self.born, self.death, self.color, self.size):
+            column[dst] = column[src]
+
+    def clear(self):
+        self.count = 0
+
+    def positions(self): # 今の位置 (x, y) のリスト
+        n = self.count
+        now, half_g = self.time, self.gravity / 2
+        return [(x + vx * t, y + (vy + half_g * t) * t)
+                for x, y, vx, vy, b in zip(self.x[:n], self.y[:n], self.vx[:n], self.vy[:n], self.born[:n])
+                for t in [now - b]]
+
+    def color_index(self, color): # 色の番号(初めての色なら登録する)
+        color = tuple(color)
+        if color not in self.palette:
+            if len(self.palette) >= 256:
+                raise ValueError("too many particle colors")
+            self.palette.append(color)
+            self.squares.append([])
+        return self.palette.index(color)
+
+    def square_images(self, color, max_size): # 一辺 0..max_size の四角(色ごとに1回だけ作る)
+        images = self.squares[color]
+        for size in range(len(images), max_size + 1):
+            surf = pygame.Surface((max(1, size), max(1, size)))
+            if pygame.display.get_surface() is not None: # 画面形式に合わせて高速化
+                surf = surf.convert()
+            surf.fill(self.palette[color])
+            images.append(surf)
+        return images
+
+    def draw(self, surface): # 残り時間に合わせて小さくしながら四角で描く
+        n = self.count
+        if not n:
+            return
+        now = self.time
+        biggest = max(self.size[:n]) + 1
+        squares = [self.square_images(c, biggest) for c in range(len(self.palette))]
+        half_g = self.gravity / 2
+        surface.blits([ # 1つの内包表記で位置と大きさを計算する(粒ごとの関数呼び出しを避ける)
+            (squares[c][int(s * (d - now) / (d - b)) + 1], (int(x + vx * t), int(y + (vy + half_g * t) * t)))
+            for x, y, vx, vy, b, d, c, s in zip(self.x[:n], self.y[:n], self.vx[:n], self.vy[:n],
+                                                self.born[:n], self.death[:n], self.color[:n], self.size[:n])
+            for t in [now - b]
+        ], doreturn=False)
+
+    def bounds(self): # 全ての粒を囲む矩形(差分更新用。粒が無ければ None)
+        if not self.count:
+            return None
+        points = self.positions()
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        left, top = int(min(xs)), int(min(ys))
+        pad = max(self.size[:self.count]) + 2
+        return (left, top, int(max(xs)) - left + pad, int(max(ys)) - top + pad)
+
+
+class PopupPool: # 浮かび上がる数字の入れ物
+    def __init__(self, capacity=MAX_POPUPS, rise=POPUP_RISE, duration=POPUP_TIME):
+        """
+        引数:
+            capacity: 同時に出せる数(いっぱいなら一番古いものを上書きする)
+            rise: 浮かぶ速さ(px/秒)
+            duration: 表示時間(秒)
+        """
+        self.capacity = capacity
+        self.rise = rise
+        self.duration = duration
+        zeros = [0.0] * capacity
+        self.x = array("d", zeros)
+        self.y = array("d", zeros)
+        self.life = array("d", zeros) # 残り時間(秒)
+        self.images = [None] * capacity # 描画済みの文字(TextCache の画像をそのまま使う)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def spawn(self, image, x, y): # 中心が (x, y) になるように出す
+        if self.count < self.capacity:
+            i = self.count
+            self.count += 1
+        else: # いっぱいなら残り時間の一番短いものを上書き
+            i = min(range(self.count), key=self.life.__getitem__)
+        w, h = image.get_size()
+        self.x[i] = x - w / 2
+        self.y[i] = y - h / 2
+        self.life[i] = self.duration
+        self.images[i] = image
+
+    def update(self, dt):
+        y, life, images = self.y, self.life, self.images
+        rise = self.rise * dt
+        i = 0
+        n = self.count
+        while i < n:
+            t = life[i] - dt
+            if t <= 0: # 消えたものは末尾と入れ替える
+                n -= 1
+                self.x[i], y[i], life[i], images[i] = self.x[n], y[n], life[n], images[n]
+                images[n] = None
+                continue
+            life[i] = t
+            y[i] -= rise
+            i += 1
+        self.count = n
+
+    def clear(self):
+        self.images[:self.count] = [None] * self.count
+        self.count = 0
+
+    def draw(self, surface):
+        for i in range(self.count):
+            surface.blit(self.images[i], (int(self.x[i]), int(self.y[i])))
+
+    def bounds(self): # 全ての数字を囲む矩形(数字が無ければ None)
+        if not self.count:
+            return None
+        rects = [pygame.Rect(int(self.x[i]), int(self.y[i]), *self.images[i].get_size()) for i in range(self.count)]
+        return tuple(rects[0].unionall(rects[1:]))
@@ -0,0 +1,263 @@
+"""
+タイルマップ上の距離場と自動移動
+
+目的地(ワープ地点やクリックしたマス)から通行可能マスへ探索を広げ、
+マスごとの「目的地までの歩数」と「次に進む向き」を配列に入れておく。
+毎フレームの移動は配列を1回引くだけで決まる。
+
+探索は引かれたマスの歩数が決まったところで止め、続きは次に引かれたときに再開する
+(クリックした先がすぐ近くならマップ全体は調べない)。
+地形が変わったら(TileMap.version)、変わったマスを通っていたマスだけを消して
+その周りから探索をやり直す。マスのフラグは row_flags で探索が触れた行だけ読む。
+"""
+from array import array
+from heapq import heappop, heappush
+
+from tilemap import FLAG_PASSABLE, FLAG_WARP
+
+UNREACHABLE = -1 # 目的地に行けない(またはまだ調べていない)マス
+MAX_REPAIR_CELLS = 64 # 一度にこれより多くのマスが変わっていたら作り直す
+
+# 次に進む向き(steps の値で引く)。0 は目的地に着いている/行けない
+DIRS = ((0, 0), (-1, 0), (1, 0), (0, -1), (0, 1))
+STEP_NONE, STEP_LEFT, STEP_RIGHT, STEP_UP, STEP_DOWN = range(5)
+
+
+def row_flags(map_data, y): # 1行分のマスのフラグ
+    """
+    row_flags を持つマップ(TileMap / MappedTileMap)はそれを使い、
+    それ以外は row() のタイルIDを種別フラグ表で変換する(マスごとに flags() は呼ばない)
+    """
+    read = getattr(map_data, "row_flags", None)
+    if read is not None:
+        return read(y)
+    return map_data.row(y).translate(map_data.tile_flags)
+
+
+def flagged_cells(map_data, flag): # flag を持つマスの番号(行優先)のリスト
+    w = map_data.width
+    warps = getattr(map_data, "warps", None)
+    if flag == FLAG_WARP and isinstance(warps, dict): # MappedTileMap はワープ地点を覚えている
+        return sorted(y * w + x for cells in warps.values() for x, y in cells)
+    mask = bytes(1 if f & flag else 0 for f in range(256))
+    found = []
+    for y in range(map_data.height):
+        hits = row_flags(map_data, y).translate(mask)
+        x = hits.find(1)
+        while x >= 0:
+            found.append(y * w + x)
+            x = hits.find(1, x + 1)
+    return found
+
+
+class DistanceField: # 目的地までの距離場
+    def __init__(self, map_data, goals=None, goal_flag=FLAG_WARP, limit=None):
+        """
+        引数:
+            map_data: TileMap / MappedTileMap
+            goals: 目的地の (x, y) リスト(省略時は goal_flag を持つマス)
+            goal_flag: 目的地にするマスのフラグ
+            limit: これより多く歩くマスは探さない(None なら制限なし)
+        """
+        self.map_data = map_data
+        self.goals = list(goals) if goals is not None else None
+        self.goal_flag = goal_flag
+        self.limit = limit
+        self.version = None # 探索に使った地形の版
+        self.dist = array("i") # マス -> 目的地までの歩数(UNREACHABLE なら行けない/未探索)
+        self.steps = bytearray() # マス -> 次に進む向き(DIRS の番号)
+        self.cells = bytearray() # マス -> フラグ(loaded の行だけ有効)
+        self.loaded = bytearray() # 行 -> cells に読み込んだか
+        self.goal_cells = set() # 目的地のマス番号
+        self.frontier = [] # (歩数, マス) の優先度付きキュー。隣をまだ調べていないマス
+        self.builds = 0 # 作り直した回数
+        self.repairs = 0 # 変わったマスの周りだけ直した回数
+        self.expanded = 0 # 隣を調べたマスの数の合計
+
+    def refresh(self): # 地形が変わっていれば直す
+        m = self.map_data
+        if self.version == m.version:
+            return
+        changes = getattr(m, "changes", None)
+        if self.version is None or changes is None or not 0 < m.version - self.version <= MAX_REPAIR_CELLS:
+            self.build()
+        else:
+            self.repair(changes[self.version:m.version])
+
+    def build(self): # 距離場を空にして目的地から探索をやり直す(実際に広げるのは引かれたとき)
+        m = self.map_data
+        w, h = m.width, m.height
+        self.dist = array("i", [UNREACHABLE]) * (w * h)
+        self.steps = bytearray(w * h)
+        cells = getattr(m, "cell_flags", None)
+        if cells is not None: # TileMap はメモリ上のフラグをそのまま使う
+            self.cells = cells
+            self.loaded = bytearray(b"\x01") * h
+        else:
+            self.cells = bytearray(w * h)
+            self.loaded = bytearray(h)
+        self.frontier = []
+        if self.goals is None:
+            goals = flagged_cells(m, self.goal_flag)
+        else:
+            goals = [y * w + x for x, y in self.goals if 0 <= x < w and 0 <= y < h]
+        self.goal_cells = set(goals)
+        for i in goals:
+            self.add_goal(i)
+        self.version = m.version
+        self.builds += 1
+
+    def load_row(self, y): # 1行分のフラグを cells に読む
+        w = self.map_data.width
+        self.cells[y * w:(y + 1) * w] = row_flags(self.map_data, y)
+        self.loaded[y] = 1
+
+    def add_goal(self, i): # 通れるなら目的地として探索の起点にする
+        w = self.map_data.width
+        if not self.loaded[i // w]:
+            self.load_row(i // w)
+        if self.cells[i] & FLAG_PASSABLE and self.dist[i] != 0:
+            self.dist[i] = 0
+            self.steps[i] = STEP_NONE
+            heappush(self.frontier, (0, i))
+
+    def repair(self, changes): # 変わったマスを通っていたマスだけ消して探索し直す
+        """
+        引数:
+            changes: 変わったマス (x, y) のリスト
+        """
+        m = self.map_data
+        w = m.width
+        dist, steps = self.dist, self.steps
+        for x, y in changes:
+            if self.cells is not getattr(m, "cell_flags", None) and self.loaded[y]:
+                self.load_row(y) # 読み込み済みの行は新しいフラグで読み直す
+            i = y * w + x
+            lost = self.detach(i)
+            for j in lost:
+                dist[j] = UNREACHABLE
+                steps[j] = STEP_NONE
+            if i in self.goal_cells or (self.goals is None and self.cells[i] & self.goal_flag):
+                self.goal_cells.add(i)
+                self.add_goal(i)
+            # 消したマスの隣で歩数が残っているマスから、もう一度隣を調べ直す
+            for j in lost:
+                x = j % w
+                for n in (j - 1 if x > 0 else -1, j + 1 if x < w - 1 else -1, j - w, j + w):
+                    if 0 <= n < len(dist) and dist[n] != UNREACHABLE:
+                        heappush(self.frontier, (dist[n], n))
+        self.version = m.version
+        self.repairs += 1
+
+    def detach(self, i): # マス i と、i を通って目的地へ向かっていたマスのリスト
+        dist, steps = self.dist, self.steps
+        w = self.map_data.width
+        lost = [i]
+        if dist[i] == UNREACHABLE:
+            return lost
+        k = 0
+        while k < len(lost):
+            c = lost[k]
+            k += 1
+            x = c % w
+            if x > 0 and steps[c - 1] == STEP_RIGHT and dist[c - 1] != UNREACHABLE:
+                lost.append(c - 1)
+            if x < w - 1 and steps[c + 1] == STEP_LEFT and dist[c + 1] != UNREACHABLE:
+                lost.append(c + 1)
+            if c >= w and steps[c - w] == STEP_DOWN and dist[c - w] != UNREACHABLE:
+                lost.append(c - w)
+            if c + w < len(dist) and steps[c + w] == STEP_UP and dist[c + w] != UNREACHABLE:
+                lost.append(c + w)
+        return lost
+
+    def search(self, target=None): # 探索を進める
+        """
+        target の歩数が決まるまで(None なら行けるマス全部)、歩数の少ないマスから隣を調べる。
+        これから見つかる道はどれもキューの先頭 + 1 歩以上なので、
+        target の歩数がそれ以下になった時点で確定する
+        """
+        m = self.map_data
+        w, h = m.width, m.height
+        dist, steps, cells, loaded = self.dist, self.steps, self.cells, self.loaded
+        frontier = self.frontier
+        limit = self.limit
+        while frontier:
+            d, i = frontier[0]
+            if target is not None and dist[target] != UNREACHABLE and dist[target] <= d + 1:
+                break
+            heappop(frontier)
+            if d != dist[i] or (limit is not None and d >= limit): # 古い項目/遠すぎる
+                continue
+            self.expanded += 1
+            y = i // w
+            x = i - y * w
+            if y > 0 and not loaded[y - 1]:
+                self.load_row(y - 1)
+            if y < h - 1 and not loaded[y + 1]:
+                self.load_row(y + 1)
+            d += 1
+            # 隣のマス j から i へ進む向きを記録する(もっと近い道が見つかれば書き換える)
+            j = i - 1
+            if x > 0 and cells[j] & FLAG_PASSABLE and not 0 <= dist[j] <= d:
+                dist[j] = d
+                steps[j] = STEP_RIGHT
+                heappush(frontier, (d, j))
+            j = i + 1
+            if x < w - 1 and cells[j] & FLAG_PASSABLE and not 0 <= dist[j] <= d:
+                dist[j] = d
+                steps[j] = STEP_LEFT
+                heappush(frontier, (d, j))
+            j = i - w
+            if y > 0 and cells[j] & FLAG_PASSABLE and not 0 <= dist[j] <= d:
+                dist[j] = d
+                steps[j] = STEP_DOWN
+                heappush(frontier, (d, j))
+            j = i + w
+            if y < h - 1 and cells[j] & FLAG_PASSABLE and not 0 <= dist[j] <= d:
+                dist[j] = d
+                steps[j] = STEP_UP
+                heappush(frontier, (d, j))
+
+    def lookup(self, x, y): # 最新の地形でマス (x, y) の歩数が決まるまで探索し、マス番号を返す
+        self.refresh()
+        if not self.map_data.in_bounds(x, y):
+            return None
+        w = self.map_data.width
+        i = y * w + x
+        if not self.loaded[y]:
+            self.load_row(y)
+        if self.cells[i] & FLAG_PASSABLE: # 通れないマスのために全体を探さない
+            self.search(i)
+        return i
+
+    def distance(self, x, y): # 目的地までの歩数
+        """
+        戻り値:
+            歩数(範囲外・行けないマスは UNREACHABLE)
+        """
+        i = self.lookup(x, y)
+        return UNREACHABLE if i is None else self.dist[i]
+
+    def step(self, x, y): # 次に進む向き
+        """
+        戻り値:
+            (dx, dy)。目的地に着いている・行けないときは None
+        """
+        i = self.lookup(x, y)
+        if i is None:
+            return None
+        s = self.steps[i]
+        return DIRS[s] if s else None
+
+    def path(self, x, y, limit=100000): # 目的地までのマスの列(表示・確認用)
+        """
+        戻り値:
+            [(x, y), ...] 現在地を含まず目的地を含む。行けなければ空リスト
+        """
+        result = []
+        d = self.step(x, y)
+        while d and len(result) < limit:
+            x, y = x + d[0], y + d[1]
+            result.append((x, y))
+            d = self.step(x, y)
+        return result
@@ -0,0 +1,160 @@
+import csv
+import time
+from collections import deque
+
+import pygame
+
+WINDOW = 300 # 直近何フレーム分を保持するか
+OVERLAY_KEY = pygame.K_F3 # 表示切り替えキー
+OVERLAY_POS = (8, 8) # 表示位置
+OVERLAY_WIDTH = 330 # 表示幅
+LINE_HEIGHT = 16
+
+
+class Section: # 計測区間(with 文用)
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class NullSection: # 計測しないときの区間
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SECTION = NullSection()
+
+
+class FrameProfiler: # フレームの処理段階ごとの計測
+    """
+    段階(入力・更新・描画・画面転送など)ごとの処理時間を直近 WINDOW 回分だけ
+    リングバッファに保持し、パーセンタイルを出す
+    F3 で画面左上に一覧を表示し、終了時に CSV へ書き出せる
+    """
+    def __init__(self, window=WINDOW, enabled=True):
+        """
+        引数:
+            window: 段階ごとに保持する計測回数
+            enabled: False なら計測しない
+        """
+        self.window = window
+        self.enabled = enabled
+        self.overlay = False # 一覧を表示するか
+        self.samples = {} # 段階名 -> deque(秒)
+        self.counts = {} # 段階名 -> 計測回数の合計
+        self.font = None # 表示用フォント(初回表示時に作成)
+
+    def section(self, name): # 計測区間
+        """
+        with profiler.section("draw"): のように使う
+        引数:
+            name: 段階名(サブ段階は "draw.tiles" のようにドットで区切る)
+        """
+        if not self.enabled:
+            return NULL_SECTION
+        return Section(self, name)
+
+    def record(self, name, seconds): # 計測値の追加
+        buf = self.samples.get(name)
+        if buf is None:
+            buf = self.samples[name] = deque(maxlen=self.window)
+            self.counts[name] = 0
+        buf.append(seconds)
+        self.counts[name] += 1
+
+    def percentile(self, name, p): # パーセンタイル(ms)
+        """
+        引数:
+            name: 段階名
+            p: 0〜100
+        戻り値:
+            直近の計測値の p パーセンタイル(ms)。計測が無ければ 0
+        """
+        buf = self.samples.get(name)
+        if not buf:
+            return 0.0
+        values = sorted(buf)
+        i = min(len(values) - 1, int(len(values) * p / 100))
+        return values[i] * 1000
+
+    def stats(self): # 段階ごとの集計
+        """
+        戻り値:
+            段階名 -> {count, mean, p50, p90, p99, max}(時間は ms)
+        """
+        result = {}
+        for name, buf in self.samples.items():
+            if not buf:
+                continue
+            result[name] = {
+                "count": self.counts[name],
+                "mean": sum(buf) / len(buf) * 1000,
+                "p50": self.percentile(name, 50),
+                "p90": self.percentile(name, 90),
+                "p99": self.percentile(name, 99),
+                "max": max(buf) * 1000,
+            }
+        return result
+
+    def handle_event(self, event): # 表示切り替えキーの処理
+        """
+        戻り値:
+            表示を切り替えたら True
+        """
+        if event.type == pygame.KEYDOWN and event.key == OVERLAY_KEY:
+            self.overlay = not self.overlay
+            return True
+        return False
+
+    def overlay_rect(self): # 表示領域
+        return pygame.Rect(*OVERLAY_POS, OVERLAY_WIDTH, (len(self.samples) + 1) * LINE_HEIGHT + 8)
+
+    def draw_overlay(self, surface): # 一覧の描画
+        """
+        段階ごとの p50 / p90 / p99 を画面に描く
+        戻り値:
+            描いた領域(表示していなければ None)
+        """
+        if not self.overlay:
+            return None
+        if self.font is None:
+            self.font = pygame.font.Font(None, 18)
+        rect = self.overlay_rect()
+        surface.fill((0, 0, 0), rect)
+        x, y = OVERLAY_POS[0] + 4, OVERLAY_POS[1] + 4
+        lines = [f"{'phase':<16}{'p50':>7}{'p90':>7}{'p99':>7} ms"]
+        for name, st in sorted(self.stats().items()):
+            lines.append(f"{name:<16}{st['p50']:7.2f}{st['p90']:7.2f}{st['p99']:7.2f}")
+        for i, line in enumerate(lines):
+            # 毎フレーム値が変わるので文字キャッシュは使わない
+            surface.blit(self.font.render(line, True, (0, 255, 0)), (x, y + i * LINE_HEIGHT))
+        return rect
+
+    def dump_csv(self, path): # CSV への書き出し
+        """
+        段階ごとの集計を CSV に書き出す
+        引数:
+            path: 出力先
+        """
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["phase", "count", "mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms"])
+            for name, st in sorted(self.stats().items()):
+                writer.writerow([name, st["count"], f"{st['mean']:.4f}", f"{st['p50']:.4f}",
+                                 f"{st['p90']:.4f}", f"{st['p99']:.4f}", f"{st['max']:.4f}"])
+
+
+profiler = FrameProfiler() # ゲーム全体で共有する計測
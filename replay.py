@@ -0,0 +1,116 @@
+"""
+入力の記録と再生
+
+更新1回(ティック)ごとに、押しっぱなしのキー(矢印)と新しく押されたキーを記録する。
+シードと一緒に保存するので、再生すれば同じ展開をフレーム単位で再現できる。
+
+形式(リトルエンディアン):
+    ヘッダ: マジック "KQRP", 版, 1秒あたりの更新回数, シード
+    ティック: 押しっぱなしのキーのビット(1バイト), 押されたキー数(1バイト),
+              押されたキーの番号(PRESS_KEYS 内の位置)をその数だけ(各1バイト)
+"""
+import struct
+
+import pygame
+
+MAGIC = b"KQRP"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQ")  # マジック, 版, 更新回数/秒, シード
+TICK = struct.Struct("<BB")
+
+HELD_KEYS = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN)  # 押しっぱなしで効くキー
+PRESS_KEYS = (  # 押した瞬間に効くキー
+    pygame.K_SPACE, pygame.K_a, pygame.K_m, pygame.K_h,
+    pygame.K_1, pygame.K_2, pygame.K_3, pygame.K_r, pygame.K_ESCAPE,
+    pygame.K_i,  # 後から足したキーは末尾に置く（記録済みのリプレイの番号を変えない）
+)
+PRESS_INDEX = {key: i for i, key in enumerate(PRESS_KEYS)}
+
+
+class LiveInput:
+    """キーボードからの入力"""
+    finished = False
+
+    def __init__(self):
+        self.pending = []  # 前回の poll 以降に押されたキー
+
+    def feed_event(self, event):
+        if event.type == pygame.KEYDOWN and event.key in PRESS_INDEX:
+            self.pending.append(event.key)
+
+    def poll(self):
+        """
+        更新1回分の入力
+        戻り値: (押しっぱなしのキーの集合, 押されたキーのリスト)
+        """
+        pressed = pygame.key.get_pressed()
+        held = frozenset(key for key in HELD_KEYS if pressed[key])
+        presses, self.pending = self.pending, []
+        return held, presses
+
+    def close(self):
+        pass
+
+
+class InputRecorder:
+    """別の入力をそのまま返しつつ、ファイルに記録する"""
+    def __init__(self, source, path, seed, tick_rate):
+        self.source = source
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, tick_rate, seed))
+
+    @property
+    def finished(self):
+        return self.source.finished
+
+    @property
+    def pending(self):  # まだ更新で処理していないキー
+        return self.source.pending
+
+    def feed_event(self, event):
+        self.source.feed_event(event)
+
+    def poll(self):
+        held, presses = self.source.poll()
+        mask = 0
+        for i, key in enumerate(HELD_KEYS):
+            if key in held:
+                mask |= 1 << i
+        presses = presses[:255]
+        self.file.write(TICK.pack(mask, len(presses)))
+        self.file.write(bytes(PRESS_INDEX[key] for key in presses))
+        return held, presses
+
+    def close(self):
+        self.file.close()
+
+
+class InputPlayer:
+    """記録ファイルの入力を順に返す。最後まで再生したら finished になる"""
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = f.read()
+        magic, version, self.tick_rate, self.seed = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"not an input recording: {path}")
+        self.offset = HEADER.size
+        self.finished = False
+        self.ticks = 0
+
+    def feed_event(self, event):  # 再生中はキーボードを無視する
+        pass
+
+    def poll(self):
+        if self.offset >= len(self.data):
+            self.finished = True
+            return frozenset(), []
+        mask, count = TICK.unpack_from(self.data, self.offset)
+        self.offset += TICK.size
+        presses = [PRESS_KEYS[i] for i in self.data[self.offset:self.offset + count]]
+        self.offset += count
+        self.ticks += 1
+        held = frozenset(key for i, key in enumerate(HELD_KEYS) if mask & (1 << i))
+        return held, presses
+
+    def close(self):
+        pass
@@ -0,0 +1,44 @@
+"""
+サブシステムごとの乱数列（pygame 非依存）
+
+1つのシードから、エンカウント判定・ダメージ計算・敵の出現数などに
+別々の random.Random を作る。どこかで乱数を引く回数が変わっても
+他の乱数列はずれないので、同じシードと同じ入力なら同じ展開になる。
+"""
+import hashlib
+import random
+
+STREAM_ENCOUNTER = "encounter"  # ランダムエンカウント
+STREAM_DAMAGE = "damage"  # ダメージ・回復量・会心・命中
+STREAM_SPAWN = "spawn"  # 敵の出現数
+STREAM_EFFECTS = "effects"  # 火花の飛び方（見た目だけ）
+SEED_RANGE = 2 ** 64  # シードはこの範囲に丸める（リプレイのヘッダに符号なし64bitで入る）
+
+
+def derive_seed(seed, name):
+    """シードと乱数列の名前から、その乱数列用のシードを作る"""
+    digest = hashlib.sha256(f"{seed}:{name}".encode()).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+class RngStreams:
+    def __init__(self, seed=None):
+        """
+        seed: 全体のシード（省略時はランダムに決めて self.seed に残す）
+              負の数や大きな数は SEED_RANGE で割った余りにする
+        """
+        if seed is None:
+            seed = random.SystemRandom().randrange(2 ** 63)
+        self.seed = seed % SEED_RANGE
+        self.streams = {}
+        self.encounter = self.stream(STREAM_ENCOUNTER)
+        self.damage = self.stream(STREAM_DAMAGE)
+        self.spawn = self.stream(STREAM_SPAWN)
+        self.effects = self.stream(STREAM_EFFECTS)
+
+    def stream(self, name):
+        """名前付きの乱数列（同じ名前なら同じオブジェクト）"""
+        rng = self.streams.get(name)
+        if rng is None:
+            rng = self.streams[name] = random.Random(derive_seed(self.seed, name))
+        return rng
@@ -0,0 +1,79 @@
+"""
+スクロール用の裏画面
+
+画面と同じ大きさの裏画面に地形を描いておき、カメラが動いたら
+Surface.scroll で中身をずらして、新しく見えた端の帯(縦・横1本ずつ)だけを描き足す。
+カメラが1px ずつ動いても、描き直すのは毎フレーム細い帯だけで済む。
+"""
+import pygame
+
+
+class ScrollBuffer: # スクロールする裏画面
+    def __init__(self, size, draw_area, background=(0, 0, 0)):
+        """
+        引数:
+            size: 裏画面の大きさ (幅, 高さ)(px)
+            draw_area: 地形を描く関数 f(描画先, 描画先の矩形, camera_x, camera_y)
+                       描画先の矩形の外には描かないこと
+            background: マップの外の色
+        """
+        self.width, self.height = size
+        self.draw_area = draw_area
+        self.background = background
+        self.surface = pygame.Surface(size)
+        if pygame.display.get_surface() is not None: # 画面形式に合わせて高速化
+            self.surface = self.surface.convert()
+        self.camera = None # 裏画面に描いてあるカメラ位置(None なら何も描いていない)
+        self.redrawn = 0 # 直前の scroll_to で描き直した面積(px)
+
+    def invalidate(self): # 次回は全体を描き直す(マップや表示倍率が変わったとき)
+        self.camera = None
+
+    def scroll_to(self, camera_x, camera_y): # カメラ位置に合わせる
+        """
+        前回のカメラ位置との差だけ中身をずらし、見えてきた帯を描く
+        引数:
+            camera_x, camera_y: カメラ左上のワールド座標(px)
+        戻り値:
+            描き直した面積(px)
+        """
+        camera_x, camera_y = int(camera_x), int(camera_y)
+        w, h = self.width, self.height
+        if self.camera is None:
+            self.redraw(pygame.Rect(0, 0, w, h), camera_x, camera_y)
+            self.camera = (camera_x, camera_y)
+            self.redrawn = w * h
+            return self.redrawn
+
+        dx = camera_x - self.camera[0]
+        dy = camera_y - self.camera[1]
+        self.camera = (camera_x, camera_y)
+        if dx == 0 and dy == 0:
+            self.redrawn = 0
+            return 0
+        if abs(dx) >= w or abs(dy) >= h: # 画面1枚分以上動いたら全部描き直す
+            self.redraw(pygame.Rect(0, 0, w, h), camera_x, camera_y)
+            self.redrawn = w * h
+            return self.redrawn
+
+        self.surface.scroll(-dx, -dy) # 今ある絵をカメラと逆向きにずらす
+        redrawn = 0
+        if dx: # 左右の端に見えてきた縦の帯
+            strip = pygame.Rect(w - dx if dx > 0 else 0, 0, abs(dx), h)
+            self.redraw(strip, camera_x, camera_y)
+            redrawn += strip.width * strip.height
+        if dy: # 上下の端に見えてきた横の帯(縦の帯と重なる角は除く)
+            x0 = 0 if dx >= 0 else -dx
+            x1 = w - dx if dx > 0 else w
+            strip = pygame.Rect(x0, h - dy if dy > 0 else 0, x1 - x0, abs(dy))
+            self.redraw(strip, camera_x, camera_y)
+            redrawn += strip.width * strip.height
+        self.redrawn = redrawn
+        return redrawn
+
+    def redraw(self, rect, camera_x, camera_y): # 裏画面の一部を描き直す
+        self.surface.fill(self.background, rect)
+        self.draw_area(self.surface, rect, camera_x, camera_y)
+
+    def draw(self, screen, pos=(0, 0)): # 裏画面を画面に貼る
+        screen.blit(self.surface, pos)
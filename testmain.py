@@ -1,52 +1,88 @@
 import pygame as pg
+import argparse
 import os
 import sys
 
 import MapField
+from gameloop import FixedStepLoop
+from profiler import profiler
+from dirtyrect import DirtyRenderer
 
 os.chdir(os.path.dirname(os.path.abspath(__file__))) # カレントディレクトリをこのファイルの場所に変更
 
 class MainGame:
-    def __init__(self):
+    def __init__(self, map_path=None, render_mode=None):
         pg.init()
 
         # 画面作成
         self.screen = pg.display.set_mode((MapField.SCREEN_WIDTH, MapField.SCREEN_HEIGHT)) # 画面サイズ
         pg.display.set_caption("Map Test Main") # 画面タイトル
 
-        self.clock = pg.time.Clock() # クロック設定
+        self.loop = FixedStepLoop(max_fps=60) # 固定時間刻みのループ
 
         # フィールド生成（testsub.pyのクラスをそのまま使う）
-        self.map_field = MapField.MapField(self.screen) # フィールド画面クラス
+        self.map_field = MapField.MapField(self.screen, map_path) # フィールド画面クラス
+        if render_mode: # 描画方式の指定
+            self.map_field.render_mode = render_mode
 
         # 状態管理
-        self.running = True # メインループ制御フラグ
+        self.renderer = DirtyRenderer() # 差分矩形による画面更新
 
     def run(self): # メインループ
-        while self.running: # メインループ
-            self.handle_events() # イベント処理
-            result = self.map_field.update() # フィールド更新処理
-
-            # エンカウント検知
-            if result == "ENCOUNTER": # エンカウント発生時
-                print("エンカウント発生！（ここでバトル画面に切替可能）") # デバッグ用表示
-
-            self.draw() # 画面描画処理
-            self.clock.tick(60) # フレームレート設定
+        self.loop.run(self.handle_events, self.update, self.draw, # 入力→更新(固定刻み)→描画
+                      next_wake=self.next_wake) # 止まっている間は入力か川のコマ送りまで眠る
 
         pg.quit() # Pygame終了
         sys.exit() # プログラム終了
 
+    def next_wake(self): # 画面が止まっているか（FixedStepLoop.run 用）
+        if profiler.overlay:
+            return 0
+        return self.map_field.next_wake()
+
     def handle_events(self): # イベント処理
         for event in pg.event.get(): # イベントループ
             if event.type == pg.QUIT: # 終了イベント
-                self.running = False # メインループ終了
+                self.loop.stop() # メインループ終了
+            if profiler.handle_event(event): # F3で計測結果の表示切り替え
+                self.renderer.invalidate()
+            self.renderer.handle_event(event) # 隠れていたウィンドウが見えたら全体を描き直す
+            self.map_field.handle_event(event) # クリック・Eキーで自動移動
+
+    def update(self, dt): # 更新処理
+        result = self.map_field.update(dt) # フィールド更新処理
+
+        # エンカウント検知
+        if result == "ENCOUNTER": # エンカウント発生時
+            print("エンカウント発生！（ここでバトル画面に切替可能）") # デバッグ用表示
 
     def draw(self): # 画面描画処理
+        self.renderer.begin_frame("field") # 差分更新の開始
+        if self.renderer.changed("camera", self.map_field.get_camera()): # カメラが動いたら全体を更新
+            self.renderer.invalidate()
+        if self.renderer.changed("terrain", self.map_field.map_data.version): # 地形が変わったら全体を更新
+            self.renderer.invalidate()
+        player_rect = self.map_field.player_screen_rect()
+        self.renderer.mark_moved("player", player_rect) # プレイヤーの移動前後
+        if self.renderer.changed("facing", (self.map_field.facing, self.map_field.walk.index)): # 向き・歩行のコマ
+            self.renderer.mark(player_rect)
+        if self.renderer.changed("tiles", self.map_field.tile_frame_key()): # 動く地形のコマ
+            for rect in self.map_field.animated_tile_rects():
+                self.renderer.mark(rect)
+        if profiler.overlay: # 計測結果の表示中は毎フレーム更新
+            self.renderer.mark(profiler.overlay_rect())
+        if not self.renderer.needs_draw: # 何も変わっていなければ描画しない
+            return
         self.screen.fill((0, 0, 0)) # 画面クリア
         self.map_field.draw() # フィールド画面描画
-        pg.display.flip() # 画面更新
+        profiler.draw_overlay(self.screen) # 計測結果の表示
+        self.renderer.present() # 変化した領域だけ画面更新
 
 
 if __name__ == "__main__":
-    MainGame().run() # メインゲーム実行
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="フィールド画面の確認")
+    parser.add_argument("map_path", nargs="?", help="バイナリ形式のマップファイル")
+    parser.add_argument("--render", choices=(MapField.RENDER_TILES, MapField.RENDER_BAKED, MapField.RENDER_SCROLL),
+                        help="描画方式(scroll でカメラが滑らかに動く)")
+    args = parser.parse_args()
+    MainGame(args.map_path, args.render).run() # メインゲーム実行
\ No newline at end of file
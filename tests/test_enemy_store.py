@@ -0,0 +1,39 @@
+"""
+敵の演出タイマーが、フレーム数で数えていた頃と同じ更新回数で終わるか
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from battle_engine import BattleParams
+from enemy_store import EnemyStore
+
+TICK = 1 / 60
+
+
+def ticks_until(store, done):
+    for n in range(1, 1000):
+        store.tick(TICK, BattleParams.death_time)
+        if done():
+            return n
+    return None
+
+
+def test_flash_ends_after_its_frames():
+    store = EnemyStore()
+    i = store.add("slime", 0, 100, 5, 10, (0, 0, 10, 10))
+    store.hit(i, 1, 10 * TICK) # 10フレーム分
+    assert ticks_until(store, lambda: store.flash[i] == 0) == 10
+    assert i not in store.active
+
+
+def test_death_ends_after_its_frames():
+    store = EnemyStore()
+    i = store.add("slime", 0, 1, 5, 10, (0, 0, 10, 10))
+    store.hit(i, 1, 0.0)
+    frames = round(BattleParams.death_time / TICK)
+    finished = []
+    for _ in range(frames):
+        finished = store.tick(TICK, BattleParams.death_time)[1]
+    assert finished == [i]
@@ -0,0 +1,57 @@
+"""
+キーを押しっぱなしにしたときの1秒あたりの移動マス数
+
+固定時間刻みに移したときに、秒のクールタイムを dt ずつ減らす丸め誤差で
+1マスごとに1更新余分に待ってしまわないかを、フレーム数で数えていた頃の値と比べる
+"""
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+
+from gameloop import TICK_RATE
+from tilemap import FLAG_ENCOUNTER, FLAG_PASSABLE, TILE_FLAGS, TileMap
+
+# フレーム数のクールタイム(MapField 8、mainmap 6)で 60 回更新したときの移動数
+MAPFIELD_MOVES_PER_SECOND = 7
+MAINMAP_MOVES_PER_SECOND = 9
+
+
+class HeldKeys: # pygame.key.get_pressed の代わり(右キーだけ押している)
+    def __getitem__(self, key):
+        return key == pygame.K_RIGHT
+
+
+def open_map(): # どこまでも右に歩ける(エンカウントしない)マップ
+    tile = next(t for t in range(256) if TILE_FLAGS[t] & FLAG_PASSABLE and not TILE_FLAGS[t] & FLAG_ENCOUNTER)
+    return TileMap(128, 8, bytes([tile]) * (128 * 8))
+
+
+def count_moves(game, position):
+    dt = 1 / TICK_RATE
+    start = position()
+    for _ in range(TICK_RATE):
+        game.update(dt)
+    return position()[0] - start[0]
+
+
+def test_mapfield_moves_per_second(monkeypatch):
+    import MapField
+    monkeypatch.setattr(pygame.key, "get_pressed", HeldKeys)
+    pygame.init()
+    field = MapField.MapField(pygame.display.set_mode((MapField.SCREEN_WIDTH, MapField.SCREEN_HEIGHT)))
+    field.set_map(open_map())
+    field.player_x, field.player_y = 0, 0
+    assert count_moves(field, lambda: (field.player_x, field.player_y)) == MAPFIELD_MOVES_PER_SECOND
+
+
+def test_mainmap_moves_per_second(monkeypatch):
+    import mainmap
+    monkeypatch.setattr(pygame.key, "get_pressed", HeldKeys)
+    game = mainmap.Game(seed=0)
+    game.set_map(open_map())
+    game.player_x, game.player_y = 0, 0
+    assert count_moves(game, lambda: (game.player_x, game.player_y)) == MAINMAP_MOVES_PER_SECOND
@@ -0,0 +1,61 @@
+from collections import OrderedDict
+
+from profiler import profiler
+
+
+class TextCache: # 文字列描画結果のキャッシュ
+    """
+    font.render の結果を (フォント, 文字列, 色, アンチエイリアス) ごとに保持する
+    上限を超えたら最も古く使われたものから捨てる(LRU)
+    """
+    def __init__(self, max_size=256):
+        """
+        引数:
+            max_size: 保持する描画結果の最大数
+        """
+        self.max_size = max_size
+        self.surfaces = OrderedDict() # キー -> 描画済み画像
+        self.hits = 0 # キャッシュから返した回数
+        self.misses = 0 # 実際に描画した回数
+
+    def render(self, font, text, color, antialias=True): # 文字列描画
+        """
+        font.render と同じ引数で描画済み画像を返す
+        引数:
+            font: pygame.font.Font
+            text: 文字列
+            color: 文字色
+            antialias: アンチエイリアスの有無
+        戻り値:
+            描画済み画像(呼び出し側で書き換えないこと)
+        """
+        key = (font, text, tuple(color), antialias)
+        surf = self.surfaces.get(key)
+        if surf is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key) # 最近使ったものとして後ろへ
+            return surf
+        self.misses += 1
+        with profiler.section("draw.text"): # 実際に文字を描画した時間
+            surf = font.render(text, antialias, color)
+        self.surfaces[key] = surf
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False) # 最も古いものを捨てる
+        return surf
+
+    def reset_stats(self): # 命中数のリセット
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self): # 全削除(フォント変更時など)
+        self.surfaces.clear()
+
+    def stats(self): # 統計情報
+        """
+        戻り値:
+            hits, misses, size を持つ辞書
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.surfaces)}
+
+
+text_cache = TextCache() # HUD・ログ描画で共有するキャッシュ
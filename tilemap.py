@@ -0,0 +1,95 @@
+"""
+配列で持つタイルマップ
+
+タイルIDを1マス1バイトの bytearray に詰め、タイル種別ごとのフラグ表
+(通行可能・エンカウントあり・ワープ)を引くだけで判定できるようにする。
+1000x1000 マスでもタイルIDとマスごとのフラグで約2MB に収まる。
+"""
+FLAG_PASSABLE = 1 # 通行可能
+FLAG_ENCOUNTER = 2 # ランダムエンカウントあり
+FLAG_WARP = 4 # 次のマップへのワープ地点
+
+# タイル種別ごとのフラグ(タイルIDで引く。未定義のIDは通行不可)
+TILE_FLAGS = bytearray(256)
+TILE_FLAGS[0] = FLAG_PASSABLE | FLAG_ENCOUNTER # 草
+TILE_FLAGS[1] = FLAG_PASSABLE # 土
+
+
+class TileMap: # タイルマップ
+    def __init__(self, width, height, tiles=None, tile_flags=TILE_FLAGS):
+        """
+        引数:
+            width, height: マップの大きさ(マス)
+            tiles: 行優先で並べたタイルID(bytes系)。省略時は全て0
+            tile_flags: タイル種別ごとのフラグ表(256バイト)
+        """
+        self.width = width
+        self.height = height
+        self.tiles = bytearray(tiles) if tiles is not None else bytearray(width * height)
+        if len(self.tiles) != width * height:
+            raise ValueError("tiles size does not match width * height")
+        self.tile_flags = tile_flags
+        self.cell_flags = self.tiles.translate(tile_flags) # マスごとのフラグ(種別フラグ表から一括作成)
+        self.version = 0 # 地形が変わるたびに増える
+        self.changes = [] # 変わったマス (x, y)。changes[v:] が版 v より後の変更
+
+    @classmethod
+    def from_rows(cls, rows, tile_flags=TILE_FLAGS): # 行のリストから作成
+        """
+        MAP_FIELD のような行のリストからタイルマップを作る
+        引数:
+            rows: タイルIDの2次元リスト
+        戻り値:
+            TileMapオブジェクト
+        """
+        width = len(rows[0])
+        tiles = bytearray()
+        for row in rows:
+            if len(row) != width:
+                raise ValueError("all rows must have the same length")
+            tiles.extend(row)
+        return cls(width, len(rows), tiles, tile_flags)
+
+    def in_bounds(self, x, y): # 範囲内確認
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def get(self, x, y): # タイルID取得
+        return self.tiles[y * self.width + x]
+
+    def set(self, x, y, tile): # タイルID変更
+        i = y * self.width + x
+        warp = self.cell_flags[i] & FLAG_WARP # ワープ地点はタイルを変えても残す
+        self.tiles[i] = tile
+        self.cell_flags[i] = self.tile_flags[tile] | warp
+        self.changes.append((x, y))
+        self.version += 1
+
+    def flags(self, x, y): # マスのフラグ取得(範囲外は0)
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.cell_flags[y * self.width + x]
+        return 0
+
+    def is_passable(self, x, y):
+        return bool(self.flags(x, y) & FLAG_PASSABLE)
+
+    def is_encounter(self, x, y):
+        return bool(self.flags(x, y) & FLAG_ENCOUNTER)
+
+    def is_warp(self, x, y):
+        return bool(self.flags(x, y) & FLAG_WARP)
+
+    def add_warp(self, x, y): # ワープ地点の登録
+        self.cell_flags[y * self.width + x] |= FLAG_WARP
+        self.changes.append((x, y))
+        self.version += 1
+
+    def update_camera(self, x, y, radius=1): # 全体がメモリ上にあるので何もしない(MappedTileMap と同じ呼び方用)
+        pass
+
+    def row(self, y, x0=0, x1=None): # 1行分(またはその一部)のタイルID
+        start = y * self.width
+        return self.tiles[start + x0:start + (self.width if x1 is None else x1)]
+
+    def row_flags(self, y, x0=0, x1=None): # 1行分(またはその一部)のマスのフラグ
+        start = y * self.width
+        return self.cell_flags[start + x0:start + (self.width if x1 is None else x1)]
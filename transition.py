@@ -0,0 +1,152 @@
+"""
+戦闘に入るときの画面切り替え演出
+
+遷移を始めたときのマップ画面を1回だけ保存し、その上に黒いワイプを重ねる。
+ワイプの形(広がる矩形・閉じる円・タイルの分解)は段階ごとのマスク画像として
+最初に1回だけ作っておくので、毎フレームの描画はマスクの変わった部分を
+blit するだけで済む。
+"""
+import random
+
+import pygame
+
+WIPE_RECT = "rect" # 中央から広がる黒い矩形
+WIPE_IRIS = "iris" # 外側から閉じる円
+WIPE_DISSOLVE = "dissolve" # タイルが順に黒くなる
+WIPES = (WIPE_RECT, WIPE_IRIS, WIPE_DISSOLVE)
+
+LEVELS = 24 # ワイプの段階数
+DISSOLVE_TILE = 32 # 分解するタイルの大きさ(px)
+DISSOLVE_SEED = 0 # タイルの順番(毎回同じ見た目にする)
+KEY_COLOR = (255, 0, 255) # マスクの透明色
+BLACK = (0, 0, 0)
+
+_patterns = {} # (形, 画面サイズ, 段階数) -> WipePattern(ゲーム全体で共有)
+
+
+class WipePattern: # 段階ごとのマスク
+    """
+    masks[i]: 段階 i で黒くなっている部分だけが不透明な8bit画像
+    dirty[i]: 段階 i-1 から i で黒くなった部分の矩形リスト
+    """
+    def __init__(self, kind, size, levels=LEVELS):
+        self.kind = kind
+        self.size = size
+        self.levels = levels
+        self.masks = []
+        self.dirty = []
+        if kind == WIPE_DISSOLVE:
+            self.build_dissolve()
+        else:
+            self.build_shapes()
+
+    def new_mask(self): # 全面透明のマスク
+        mask = pygame.Surface(self.size, depth=8)
+        mask.set_palette_at(0, KEY_COLOR)
+        mask.set_palette_at(1, BLACK)
+        mask.fill(KEY_COLOR)
+        mask.set_colorkey(KEY_COLOR, pygame.RLEACCEL) # 透明部分は読み飛ばす
+        return mask
+
+    def build_shapes(self): # 矩形と円
+        w, h = self.size
+        cx, cy = w // 2, h // 2
+        radius = (cx * cx + cy * cy) ** 0.5 + 1 # 画面の角まで届く半径
+        prev = None
+        for i in range(self.levels + 1):
+            p = i / self.levels
+            mask = self.new_mask()
+            if self.kind == WIPE_RECT:
+                rect = pygame.Rect(0, 0, int(w * p), int(h * p))
+                rect.center = (cx, cy)
+                mask.fill(BLACK, rect)
+                self.dirty.append([rect]) # 新しく黒くなるのは矩形の内側だけ
+            else:
+                r = int(radius * (1 - p))
+                mask.fill(BLACK)
+                if r > 0:
+                    pygame.draw.circle(mask, KEY_COLOR, (cx, cy), r)
+                # 新しく黒くなるのは前の段階の円の内側だけ
+                bound = pygame.Rect(0, 0, w, h) if prev is None else pygame.Rect(cx - prev, cy - prev, prev * 2, prev * 2)
+                self.dirty.append([bound.clip(0, 0, w, h)])
+                prev = r
+            self.masks.append(mask)
+
+    def build_dissolve(self): # タイルの分解
+        w, h = self.size
+        tiles = [pygame.Rect(x, y, DISSOLVE_TILE, DISSOLVE_TILE)
+                 for y in range(0, h, DISSOLVE_TILE) for x in range(0, w, DISSOLVE_TILE)]
+        random.Random(DISSOLVE_SEED).shuffle(tiles) # ゲームの乱数列は使わない
+        mask = self.new_mask()
+        done = 0
+        for i in range(self.levels + 1):
+            upto = len(tiles) * i // self.levels
+            new_tiles = tiles[done:upto]
+            for rect in new_tiles:
+                mask.fill(BLACK, rect)
+            self.masks.append(mask.copy())
+            self.dirty.append(new_tiles)
+            done = upto
+
+
+def get_pattern(kind, size, levels=LEVELS): # 共有のワイプ取得(初回だけ作成)
+    key = (kind, tuple(size), levels)
+    pattern = _patterns.get(key)
+    if pattern is None:
+        pattern = _patterns[key] = WipePattern(kind, tuple(size), levels)
+    return pattern
+
+
+class Transition: # 画面切り替え演出
+    def __init__(self, kind=WIPE_RECT, levels=LEVELS):
+        """
+        引数:
+            kind: ワイプの形(WIPE_RECT / WIPE_IRIS / WIPE_DISSOLVE)
+            levels: ワイプの段階数
+        """
+        self.kind = kind
+        self.levels = levels
+        self.snapshot = None # 遷移開始時の画面
+        self.pattern = None
+        self.level = 0 # 画面に描いてある段階
+
+    def start(self, frame, kind=None): # 遷移開始
+        """
+        引数:
+            frame: 遷移前の画面(コピーして保存する)
+            kind: 今回だけ使うワイプの形(省略時は self.kind)
+        """
+        self.snapshot = frame.copy()
+        self.pattern = get_pattern(kind or self.kind, frame.get_size(), self.levels)
+        self.level = 0
+
+    def level_at(self, progress): # 進み具合(0〜1)に対応する段階
+        return max(0, min(self.levels, int(progress * self.levels)))
+
+    def dirty_rects(self, progress): # 今回描き足す領域
+        """
+        戻り値:
+            前回描いた段階から progress までに黒くなる部分の矩形リスト
+        """
+        rects = []
+        for i in range(self.level + 1, self.level_at(progress) + 1):
+            rects.extend(self.pattern.dirty[i])
+        return rects
+
+    def draw(self, screen, progress, full=False): # 描画
+        """
+        ワイプは黒い部分が増えるだけなので、前の段階から変わった部分だけを描き足す
+        引数:
+            screen: 描画先
+            progress: 進み具合(0〜1)
+            full: True なら保存した画面から描き直す
+        """
+        level = self.level_at(progress)
+        mask = self.pattern.masks[level]
+        if full:
+            screen.blit(self.snapshot, (0, 0))
+            screen.blit(mask, (0, 0))
+        else:
+            for rect in self.dirty_rects(progress):
+                screen.blit(mask, rect, rect)
+        self.level = level
@@ -0,0 +1,199 @@
+"""
+マップの先読みと解放
+
+プレイヤーが画面端やワープ地点に近づいたら、その先のマップの画像を
+別スレッドで読み込んでおく(ファイルの読み込みと拡大縮小は別スレッド、
+画面形式への変換はメインスレッド)。しばらく訪れていないマップの画像は解放する。
+"""
+import math
+import queue
+import threading
+import time
+
+from assets import assets as shared_assets
+
+PREFETCH_DISTANCE = 160 # 端・ワープ地点までこの距離(px)に近づいたら先読みする
+RELEASE_AFTER = 30.0 # この時間(秒)訪れていないマップを解放する
+
+IDLE = "idle" # 読み込んでいない
+LOADING = "loading" # 別スレッドで読み込み中
+READY = "ready" # 読み込み済み
+
+
+class WorldMap: # マップごとの画像と出口
+    def __init__(self, map_id, images=(), edges=None, warps=()):
+        """
+        引数:
+            map_id: マップID
+            images: (パス, サイズ, 透過) のリスト。サイズ None なら元のサイズ
+            edges: 画面端 -> 行き先マップID("left" / "right" / "top" / "bottom")
+            warps: ((x, y), 行き先マップID) のリスト(位置は px)
+        """
+        self.map_id = map_id
+        self.images = list(images)
+        self.edges = dict(edges or {})
+        self.warps = list(warps)
+        self.state = IDLE
+        self.pending = 0 # 読み込み待ちの画像数
+        self.generation = 0 # 先読み要求の番号(解放前の古い結果を捨てる)
+        self.last_visit = None # 最後に訪れた(または先読みを要求した)時刻
+
+
+class WorldManager: # マップの先読みと解放
+    def __init__(self, size, assets=shared_assets, prefetch_distance=PREFETCH_DISTANCE,
+                 release_after=RELEASE_AFTER):
+        """
+        引数:
+            size: マップの大きさ (幅, 高さ)(px)
+            assets: 画像管理
+            prefetch_distance: 先読みを始める距離(px)
+            release_after: 解放するまでの時間(秒)
+        """
+        self.width, self.height = size
+        self.assets = assets
+        self.prefetch_distance = prefetch_distance
+        self.release_after = release_after
+        self.maps = {} # マップID -> WorldMap
+        self.time = 0.0 # update に渡された時間の合計(秒)
+        self.on_ready = None # 読み込みが終わったときに呼ぶ関数 f(マップID)
+        self.on_release = None # 解放したときに呼ぶ関数 f(マップID)
+        self.requests = queue.Queue() # 別スレッドへの読み込み要求
+        self.results = queue.Queue() # 別スレッドからの読み込み結果
+        self.thread = None # 読み込みスレッド(初回の先読みで起動)
+
+    def add_map(self, map_id, images=(), edges=None, warps=()): # マップの登録
+        self.maps[map_id] = WorldMap(map_id, images, edges, warps)
+        return self.maps[map_id]
+
+    def exits_near(self, map_id, pos): # 近くにある出口の行き先
+        """
+        引数:
+            map_id: 今いるマップ
+            pos: プレイヤーの位置 (x, y)(px)
+        戻り値:
+            先読み距離より近い出口の行き先マップIDリスト
+        """
+        x, y = pos
+        limit = self.prefetch_distance
+        wm = self.maps[map_id]
+        distance = {"left": x, "right": self.width - x, "top": y, "bottom": self.height - y}
+        near = [target for edge, target in wm.edges.items() if distance[edge] < limit]
+        near += [target for (wx, wy), target in wm.warps if math.hypot(wx - x, wy - y) < limit]
+        return near
+
+    def update(self, map_id, pos, dt): # 毎フレームの処理
+        """
+        今いるマップを訪問済みにし、出口に近ければ行き先を先読みし、
+        読み込み結果を登録し、古いマップを解放する
+        引数:
+            map_id: 今いるマップ
+            pos: プレイヤーの位置 (x, y)(px)
+            dt: 経過時間(秒)
+        """
+        self.time += dt
+        current = self.maps[map_id]
+        current.last_visit = self.time
+        if current.state == IDLE: # 先読みされずに入った(開始直後など)ので今読み込む
+            self.load_now(map_id)
+        for target in self.exits_near(map_id, pos):
+            self.maps[target].last_visit = self.time # 先読み中・先読み済みを解放しない
+            self.prefetch(target)
+        self.collect()
+        self.release_stale(map_id)
+
+    def load_now(self, map_id): # メインスレッドで読み込む
+        wm = self.maps[map_id]
+        for path, size, alpha in wm.images:
+            if size:
+                self.assets.scaled(path, size, alpha, keep_source=False)
+            else:
+                self.assets.image(path, alpha)
+        self.mark_ready(wm)
+
+    def prefetch(self, map_id): # 別スレッドでの読み込み要求
+        wm = self.maps[map_id]
+        if wm.state != IDLE:
+            return
+        todo = [(path, size, alpha) for path, size, alpha in wm.images if not self.assets.cached(path, alpha, size)]
+        if not todo:
+            self.mark_ready(wm)
+            return
+        wm.state = LOADING
+        wm.pending = len(todo)
+        wm.generation += 1
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.worker, name="world-prefetch", daemon=True)
+            self.thread.start()
+        for path, size, alpha in todo:
+            self.requests.put((map_id, wm.generation, path, size, alpha))
+
+    def worker(self): # 読み込みスレッド
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            map_id, generation, path, size, alpha = request
+            try:
+                surf = self.assets.load_raw(path, size)
+            except Exception as e: # 読めない画像は無いものとして扱う
+                print(f"先読みに失敗しました: {path} ({e})")
+                surf = None
+            self.results.put((map_id, generation, path, size, alpha, surf))
+
+    def collect(self): # 読み込み結果の登録(メインスレッド)
+        while True:
+            try:
+                map_id, generation, path, size, alpha, surf = self.results.get_nowait()
+            except queue.Empty:
+                return
+            wm = self.maps[map_id]
+            if wm.state != LOADING or wm.generation != generation: # 読み込み中に解放された
+                continue
+            self.assets.adopt(path, surf, alpha, size)
+            wm.pending -= 1
+            if wm.pending == 0:
+                self.mark_ready(wm)
+
+    @property
+    def loading(self): # 別スレッドで読み込み中のマップがあるか
+        return any(wm.state == LOADING for wm in self.maps.values())
+
+    def mark_ready(self, wm):
+        wm.state = READY
+        if self.on_ready:
+            self.on_ready(wm.map_id)
+
+    def release_stale(self, current_id): # しばらく訪れていないマップの解放
+        for wm in self.maps.values():
+            if wm.map_id == current_id or wm.state == IDLE or wm.last_visit is None:
+                continue
+            if self.time - wm.last_visit > self.release_after:
+                self.release(wm.map_id)
+
+    def release(self, map_id): # マップの画像を解放する
+        wm = self.maps[map_id]
+        for path, size, alpha in wm.images:
+            self.assets.release(path)
+        wm.state = IDLE
+        wm.pending = 0
+        if self.on_release:
+            self.on_release(map_id)
+
+    def wait(self, timeout=5.0): # 読み込み中の画像がなくなるまで待つ(確認用)
+        """
+        戻り値:
+            全て読み込めたら True
+        """
+        end = time.perf_counter() + timeout
+        while self.loading:
+            if time.perf_counter() > end:
+                return False
+            self.collect()
+            time.sleep(0.001)
+        return True
+
+    def close(self): # 読み込みスレッドの停止
+        if self.thread is not None:
+            self.requests.put(None)
+            self.thread.join(timeout=1.0)
+            self.thread = None